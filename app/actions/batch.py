@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import re
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from app.actions.types import Action, ActionBatch, BackAction, SwipeAction, TapAction, WaitAction
+
+# Shell helper printing "@<step> <uptime seconds>"; /proc/uptime exists on every Android build
+# (toybox `date` may lack %N), with 10 ms resolution which is plenty next to `input` latency.
+_MARK_FN = 't(){ read u _ </proc/uptime; echo "@$1 $u"; }'
+_MARK_RE = re.compile(r"^@(\d+)\s+([\d.]+)\s*$", re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    # Every step ran
+    ok: bool
+    # Seconds spent on each step, in order (empty when the device did not report timings)
+    step_s: list[float] = field(default_factory=list)
+    total_s: float = 0.0
+    round_trips: int = 1
+    # Steps known to have run; on failure, the ones after it were never sent
+    completed: int = 0
+    # False only when nothing reached the device, so the whole batch can be retried safely
+    started: bool = True
+    error: str | None = None
+
+
+def step_command(action: Action) -> str:
+    if isinstance(action, TapAction):
+        return f"input tap {int(action.x)} {int(action.y)}"
+    if isinstance(action, SwipeAction):
+        return (
+            f"input swipe {int(action.x1)} {int(action.y1)} {int(action.x2)} {int(action.y2)}"
+            f" {int(action.duration_ms)}"
+        )
+    if isinstance(action, WaitAction):
+        return f"sleep {max(0.0, float(action.seconds)):.3f}"
+    if isinstance(action, BackAction):
+        return "input keyevent 4"
+    raise ValueError(f"Unsupported action: {action!r}")
+
+
+def compile_batch(batch: ActionBatch) -> str:
+    """Single ``sh`` script running every step with a timestamp mark around each one.
+
+    Steps are chained with ``&&``: the first failing step stops the script, and the marks
+    printed so far tell which steps ran.
+    """
+    parts = ["t 0"]
+    for i, action in enumerate(batch, start=1):
+        parts.append(step_command(action))
+        parts.append(f"t {i}")
+    return f"{_MARK_FN}; " + " && ".join(parts)
+
+
+def _marks(output: str) -> dict[int, float]:
+    return {int(m.group(1)): float(m.group(2)) for m in _MARK_RE.finditer(output or "")}
+
+
+def _completed(marks: dict[int, float]) -> int:
+    """Steps confirmed by consecutive marks after the start mark."""
+    if 0 not in marks:
+        return 0
+    n = 0
+    while n + 1 in marks:
+        n += 1
+    return n
+
+
+def parse_timings(output: str, steps: int) -> list[float]:
+    marks = _marks(output)
+    if any(i not in marks for i in range(steps + 1)):
+        return []
+    return [max(0.0, marks[i + 1] - marks[i]) for i in range(steps)]
+
+
+def run_batch_adb(
+    batch: ActionBatch, exec_fn: Callable[[list[str]], bytes] | None = None
+) -> BatchResult:
+    """Run the whole batch with one ``adb shell`` invocation.
+
+    Never raises for a failed invocation: the result says how far the script got. ``started``
+    is False when no timing mark came back, i.e. the script never ran on the device.
+    """
+    if exec_fn is None:
+        from app.services.capture.adb_capture import adb_exec
+
+        exec_fn = adb_exec
+    if len(batch) == 0:
+        return BatchResult(ok=True, round_trips=0)
+    t0 = time.perf_counter()
+    error: str | None = None
+    try:
+        out: bytes | str | None = exec_fn(["shell", compile_batch(batch)])
+    except Exception as exc:
+        # adb_exec keeps the partial stdout of a failed or timed-out script
+        out = getattr(exc, "stdout", None)
+        error = str(exc) or type(exc).__name__
+    total = time.perf_counter() - t0
+    text = out.decode("utf-8", errors="ignore") if isinstance(out, bytes) else str(out or "")
+    marks = _marks(text)
+    if error is None and not marks:
+        # Ran, but the device printed no marks (no /proc/uptime?): no timings, assume success
+        return BatchResult(ok=True, total_s=total, completed=len(batch))
+    completed = _completed(marks)
+    return BatchResult(
+        ok=error is None and completed == len(batch),
+        step_s=parse_timings(text, len(batch)),
+        total_s=total,
+        completed=completed,
+        started=0 in marks,
+        error=error if error is not None or completed == len(batch) else "batch stopped early",
+    )
+
+
+def run_batch_sequential(batch: ActionBatch, execute: Callable[[Action], None]) -> BatchResult:
+    """Fallback for backends without a device shell: one call per step, timed locally.
+
+    Stops at the first step that raises; the steps after it are not sent.
+    """
+    t0 = time.perf_counter()
+    steps: list[float] = []
+    error: str | None = None
+    for action in batch:
+        ts = time.perf_counter()
+        try:
+            execute(action)
+        except Exception as exc:
+            error = str(exc) or type(exc).__name__
+            break
+        steps.append(time.perf_counter() - ts)
+    return BatchResult(
+        ok=error is None,
+        step_s=steps,
+        total_s=time.perf_counter() - t0,
+        round_trips=sum(1 for a in list(batch)[: len(steps) + 1] if not isinstance(a, WaitAction)),
+        completed=len(steps),
+        started=bool(steps) or error is None,
+        error=error,
+    )
@@ -3,7 +3,15 @@ from __future__ import annotations
 import time
 from collections.abc import Callable
 
-from app.actions.types import Action, BackAction, SwipeAction, TapAction, WaitAction
+from app.actions.batch import BatchResult, run_batch_adb, run_batch_sequential
+from app.actions.types import (
+    Action,
+    ActionBatch,
+    BackAction,
+    SwipeAction,
+    TapAction,
+    WaitAction,
+)
 from app.config import settings
 from app.services.capture.adb_capture import adb_exec as adb
 from app.services.capture.window_capture import find_window_rect
@@ -152,7 +160,61 @@ def execute(action: Action) -> None:
         do_window()
 
 
-def escape_sequence(presses: int = 3, wait_s: float = 0.3) -> None:
+def _adb_batch(args: list[str]) -> bytes:
+    # No retry: a failed script may have run part of its steps already
+    return adb(args, timeout=30.0)
+
+
+def execute_batch(batch: ActionBatch) -> BatchResult:
+    """Run a sequence of actions in one device round trip where the backend allows it.
+
+    ADB compiles the batch into a single shell script; the window backend has no device shell
+    and falls back to executing the steps one by one. In auto mode the window path is only
+    used when the ADB script never started. ``ok`` is False when a step did not run.
+    """
+    backend = (settings.input_backend or "auto").lower()
+    if backend == "window":
+        return run_batch_sequential(batch, execute)
+    res = run_batch_adb(batch, _adb_batch)
+    if backend == "adb" or res.started:
+        # Some steps may already have run on the device: sending them again would repeat taps
+        return res
+    # The script never started, so nothing was sent yet: the window path is safe
+    return run_batch_sequential(batch, execute)
+
+
+def escape_sequence(presses: int = 3, wait_s: float = 0.3, verify: bool = True) -> None:
+    """Press back ``presses`` times.
+
+    With ``verify`` each press waits for the screen to react and settle instead of sleeping a
+    fixed ``wait_s``. A press that shows no change still waits out its window, which is never
+    shorter than three measured frame captures, and every press is always sent. With
+    ``verify=False`` the presses are sent blind as one batch, ``wait_s`` apart.
+    """
+    if not verify:
+        steps: list[Action] = []
+        for i in range(max(0, presses)):
+            if i:
+                steps.append(WaitAction(seconds=max(0.0, wait_s)))
+            steps.append(BackAction())
+        execute_batch(ActionBatch(tuple(steps)))
+        return
+    from app.actions.waits import wait_for_transition
+    from app.services.capture import capture_frame
+
+    t0 = time.perf_counter()
+    try:
+        frame = capture_frame()
+    except Exception:
+        frame = None
+    # A change can only be seen on the next captured frame: one slow screencap must not end
+    # the window before the press had a chance to show
+    window = max(wait_s, 3.0 * (time.perf_counter() - t0))
     for _ in range(max(0, presses)):
         execute(BackAction())
-        time.sleep(max(0.0, wait_s))
+        if frame is None:
+            time.sleep(max(0.0, wait_s))
+            continue
+        res = wait_for_transition(frame, change_timeout_s=window)
+        if res.image is not None:
+            frame = res.image
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+from collections.abc import Iterator, Mapping
 from dataclasses import dataclass
-from typing import Literal
+from typing import Any, Literal
 
 ActionKind = Literal["tap", "swipe", "wait", "back"]
 
@@ -35,3 +36,55 @@ class BackAction:
 
 
 Action = TapAction | SwipeAction | WaitAction | BackAction
+
+
+@dataclass(frozen=True)
+class ActionBatch:
+    """Ordered actions sent to the device together (one round trip on ADB)."""
+
+    steps: tuple[Action, ...] = ()
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def __iter__(self) -> Iterator[Action]:
+        return iter(self.steps)
+
+
+def action_to_dict(action: Action) -> dict[str, Any]:
+    """Serialize an action to the JSON shape used by telemetry, prompts and persistence."""
+    if isinstance(action, TapAction):
+        return {"type": "tap", "x": action.x, "y": action.y}
+    if isinstance(action, SwipeAction):
+        return {
+            "type": "swipe",
+            "x1": action.x1,
+            "y1": action.y1,
+            "x2": action.x2,
+            "y2": action.y2,
+            "duration_ms": action.duration_ms,
+        }
+    if isinstance(action, WaitAction):
+        return {"type": "wait", "seconds": action.seconds}
+    if isinstance(action, BackAction):
+        return {"type": "back"}
+    raise ValueError(f"Unsupported action: {action!r}")
+
+
+def action_from_dict(obj: Mapping[str, Any]) -> Action:
+    t = str(obj.get("type", "")).lower()
+    if t == "tap":
+        return TapAction(x=int(obj.get("x", 0)), y=int(obj.get("y", 0)))
+    if t == "swipe":
+        return SwipeAction(
+            x1=int(obj.get("x1", 0)),
+            y1=int(obj.get("y1", 0)),
+            x2=int(obj.get("x2", 0)),
+            y2=int(obj.get("y2", 0)),
+            duration_ms=int(obj.get("duration_ms", 300)),
+        )
+    if t == "wait":
+        return WaitAction(seconds=float(obj.get("seconds", 1.0)))
+    if t == "back":
+        return BackAction()
+    raise ValueError(f"Unsupported action type: {t}")
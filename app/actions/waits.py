@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from PIL import Image, ImageChops, ImageStat
+
+from app.state.identity import StateIdentity, hamming, visual_hash
+
+Capture = Callable[[], Image.Image]
+
+# Frames are compared on a small grayscale thumbnail: cheap and blind to encoder noise
+_THUMB_SIZE = (64, 36)
+# Mean absolute thumbnail difference (0..1) below which two frames count as the same picture
+SETTLE_DELTA = 0.01
+# ...and above which the screen has started to react to an action
+CHANGE_DELTA = 0.03
+
+
+@dataclass(frozen=True)
+class WaitResult:
+    ok: bool
+    elapsed_s: float
+    frames: int
+    # Last captured frame, so callers can encode it instead of capturing again
+    image: Image.Image | None = None
+
+
+def _default_capture() -> Image.Image:
+    # Imported lazily: capture backends pull platform-specific modules
+    from app.services.capture import capture_frame
+
+    return capture_frame()
+
+
+def _thumb(image: Image.Image) -> Image.Image:
+    return image.convert("L").resize(_THUMB_SIZE, Image.BILINEAR)
+
+
+def frame_delta(a: Image.Image, b: Image.Image) -> float:
+    """Mean absolute difference of two frames' thumbnails, in [0, 1]."""
+    diff = ImageChops.difference(_thumb(a), _thumb(b))
+    return float(ImageStat.Stat(diff).mean[0]) / 255.0
+
+
+def wait_until(
+    predicate: Callable[[Image.Image], bool],
+    timeout_s: float = 5.0,
+    poll_s: float = 0.1,
+    capture: Capture | None = None,
+) -> WaitResult:
+    """Poll frames until ``predicate(frame)`` holds or the timeout expires."""
+    grab = capture or _default_capture
+    t0 = time.perf_counter()
+    frames = 0
+    image: Image.Image | None = None
+    while True:
+        try:
+            image = grab()
+            frames += 1
+            if predicate(image):
+                return WaitResult(True, time.perf_counter() - t0, frames, image)
+        except Exception:
+            # transient capture errors: keep polling until the deadline
+            pass
+        elapsed = time.perf_counter() - t0
+        if elapsed >= timeout_s:
+            return WaitResult(False, elapsed, frames, image)
+        time.sleep(min(poll_s, max(0.0, timeout_s - elapsed)))
+
+
+class _Settled:
+    """Predicate that holds once ``stable_frames`` consecutive frames barely differ."""
+
+    def __init__(self, stable_frames: int, threshold: float) -> None:
+        self._need = max(1, int(stable_frames))
+        self._threshold = threshold
+        self._prev: Image.Image | None = None
+        self._streak = 0
+
+    def __call__(self, image: Image.Image) -> bool:
+        if self._prev is not None and frame_delta(self._prev, image) <= self._threshold:
+            self._streak += 1
+        else:
+            self._streak = 0
+        self._prev = image
+        return self._streak >= self._need
+
+
+def wait_for_settle(
+    timeout_s: float = 3.0,
+    stable_frames: int = 2,
+    poll_s: float = 0.1,
+    capture: Capture | None = None,
+) -> WaitResult:
+    """Return as soon as animations stop (the screen is unchanged over consecutive polls)."""
+    return wait_until(_Settled(stable_frames, SETTLE_DELTA), timeout_s, poll_s, capture)
+
+
+def wait_for_transition(
+    reference: Image.Image | None,
+    change_timeout_s: float = 1.0,
+    settle_timeout_s: float = 3.0,
+    poll_s: float = 0.1,
+    capture: Capture | None = None,
+) -> WaitResult:
+    """Wait for the screen to react to an action (differ from ``reference``), then to settle.
+
+    ``ok`` is False when nothing changed within ``change_timeout_s``: the action had no visible
+    effect and there is no point waiting longer.
+    """
+    t0 = time.perf_counter()
+    frames = 0
+    if reference is not None:
+        ref = reference
+        changed = wait_until(
+            lambda img: frame_delta(ref, img) >= CHANGE_DELTA, change_timeout_s, poll_s, capture
+        )
+        frames += changed.frames
+        if not changed.ok:
+            return WaitResult(False, time.perf_counter() - t0, frames, changed.image)
+    settled = wait_for_settle(settle_timeout_s, poll_s=poll_s, capture=capture)
+    return WaitResult(True, time.perf_counter() - t0, frames + settled.frames, settled.image)
+
+
+def wait_for_screen(
+    target: StateIdentity,
+    timeout_s: float = 5.0,
+    tolerance: int = 6,
+    poll_s: float = 0.1,
+    capture: Capture | None = None,
+) -> WaitResult:
+    """Wait until the frame's visual hash is within ``tolerance`` bits of the expected screen."""
+    return wait_until(
+        lambda img: hamming(visual_hash(img), target.visual) <= tolerance,
+        timeout_s,
+        poll_s,
+        capture,
+    )
+
+
+async def async_wait_until(
+    predicate: Callable[[Image.Image], bool],
+    timeout_s: float = 5.0,
+    poll_s: float = 0.1,
+    capture: Capture | None = None,
+) -> WaitResult:
+    """Event-loop friendly ``wait_until``: captures run in a worker thread between polls."""
+    grab = capture or _default_capture
+    t0 = time.perf_counter()
+    frames = 0
+    image: Image.Image | None = None
+    while True:
+        try:
+            image = await asyncio.to_thread(grab)
+            frames += 1
+            if predicate(image):
+                return WaitResult(True, time.perf_counter() - t0, frames, image)
+        except Exception:
+            pass
+        elapsed = time.perf_counter() - t0
+        if elapsed >= timeout_s:
+            return WaitResult(False, elapsed, frames, image)
+        await asyncio.sleep(min(poll_s, max(0.0, timeout_s - elapsed)))
+
+
+async def async_wait_for_settle(
+    timeout_s: float = 3.0,
+    stable_frames: int = 2,
+    poll_s: float = 0.1,
+    capture: Capture | None = None,
+) -> WaitResult:
+    return await async_wait_until(
+        _Settled(stable_frames, SETTLE_DELTA), timeout_s, poll_s, capture
+    )
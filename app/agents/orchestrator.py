@@ -1,32 +1,95 @@
 from __future__ import annotations
 
 import asyncio
+import functools
+import threading
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 
 from app.config import settings
-from app.policy.heuristic import propose_action
+from app.policy.heuristic import PolicyContext, default_context, propose_action
 from app.perception.clickmap import click_score, suggest_explore_points
 from app.perception.interaction_memory import element_score
-from app.config import settings
 from app.services.hf.policy import HFPolicy
 from app.services.hf.judge import HFJudge
 from app.state.encoder import GameState
 from app.state.profile import is_mode_locked
 from app.telemetry.bus import bus
-from app.memory.store import MemoryStore, Fact
-from app.services.search.web_ingest import fetch_urls, summarize
+from app.memory.knowledge import fact_meta, get_knowledge_worker, seed_urls
+from app.memory.store import KNOWLEDGE_NAMESPACES, Fact, get_memory_store
 
 Candidate = tuple[float, object, str]
 
+_executor: ThreadPoolExecutor | None = None
+_spec_executor: ThreadPoolExecutor | None = None
+
+
+def get_agent_executor() -> ThreadPoolExecutor:
+    """Dedicated pool for agent scorers, sized to the agent fan-out (plus the base proposal)."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=max(2, int(settings.max_agents) + 1), thread_name_prefix="agent"
+        )
+    return _executor
+
+
+def get_speculation_executor() -> ThreadPoolExecutor:
+    """Small pool for speculative decisions, apart from the agent pool.
+
+    A cancelled speculation keeps its threads busy until its agents return; on this pool that
+    never delays the agents of the real decision.
+    """
+    global _spec_executor
+    if _spec_executor is None:
+        _spec_executor = ThreadPoolExecutor(
+            max_workers=max(1, int(settings.speculative_workers)), thread_name_prefix="speculate"
+        )
+    return _spec_executor
+
 
-async def run_with_timeout(fn: Callable[[], Candidate], timeout_s: float) -> Candidate | None:
-    loop = asyncio.get_event_loop()
+async def run_with_timeout(
+    fn: Callable[[], Candidate], timeout_s: float, executor: ThreadPoolExecutor | None = None
+) -> Candidate | None:
+    loop = asyncio.get_running_loop()
     try:
-        return await asyncio.wait_for(loop.run_in_executor(None, fn), timeout=timeout_s)
+        fut = loop.run_in_executor(executor or get_agent_executor(), fn)
+        return await asyncio.wait_for(fut, timeout=timeout_s)
     except Exception:
         return None
 
 
+class BaseProposal:
+    """Memoizes the heuristic ``propose_action`` result for the most recent state of each context.
+
+    The heuristic keeps per-frame bookkeeping (repeat counters, label cooldowns) in its
+    ``PolicyContext``, so it must run exactly once per decision; agents score this shared
+    proposal instead of re-running it. The memo is stored on the context itself, so a
+    discarded context (e.g. a speculation fork) takes it along.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.computed = 0
+
+    def get(self, state: GameState, ctx: PolicyContext | None = None) -> tuple[float, object]:
+        ctx = default_context if ctx is None else ctx
+        # Per-context lock: concurrent runners never wait on each other
+        with ctx.proposal_lock:
+            hit = ctx.proposal
+            if hit is not None and hit[0] is state:
+                return hit[1]
+            value = propose_action(state, ctx)
+            ctx.proposal = (state, value)
+            with self._lock:
+                self.computed += 1
+            return value
+
+
+base_proposal = BaseProposal()
+_hf_judge: HFJudge | None = None
+
+
 _hf_policy: HFPolicy | None = None
 _hf_policy_enabled: bool = True
 
@@ -40,10 +103,11 @@ def get_hf_policy_enabled() -> bool:
     return _hf_policy_enabled
 
 
-def agent_policy(state: GameState) -> Candidate:
+def agent_policy(state: GameState, ctx: PolicyContext | None = None) -> Candidate:
     global _hf_policy
-    # Try HF policy if configured
-    if settings.hf_model_id_policy and _hf_policy_enabled:
+    # Try HF policy if configured (never for a speculative decision)
+    speculative = ctx is not None and ctx.speculative
+    if settings.hf_model_id_policy and _hf_policy_enabled and not speculative:
         try:
             if _hf_policy is None:
                 _hf_policy = HFPolicy()
@@ -52,7 +116,7 @@ def agent_policy(state: GameState) -> Candidate:
         except Exception:
             pass
     # Fallback to heuristic
-    score, action = propose_action(state)
+    score, action = base_proposal.get(state, ctx)
     # Adjust score using clickmap and element memory: boost likely-buttons/interactive labels
     try:
         if hasattr(action, "x") and hasattr(action, "y"):
@@ -104,18 +168,19 @@ def agent_policy(state: GameState) -> Candidate:
     return score, action, "policy-lite"
 
 
-def agent_mechanics(state: GameState) -> Candidate:
+def agent_mechanics(state: GameState, ctx: PolicyContext | None = None) -> Candidate:
     # Placeholder for a different reasoning angle
-    score, action = propose_action(state)
+    score, action = base_proposal.get(state, ctx)
     return score * 0.99, action, "mechanics-expert"
 
 
-def agent_guide_reader(state: GameState) -> Candidate:
-    score, action = propose_action(state)
+def agent_guide_reader(state: GameState, ctx: PolicyContext | None = None) -> Candidate:
+    score, action = base_proposal.get(state, ctx)
     return score * 0.98, action, "guide-reader"
 
 
-def agent_icons(state: GameState) -> Candidate:
+def agent_icons(state: GameState, ctx: PolicyContext | None = None) -> Candidate:
+    ctx = default_context if ctx is None else ctx
     # Prefer tapping on visible UI icons/buttons, filtered by lock, ranked by clickmap score
     try:
         if getattr(state, "ui_buttons", None) and state.img_width and state.img_height:
@@ -137,21 +202,18 @@ def agent_icons(state: GameState) -> Candidate:
                 best_s, bx, by = candidates[0]
                 
                 # STUCK DETECTION: Check if we're clicking the same spot repeatedly
-                global _last_icon_coords, _icon_repeat_count
-                if '_last_icon_coords' not in globals():
-                    _last_icon_coords = None
-                    _icon_repeat_count = 0
-                
                 current_coords = (bx, by)
-                if _last_icon_coords == current_coords:
-                    _icon_repeat_count += 1
-                else:
-                    _icon_repeat_count = 0
-                _last_icon_coords = current_coords
+                with ctx.lock:
+                    if ctx.last_icon_coords == current_coords:
+                        ctx.icon_repeat_count += 1
+                    else:
+                        ctx.icon_repeat_count = 0
+                    ctx.last_icon_coords = current_coords
+                    stuck = ctx.icon_repeat_count >= 3
                 
                 # If stuck on same coordinates for 3+ times, force fallback to heuristic
-                if _icon_repeat_count >= 3:
-                    score, action = propose_action(state)
+                if stuck:
+                    score, action = base_proposal.get(state, ctx)
                     return score * 0.95, action, "icon-stuck-fallback"
                 
                 from app.actions.types import TapAction
@@ -160,30 +222,33 @@ def agent_icons(state: GameState) -> Candidate:
     except Exception:
         pass
     # Fallback to heuristic if no buttons
-    score, action = propose_action(state)
+    score, action = base_proposal.get(state, ctx)
     return score * 0.97, action, "icon-fallback"
 
 
 def vote(candidates: list[Candidate]) -> Candidate:
-    # If HF judge is configured, defer selection
-    if settings.hf_model_id_judge:
-        try:
-            judge = HFJudge()
-            # We need a GameState to include OCR in the prompt; here we fallback to local vote.
-            # The orchestrate() caller has the state; so judge integration will happen there instead.
-        except Exception:
-            pass
+    # HF judge selection happens in orchestrate(), which has the state for the prompt
     # Weighted by score; break ties by fixed priority
     if not candidates:
         raise RuntimeError("No candidates proposed")
     return max(candidates, key=lambda c: c[0])
 
 
-async def orchestrate(state: GameState) -> Candidate:
+async def orchestrate(state: GameState, ctx: PolicyContext | None = None) -> Candidate:
+    """Fan out the agents for one decision; ``ctx`` holds the caller's policy memory.
+
+    A speculative context (``ctx.fork(speculative=True)``) decides without side effects: no
+    profile writes, knowledge jobs, bus steps or HF inference, and its work runs on the
+    speculation pool instead of the agent pool.
+    """
+    global _hf_judge
+    speculative = ctx is not None and ctx.speculative
+    pool = get_speculation_executor() if speculative else get_agent_executor()
+    loop = asyncio.get_running_loop()
     # Learning-first: consult memory before proposing actions to bias away from known dead-ends;
     # optionally enrich memory via lightweight web search if nothing relevant is found
     try:
-        store = MemoryStore()
+        store = get_memory_store()
         hints = (state.ocr_text or "").strip().splitlines()
         query = " ".join(hints[:2]) or ("|".join(state.ocr_tokens[:6]) if state.ocr_tokens else "")
         mem_prefer: set[str] = set()
@@ -191,7 +256,9 @@ async def orchestrate(state: GameState) -> Candidate:
         facts: list[Fact] = []
         if query:
             # Run memory search in parallel with agent proposals
-            mem_task = asyncio.to_thread(store.search, query, 5)
+            mem_task = loop.run_in_executor(
+                pool, functools.partial(store.search, query, 5, namespaces=KNOWLEDGE_NAMESPACES)
+            )
         else:
             mem_task = None
         # We will await mem_task below after proposals are started
@@ -220,51 +287,53 @@ async def orchestrate(state: GameState) -> Candidate:
         return None
 
     agents: list[Callable[[], Candidate]] = [
-        lambda: agent_policy(state),  # Heuristic policy first - most intelligent
-        lambda: agent_mechanics(state),  # Mechanics second - different reasoning
-        lambda: agent_guide_reader(state),  # Guide reader third - contextual help
-        lambda: agent_icons(state),  # Icon-prior last - only as fallback
+        lambda: agent_policy(state, ctx),  # Heuristic policy first - most intelligent
+        lambda: agent_mechanics(state, ctx),  # Mechanics second - different reasoning
+        lambda: agent_guide_reader(state, ctx),  # Guide reader third - contextual help
+        lambda: agent_icons(state, ctx),  # Icon-prior last - only as fallback
     ][: settings.max_agents]
 
+    # Shared base proposal: computed once on the agent pool, then every agent scores it
+    try:
+        await asyncio.wait_for(
+            loop.run_in_executor(pool, base_proposal.get, state, ctx),
+            timeout=settings.agent_timeout_s,
+        )
+    except Exception:
+        pass
+
     round_candidates: list[Candidate] = []
     for _ in range(max(1, settings.debate_rounds)):
-        tasks = [run_with_timeout(fn, settings.agent_timeout_s) for fn in agents]
+        tasks = [run_with_timeout(fn, settings.agent_timeout_s, pool) for fn in agents]
         # Await candidates and, if present, memory results concurrently
         if mem_task is not None:
             results, facts = await asyncio.gather(asyncio.gather(*tasks), mem_task)
+        else:
+            results = await asyncio.gather(*tasks)
+        # A speculative decision only reads memory
+        if mem_task is not None and not speculative:
             await bus.publish_step("memory:search", {"query": (query or "")[:120], "top": [f.title for f in facts[:3]]})
             if not facts and query:
-                # Try web enrichment without blocking too long
+                # Learn about this screen in the background; this decision never waits on the web
                 try:
-                    qwords = (state.ocr_tokens or [])[:5]
-                    q = "Epic Seven " + " ".join(qwords)
-                    seeds = [
-                        f"https://duckduckgo.com/html/?q={q}",
-                        f"https://www.google.com/search?q={q}",
-                    ]
-                    new_docs = await asyncio.to_thread(fetch_urls, seeds)
-                    new_facts = [Fact(id=None, title=d.title, source_url=d.url, summary=summarize(d)) for d in new_docs[:2]]
-                    if new_facts:
-                        store.add_facts(new_facts)
-                        await bus.publish_step("memory:web:add", {"added": [f.title for f in new_facts]})
-                        facts = store.search(query, top_k=5)
+                    qwords = " ".join((state.ocr_tokens or [])[:5])
+                    q = "Epic Seven " + qwords
+                    if get_knowledge_worker().enqueue(q, seed_urls(qwords), source="orchestrator"):
+                        await bus.publish_step("knowledge:queued", {"topic": q[:120], "source": "orchestrator"})
                 except Exception:
                     pass
-        else:
-            results = await asyncio.gather(*tasks)
         candidates = [r for r in results if r is not None]
         # Adjust scores based on memory-derived preferences
         adjusted: list[Candidate] = []
         try:
             for f in facts:
-                tl = f.title.lower()
-                summ = f.summary.lower()
-                for lbl in ("episode", "side story", "battle", "shop", "summon", "event", "sanctuary", "hunt", "arena"):
-                    if lbl in tl or lbl in summ:
-                        if any(s in summ for s in ("locked", "unlock after", "you can enter after")):
-                            mem_discourage.add(lbl)
-                        else:
-                            mem_prefer.add(lbl)
+                # Facts added since namespaces carry their labels; older rows are scanned
+                meta = f.meta if "labels" in f.meta else fact_meta(f.title, f.summary)
+                for lbl in meta["labels"]:
+                    if meta["locked"]:
+                        mem_discourage.add(lbl)
+                    else:
+                        mem_prefer.add(lbl)
         except Exception:
             pass
         for sc, act, who in candidates:
@@ -299,10 +368,11 @@ async def orchestrate(state: GameState) -> Candidate:
             y = int(base_h * (0.30 + random.random() * 0.30))
         return 0.1, TapAction(x=x, y=y), "fallback"
     # Use HF judge if configured
-    if settings.hf_model_id_judge:
+    if settings.hf_model_id_judge and not speculative:
         try:
-            judge = HFJudge()
-            idx, _reason = judge.select(state, round_candidates)
+            if _hf_judge is None:
+                _hf_judge = HFJudge()
+            idx, _reason = _hf_judge.select(state, round_candidates)
             return round_candidates[idx]
         except Exception:
             pass
@@ -17,26 +17,33 @@ from app.services.capture.window_manage import (
     move_resize,
     set_topmost,
 )
-from app.state.encoder import encode_state
+from app.state.encoder import GameState, encode_state
+from app.state.identity import NearDuplicateIndex, StateIdentity, identity_of, same_screen
 from app.agents.orchestrator import orchestrate
-from app.actions.executor import execute
-from app.actions.types import BackAction, WaitAction, SwipeAction
+from app.agents.speculation import Speculator
+from app.actions.executor import execute, execute_batch
+from app.actions.types import ActionBatch, BackAction, SwipeAction, TapAction, WaitAction
+from app.actions.waits import async_wait_for_settle
 from app.telemetry.bus import bus
 from app.safety.guards import (
     detect_external_navigation_text,
     detect_item_change_text,
 )
-from app.services.search.web_ingest import fetch_urls, summarize
-from app.memory.store import MemoryStore, Fact
+from app.memory.knowledge import get_knowledge_worker, seed_urls
+from app.memory.observations import get_ingestor
 from app.metrics.registry import compute_metrics
 from app.analytics.metrics import store as metrics_store
 from app.analytics.session import session, Step
+from app.analytics.replay import TrajectoryRecorder, step_from_decision
+from app.navigation.graph import get_graph
 from app.reliability.flake import FlakeTracker
-from app.policy.cache import DecisionCache
-from app.state.profile import mark_mode_done
-from app.policy.bandit import ContextualBandit
+from app.policy.cache import TieredDecisionCache
+from app.policy.heuristic import PolicyContext
+from app.state.profile import locked_modes, mark_mode_done
+from app.policy.bandit import ContextualBandit, state_features
 from app.analytics.metrics import compute_reward
 from app.perception.ui_elements import detect_ui_buttons
+from app.perception.resources import tracker as resource_tracker
 from app.perception.clickmap import record_tap_outcome, click_score, suggest_explore_points
 from app.perception.interaction_memory import record_element_interaction
 
@@ -53,11 +60,12 @@ class AgentRunner:
         self._last_enforce_ts: float = 0.0
         self._last_resize_ts: float = 0.0
         self._did_initial_enforce: bool = False
-        self._last_ocr_fp: str | None = None
+        self._last_identity: StateIdentity | None = None
         self._unchanged_count: int = 0
         self._last_web_search_ts: float = 0.0
-        self._recent_search_ocr_fp: dict[str, float] = {}
-        self._search_dedupe_window_s: float = 900.0  # 15 minutes per OCR fingerprint
+        # Recent stuck searches keyed by screen identity (near-duplicates share an entry)
+        self._recent_searches: NearDuplicateIndex[float] = NearDuplicateIndex()
+        self._search_dedupe_window_s: float = 900.0  # 15 minutes per screen identity
         # counters for UI stats
         self._frames: int = 0
         self._actions: int = 0
@@ -71,10 +79,12 @@ class AgentRunner:
         self._actions_at_last_fps: int = 0
         self._window_ok: bool = False
         self._flake = FlakeTracker()
-        self._cache = DecisionCache()
-        self._mem_store = MemoryStore()
+        self._cache = TieredDecisionCache()
+        # Policy memory owned by this runner (one per device/session)
+        self._policy_ctx = PolicyContext()
+        self._observations = get_ingestor()
         self._last_frame_save_ts: float = 0.0
-        self._last_state_hash: str | None = None
+        self._last_action_identity: StateIdentity | None = None
         self._last_action_name: str | None = None
         self._repeat_action_count: int = 0
         self._recovery_runs: int = 0
@@ -84,6 +94,16 @@ class AgentRunner:
         self._prev_metric_snapshot: dict[str, float] | None = None
         self._step_counter: int = 0
         self._recent_actions: deque[str] = deque(maxlen=6)
+        # Executed action awaiting its outcome screen: (src identity, action, label, perf ts)
+        self._pending_nav: tuple[StateIdentity, object, str | None, float] | None = None
+        # Whether that action is the one the decision cache serves for its screen
+        self._pending_outcome = False
+        # Decision awaiting its outcome for the trajectory log:
+        # (state, action, who, reward, frame_path)
+        self._pending_traj: tuple[GameState, object, str, float, str | None] | None = None
+        self._recorder: TrajectoryRecorder | None = None
+        # Decisions precomputed for the likely next screens while an action is in flight
+        self._speculator = Speculator()
 
     def get_state(self) -> RunState:
         return self._state
@@ -114,6 +134,13 @@ class AgentRunner:
                 await self._task
         self._state = "stopped"
         self._task = None
+        self._speculator.cancel()
+        with contextlib.suppress(Exception):
+            self._bandit.flush()
+        with contextlib.suppress(Exception):
+            self._observations.flush()
+        with contextlib.suppress(Exception):
+            self._cache.flush()
         self._pause_event.set()
         await bus.publish_status(task="stopped", confidence=None, next_step=None, extra={"agent_state": self._state})
 
@@ -174,6 +201,14 @@ class AgentRunner:
                 await bus.publish_step("capture:end", {"size": getattr(image, 'size', None)})
                 state = encode_state(image)
                 await bus.publish_step("ocr", {"text": (state.ocr_text or "")[:400]})
+                # Resource counters from ROI OCR feed the time series behind compute_metrics
+                if state.resources:
+                    resource_tracker.record(state.resources)
+                    try:
+                        for r in state.resources:
+                            metrics_store.add_point(f"res_{r.name}", float(r.value))
+                    except Exception:
+                        pass
                 # counters
                 self._frames += 1
                 now_fps = time.perf_counter()
@@ -188,39 +223,79 @@ class AgentRunner:
                         actions_per_s = actions_delta / dt if dt > 0 else 0.0
                         metrics_store.add_point("actions_per_s", actions_per_s)
                         self._actions_at_last_fps = self._actions
+                        cache_stats = self._cache.stats()
+                        metrics_store.add_point("cache_hit_rate", cache_stats["hit_rate"])
+                        metrics_store.add_point("cache_latency_saved_ms", cache_stats["latency_saved_ms"])
+                        metrics_store.add_point("cache_staleness_s", cache_stats["staleness_s"])
+                        spec_stats = self._speculator.stats()
+                        metrics_store.add_point("speculation_hit_rate", spec_stats["hit_rate"])
                     except Exception:
                         pass
                     self._last_fps_time = now_fps
-                # Track OCR stability to avoid repeating same actions
-                fp = (state.ocr_text or "").strip().lower()[:200]
-                if self._last_ocr_fp is not None and fp == self._last_ocr_fp:
+                # Track screen stability (perceptual identity) to avoid repeating same actions
+                ident = identity_of(state)
+                if same_screen(self._last_identity, ident):
                     self._unchanged_count += 1
                 else:
                     self._unchanged_count = 0
-                self._last_ocr_fp = fp
+                self._last_identity = ident
+                self._speculator.observe(state)
+                # Close the previous action's transition in the navigation graph
+                if self._pending_nav is not None:
+                    src_ident, prev_action, prev_label, acted_ts = self._pending_nav
+                    self._pending_nav = None
+                    # Outcome feedback for the decision cache: did the screen react?
+                    if self._pending_outcome and not isinstance(prev_action, WaitAction):
+                        with contextlib.suppress(Exception):
+                            self._cache.record_outcome(src_ident, not same_screen(src_ident, ident))
+                    # Clickmap/element outcome of a tap, judged on this frame (no extra capture)
+                    if self._pending_traj is not None and isinstance(prev_action, TapAction):
+                        with contextlib.suppress(Exception):
+                            self._learn_tap_outcome(
+                                self._pending_traj[0],
+                                prev_action,
+                                not same_screen(src_ident, ident),
+                            )
+                    if self._pending_traj is not None and settings.record_trajectories:
+                        prev_state, _, prev_who, prev_reward, prev_frame = self._pending_traj
+                        with contextlib.suppress(Exception):
+                            if self._recorder is None:
+                                self._recorder = TrajectoryRecorder()
+                            self._recorder.record(
+                                step_from_decision(
+                                    prev_state,
+                                    prev_action,  # type: ignore[arg-type]
+                                    prev_who,
+                                    prev_reward,
+                                    changed=not same_screen(src_ident, ident),
+                                    frame_path=prev_frame,
+                                )
+                            )
+                    self._pending_traj = None
+                    try:
+                        title = (state.ocr_lines or [""])[0] if state.ocr_lines else ""
+                        get_graph().record_transition(
+                            src_ident,
+                            prev_action,  # type: ignore[arg-type]
+                            ident,
+                            latency_s=time.perf_counter() - acted_ts,
+                            label=prev_label,
+                            dst_title=title,
+                        )
+                    except Exception:
+                        pass
 
-                # Store a lightweight observation of the current screen into memory for recall
-                try:
-                    title = f"obs:ocr:{int(time.time())}"
-                    summary = (state.ocr_text or "")[:300]
-                    self._mem_store.add_facts([Fact(id=None, title=title, source_url="local:ocr", summary=summary)])
-                except Exception:
-                    pass
-                # Also extract common UI buttons/icons heuristically and store as facts for cross-screen recognition
+                # Record the current screen (and the UI buttons on it) as observations; the
+                # ingestor coalesces repeats and writes batches off the loop
                 try:
+                    self._observations.submit("ocr", "obs:ocr", (state.ocr_text or "")[:300])
                     buttons = detect_ui_buttons(image, state.ocr_text or "", state.ocr_tokens or [])
-                    if buttons:
-                        facts = []
-                        for b in buttons[:8]:
-                            facts.append(
-                                Fact(
-                                    id=None,
-                                    title=f"ui:button:{b.label}",
-                                    source_url="local:ui",
-                                    summary=f"{b.label} at x={b.x},y={b.y},w={b.w},h={b.h}",
-                                )
-                            )
-                        self._mem_store.add_facts(facts)
+                    for b in buttons[:8]:
+                        self._observations.submit(
+                            "ui",
+                            f"ui:button:{b.label}",
+                            f"{b.label} at x={b.x},y={b.y},w={b.w},h={b.h}",
+                        )
                 except Exception:
                     pass
                 # External navigation guard: block actions if UI suggests leaving the game
@@ -306,9 +381,8 @@ class AgentRunner:
                                     return alnum >= 6
                                 hints = [line for line in raw_lines if has_signal(line)][:3]
                                 if hints:
-                                    current_fp = (state.ocr_text or "").strip().lower()[:200]
-                                    last_ts = self._recent_search_ocr_fp.get(current_fp)
-                                    # Skip if we already searched for this OCR fingerprint recently
+                                    last_ts = self._recent_searches.get(ident)
+                                    # Skip if we already searched for this screen recently
                                     if last_ts is not None and (now_perf - last_ts) < self._search_dedupe_window_s:
                                         try:
                                             await bus.publish_step(
@@ -318,34 +392,46 @@ class AgentRunner:
                                         except Exception:
                                             pass
                                     else:
-                                        await bus.publish_step("stuck:search:start", {"hints": hints})
-                                        queries = [f"https://www.google.com/search?q=Epic7%20{h}" for h in hints]
-                                        docs = fetch_urls(queries[:1])  # keep minimal to reduce traffic
-                                        facts = [
-                                            Fact(id=None, title=d.title, source_url=d.url, summary=summarize(d))
-                                            for d in docs
-                                        ]
-                                        if facts:
-                                            self._mem_store.add_facts(facts)
-                                        await bus.publish_step("stuck:search:end", {"facts": [f.title for f in facts]})
+                                        # Fetched by the knowledge worker; it announces the facts as knowledge:learned
+                                        queued = get_knowledge_worker().enqueue(
+                                            " ".join(hints), seed_urls(hints[0]), source="stuck"
+                                        )
+                                        await bus.publish_step("stuck:search:start", {"hints": hints, "queued": queued})
                                         self._last_web_search_ts = now_perf
-                                        # Remember we searched this OCR fingerprint to avoid repeats
-                                        self._recent_search_ocr_fp[current_fp] = now_perf
+                                        # Remember we searched this screen to avoid repeats
+                                        self._recent_searches.put(ident, now_perf)
                     except Exception:
                         pass
 
                 decide_t0 = time.perf_counter()
-                # Use state hash to short-circuit decisions if identical
+                # Use the screen identity to short-circuit decisions on the same (or near-duplicate) screen
                 cached = None
                 try:
-                    if state.state_hash:
+                    if state.identity is not None:
+                        cached = self._cache.get(state.identity)
+                    elif state.state_hash:
                         cached = self._cache.get(state.state_hash)
                 except Exception:
                     cached = None
                 if cached is not None:
+                    self._speculator.cancel()
                     score, action, who = cached
                 else:
-                    score, action, who = await orchestrate(state)
+                    # Served instantly when the previous action landed on a predicted screen
+                    spec = await self._speculator.take(ident)
+                    if spec is not None:
+                        (score, action, who), self._policy_ctx = spec
+                    else:
+                        orchestrate_t0 = time.perf_counter()
+                        score, action, who = await orchestrate(state, self._policy_ctx)
+                        self._cache.note_decision_latency(
+                            (time.perf_counter() - orchestrate_t0) * 1000.0
+                        )
+                # The decision the cache will hold for this screen, before any override below;
+                # only fresh decisions are stored (a cache hit is already there)
+                decided = action
+                decided_score, decided_who = score, who
+                fresh = cached is None
                 # Loop-breaking: if we have repeated same state and TapAction many times, force diverse action
                 try:
                     if self._unchanged_count >= 3 and action.__class__.__name__ == "TapAction":
@@ -407,8 +493,9 @@ class AgentRunner:
                     extra=self._stats_extra(),
                 )
                 # Bandit selection: derive eligible labels from visible buttons; bias via exploration policy
+                chosen_label: str | None = None
+                bandit_ctx = None
                 try:
-                    chosen_label = None
                     eligible: list[str] = []
                     if hasattr(state, "ui_buttons") and state.ui_buttons and state.img_width and state.img_height:
                         for b in state.ui_buttons:
@@ -430,8 +517,8 @@ class AgentRunner:
                     # Encourage exploration more when stuck counter is elevated or if we recently searched same OCR
                     searched_recently_same = False
                     try:
-                        if self._last_ocr_fp and self._last_ocr_fp in self._recent_search_ocr_fp:
-                            _ts = self._recent_search_ocr_fp[self._last_ocr_fp]
+                        _ts = self._recent_searches.get(ident)
+                        if _ts is not None:
                             if (time.perf_counter() - _ts) < self._search_dedupe_window_s:
                                 searched_recently_same = True
                     except Exception:
@@ -439,14 +526,29 @@ class AgentRunner:
                     explore_boost = 0.4 if searched_recently_same else (0.2 if self._unchanged_count >= 2 else 0.0)
                     avoid = []
                     try:
-                        from app.state.profile import is_mode_locked
-                        avoid = [lbl for lbl in eligible if is_mode_locked(lbl)]
+                        locked = locked_modes(eligible)
+                        avoid = [lbl for lbl in eligible if lbl in locked]
                     except Exception:
                         pass
                     if eligible:
-                        selected = self._bandit.select(eligible, self._step_counter, explore_boost=explore_boost, avoid=avoid)
+                        bandit_ctx = state_features(state, self._unchanged_count)
+                        selected = self._bandit.select(
+                            eligible,
+                            self._step_counter,
+                            explore_boost=explore_boost,
+                            avoid=avoid,
+                            context=bandit_ctx,
+                        )
                         if selected and chosen_label and selected != chosen_label:
                             await bus.publish_step("rl:override", {"from": chosen_label, "to": selected})
+                            # Optionally let the bandit drive: tap the selected button instead
+                            target = next((b for b in state.ui_buttons or [] if b.label == selected), None)
+                            if settings.rl_drive_actions and target is not None and isinstance(action, TapAction):
+                                bx = int((target.x + target.w // 2) / max(1, state.img_width) * int(settings.input_base_width))
+                                by = int((target.y + target.h // 2) / max(1, state.img_height) * int(settings.input_base_height))
+                                action = TapAction(x=bx, y=by)
+                                who = f"{who}+rl"
+                                chosen_label = selected
                 except Exception:
                     pass
                 # Save recent frame snapshot to static/frames with OCR JSON for Memory tab (throttled)
@@ -468,9 +570,28 @@ class AgentRunner:
                 except Exception:
                     pass
                 if not settings.dry_run:
-                    # Before execution, capture a hash to detect change after action
-                    before_fp = (state.ocr_text or "").strip().lower()[:200]
                     execute(action)
+                    self._pending_nav = (ident, action, chosen_label, time.perf_counter())
+                    # Loop-break, recovery and bandit overrides say nothing about the cached action
+                    self._pending_outcome = action is decided
+                    frame_path = None
+                    if settings.record_trajectories:
+                        with contextlib.suppress(Exception):
+                            if self._recorder is None:
+                                self._recorder = TrajectoryRecorder()
+                            # The frame this decision was made on, written off the event loop
+                            frame_path = await asyncio.to_thread(self._recorder.save_frame, image)
+                    self._pending_traj = (state, action, who, 0.0, frame_path)
+                    if settings.speculative_targets > 0:
+                        self._speculator.start(
+                            ident,
+                            action,
+                            self._policy_ctx,
+                            orchestrate,
+                            k=int(settings.speculative_targets),
+                            min_prob=float(settings.speculative_min_prob),
+                            skip=lambda i: self._cache.hot.get(i) is not None,
+                        )
                     # naive action counters by class name
                     name = action.__class__.__name__
                     self._recent_actions.append(name)
@@ -503,8 +624,14 @@ class AgentRunner:
                         }
                         # optional: include series last values if present
                         reward = compute_reward(self._prev_metric_snapshot, cur_snapshot)
-                        if reward != 0 and 'chosen_label' in locals() and chosen_label:
-                            self._bandit.update(chosen_label, float(reward))
+                        if self._pending_traj is not None:
+                            self._pending_traj = (
+                                *self._pending_traj[:3],
+                                float(reward),
+                                self._pending_traj[4],
+                            )
+                        if reward != 0 and chosen_label:
+                            self._bandit.update(chosen_label, float(reward), context=bandit_ctx)
                         self._prev_metric_snapshot = cur_snapshot
                         self._step_counter += 1
                     except Exception:
@@ -518,12 +645,16 @@ class AgentRunner:
                         success=True,
                         latency_ms=latency_ms,
                         ocr_fp=ocr_fp,
-                        metrics={},
+                        metrics=dict(compute_metrics(state).__dict__),
                     )
-                    # Populate decision cache for identical states (but avoid caching forced loop-break actions)
+                    # Populate decision cache for identical states with the decision itself, never
+                    # a loop-break/recovery/bandit override (its outcome is not recorded)
                     try:
-                        if state.state_hash and not who.endswith("+loopbreak"):
-                            self._cache.set(state.state_hash, score, action, who)
+                        if fresh:
+                            if state.identity is not None:
+                                self._cache.set(state.identity, decided_score, decided, decided_who)
+                            elif state.state_hash:
+                                self._cache.set(state.state_hash, decided_score, decided, decided_who)
                     except Exception:
                         pass
                     # Append to session replay log (reference saved frame path if available)
@@ -541,60 +672,40 @@ class AgentRunner:
                 except Exception:
                     pass
                 consec_errors = 0
-                # Learn clickmap outcome: for TapAction, observe whether OCR changed
-                try:
-                    if name == "TapAction":
-                        # Re-capture a quick frame to check change minimally
-                        img2 = capture_frame()
-                        st2 = encode_state(img2)
-                        after_fp = (st2.ocr_text or "").strip().lower()[:200]
-                        changed = (after_fp != before_fp)
-                        # Convert the tapped coords to base space (already base) and record
-                        ax = int(getattr(action, "x", 0))
-                        ay = int(getattr(action, "y", 0))
-                        record_tap_outcome(ax, ay, changed)
-                        # If tapped near a known UI button, record element interaction as well
-                        try:
-                            if getattr(state, "ui_buttons", None) and state.img_width and state.img_height:
-                                ix = int(ax / max(1, int(settings.input_base_width)) * state.img_width)
-                                iy = int(ay / max(1, int(settings.input_base_height)) * state.img_height)
-                                closest = None
-                                best_d = 1e9
-                                for b in state.ui_buttons:
-                                    cx = b.x + b.w // 2
-                                    cy = b.y + b.h // 2
-                                    d = (cx - ix) ** 2 + (cy - iy) ** 2
-                                    if d < best_d:
-                                        best_d = d
-                                        closest = b
-                                if closest and getattr(closest, "label", None):
-                                    record_element_interaction(closest.label, changed)
-                        except Exception:
-                            pass
-                except Exception:
-                    pass
                 # Backup/retry mechanic on repeated identical state+action
                 try:
-                    current_hash = getattr(state, "state_hash", None)
                     current_action = name
-                    if current_hash and self._last_state_hash == current_hash and self._last_action_name == current_action:
+                    if same_screen(self._last_action_identity, ident) and self._last_action_name == current_action:
                         self._repeat_action_count += 1
                     else:
                         self._repeat_action_count = 0
-                    self._last_state_hash = current_hash
+                    self._last_action_identity = ident
                     self._last_action_name = current_action
                     if self._repeat_action_count >= 2:
-                        await bus.publish_step("backup:start", {"state_hash": current_hash, "action": current_action, "count": self._repeat_action_count})
+                        await bus.publish_step("backup:start", {"state_id": ident.key, "action": current_action, "count": self._repeat_action_count})
                         if not settings.dry_run:
-                            execute(WaitAction(seconds=0.6))
-                            execute(BackAction())
+                            # Let pending animations finish instead of a fixed pause
+                            await async_wait_for_settle(timeout_s=0.6)
                             base_w = max(1, int(settings.input_base_width))
                             base_h = max(1, int(settings.input_base_height))
                             x = int(base_w * 0.5)
                             y1 = int(base_h * 0.70)
                             y2 = int(base_h * 0.35)
-                            execute(SwipeAction(x1=x, y1=y1, x2=x, y2=y2, duration_ms=300))
-                            execute(WaitAction(seconds=0.4))
+                            # back + swipe in a single device round trip
+                            batch = ActionBatch((
+                                BackAction(),
+                                WaitAction(seconds=0.3),
+                                SwipeAction(x1=x, y1=y1, x2=x, y2=y2, duration_ms=300),
+                            ))
+                            res = await asyncio.to_thread(execute_batch, batch)
+                            with contextlib.suppress(Exception):
+                                metrics_store.add_point("batch_total_ms", res.total_s * 1000.0)
+                            if not res.ok:
+                                await bus.publish_step(
+                                    "batch:failed",
+                                    {"completed": res.completed, "steps": len(batch), "error": (res.error or "")[:200]},
+                                )
+                            await async_wait_for_settle(timeout_s=1.0)
                         self._recovery_runs += 1
                         try:
                             metrics_store.add_point("recovery_runs", float(self._recovery_runs))
@@ -609,7 +720,7 @@ class AgentRunner:
                 consec_errors += 1
                 # Track reliability flake events
                 try:
-                    self._flake.record_error(self._last_ocr_fp)
+                    self._flake.record_error(self._last_identity.key if self._last_identity else None)
                 except Exception:
                     pass
                 backoff = float(settings.error_backoff_s) * min(4.0, 1.0 + consec_errors / 2.0)
@@ -633,6 +744,28 @@ class AgentRunner:
             await asyncio.sleep(max(0.0, interval - elapsed + slow))
 
 
+    def cache_stats(self) -> dict[str, float]:
+        spec = {f"speculation_{k}": v for k, v in self._speculator.stats().items()}
+        obs = {f"observations_{k}": v for k, v in self._observations.stats().items()}
+        learn = {f"knowledge_{k}": v for k, v in get_knowledge_worker().stats().items()}
+        return {**self._cache.stats(), **spec, **obs, **learn}
+
+    def _learn_tap_outcome(self, state: GameState, action: TapAction, changed: bool) -> None:
+        ax = int(action.x)
+        ay = int(action.y)
+        record_tap_outcome(ax, ay, changed)
+        # If tapped near a known UI button, record element interaction as well
+        if not (state.ui_buttons and state.img_width and state.img_height):
+            return
+        ix = int(ax / max(1, int(settings.input_base_width)) * state.img_width)
+        iy = int(ay / max(1, int(settings.input_base_height)) * state.img_height)
+        closest = min(
+            state.ui_buttons,
+            key=lambda b: (b.x + b.w // 2 - ix) ** 2 + (b.y + b.h // 2 - iy) ** 2,
+        )
+        if getattr(closest, "label", None):
+            record_element_interaction(closest.label, changed)
+
     def _stats_extra(self) -> dict[str, float | int]:
         return {
             "fps": round(self._fps, 2),
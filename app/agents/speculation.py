@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from app.navigation.graph import NavigationGraph, get_graph
+from app.policy.heuristic import PolicyContext
+from app.state.encoder import GameState
+from app.state.identity import NearDuplicateIndex, StateIdentity, identity_of
+
+Candidate = tuple[float, object, str]
+Decide = Callable[[GameState, PolicyContext], Awaitable[Candidate]]
+
+
+@dataclass
+class Speculation:
+    ident: StateIdentity
+    prob: float
+    # Forked policy memory the decision was made with; adopted when the speculation is used
+    ctx: PolicyContext
+    task: asyncio.Task[Candidate]
+    started: float
+    finished: float = 0.0
+
+
+class Speculator:
+    """Decides ahead for the screens an in-flight action most likely leads to.
+
+    The navigation graph predicts the next screens; the last observed ``GameState`` of each
+    screen stands in for the frame that has not arrived yet. When the next frame matches a
+    prediction (same screen within tolerance) its decision is served without running the agents.
+    """
+
+    def __init__(self, max_snapshots: int = 256, tolerance: int | None = None) -> None:
+        self.max_snapshots = max(1, int(max_snapshots))
+        self._snapshots: NearDuplicateIndex[GameState] = NearDuplicateIndex(tolerance)
+        self._order: OrderedDict[str, StateIdentity] = OrderedDict()
+        self._inflight: list[Speculation] = []
+        self.launched = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+
+    # --- screen snapshots ------------------------------------------------
+    def observe(self, state: GameState) -> None:
+        ident = identity_of(state)
+        self._snapshots.put(ident, state)
+        self._order[ident.key] = ident
+        self._order.move_to_end(ident.key)
+        while len(self._order) > self.max_snapshots:
+            _, old = self._order.popitem(last=False)
+            self._snapshots.remove(old)
+
+    def snapshot(self, ident: StateIdentity) -> GameState | None:
+        return self._snapshots.get(ident)
+
+    # --- speculation -----------------------------------------------------
+    def start(
+        self,
+        src: StateIdentity,
+        action: object,
+        ctx: PolicyContext,
+        decide: Decide,
+        k: int = 2,
+        min_prob: float = 0.2,
+        skip: Callable[[StateIdentity], bool] | None = None,
+        graph: NavigationGraph | None = None,
+    ) -> int:
+        """Launch decisions for the ``k`` likeliest next screens; returns how many started."""
+        self.cancel()
+        g = graph or get_graph()
+        try:
+            targets = g.likely_next(src, action, k=k, min_prob=min_prob)  # type: ignore[arg-type]
+        except Exception:
+            return 0
+        for key, prob in targets:
+            ident = StateIdentity.from_key(key)
+            if skip is not None and skip(ident):
+                continue
+            state = self.snapshot(ident)
+            if state is None:
+                continue
+            # Speculative fork: the decision leaves the profile, knowledge queue and bus alone
+            fork = ctx.fork(speculative=True)
+            spec = Speculation(
+                ident, prob, fork, asyncio.ensure_future(decide(state, fork)), time.perf_counter()
+            )
+            spec.task.add_done_callback(
+                lambda _t, s=spec: setattr(s, "finished", time.perf_counter())
+            )
+            self._inflight.append(spec)
+            self.launched += 1
+        return len(self._inflight)
+
+    async def take(
+        self, ident: StateIdentity, tolerance: int | None = None
+    ) -> tuple[Candidate, PolicyContext] | None:
+        """Decision speculated for the screen ``ident`` (awaiting it if still running), else None.
+
+        Every other in-flight speculation is cancelled.
+        """
+        inflight, self._inflight = self._inflight, []
+        if not inflight:
+            return None
+        match = min(
+            (s for s in inflight if s.ident.distance(ident) <= self._tolerance(tolerance)),
+            key=lambda s: s.ident.distance(ident),
+            default=None,
+        )
+        for s in inflight:
+            if s is not match:
+                s.task.cancel()
+        if match is None:
+            self.misses += 1
+            return None
+        needed = time.perf_counter()
+        try:
+            result = await match.task
+        except asyncio.CancelledError:
+            if not match.task.cancelled():
+                raise
+            self.misses += 1
+            return None
+        except Exception:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Decision time already spent before the frame needed it
+        ready = match.finished if match.finished else needed
+        self.saved_ms += max(0.0, (min(ready, needed) - match.started) * 1000.0)
+        # Adopted: the fork becomes the live context and decides with side effects again
+        match.ctx.speculative = False
+        return result, match.ctx
+
+    def cancel(self) -> None:
+        for s in self._inflight:
+            s.task.cancel()
+        self._inflight = []
+
+    def _tolerance(self, tolerance: int | None) -> int:
+        return self._snapshots.tolerance if tolerance is None else int(tolerance)
+
+    def stats(self) -> dict[str, float]:
+        used = self.hits + self.misses
+        return {
+            "launched": float(self.launched),
+            "hits": float(self.hits),
+            "misses": float(self.misses),
+            "hit_rate": self.hits / used if used else 0.0,
+            "saved_ms": self.saved_ms,
+            "snapshots": float(len(self._order)),
+        }
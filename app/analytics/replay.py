@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import json
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from PIL import Image
+
+from app.actions.types import Action, TapAction, action_from_dict, action_to_dict
+from app.config import settings
+from app.navigation.graph import action_signature
+from app.perception.ui_elements import ResourceCounter, UiButton
+from app.state.encoder import GameState
+from app.state.identity import StateIdentity
+
+TRAJECTORY_DIR = Path("data/trajectories")
+
+# A policy maps a recorded state to the action it would have taken (None = abstain)
+Policy = Callable[[GameState], Action | None]
+
+
+# --- (de)serialization -------------------------------------------------------
+def state_to_dict(state: GameState) -> dict[str, Any]:
+    obj = asdict(state)
+    obj["identity"] = state.identity.key if state.identity is not None else None
+    return obj
+
+
+def state_from_dict(obj: dict[str, Any]) -> GameState:
+    ident = obj.get("identity")
+    return GameState(
+        timestamp_utc=str(obj.get("timestamp_utc", "")),
+        stamina_current=obj.get("stamina_current"),
+        stamina_cap=obj.get("stamina_cap"),
+        ocr_text=str(obj.get("ocr_text", "")),
+        ocr_lines=list(obj.get("ocr_lines") or []),
+        ocr_tokens=list(obj.get("ocr_tokens") or []),
+        state_hash=obj.get("state_hash"),
+        ui_buttons=[UiButton(**b) for b in obj["ui_buttons"]] if obj.get("ui_buttons") else None,
+        img_width=obj.get("img_width"),
+        img_height=obj.get("img_height"),
+        identity=StateIdentity.from_key(ident) if ident else None,
+        resources=(
+            [ResourceCounter(**r) for r in obj["resources"]] if obj.get("resources") else None
+        ),
+    )
+
+
+@dataclass(frozen=True)
+class TrajectoryStep:
+    state: GameState
+    action: dict[str, Any]
+    who: str = ""
+    reward: float = 0.0
+    # Whether the screen reacted to the action (None when unknown)
+    changed: bool | None = None
+    # Frame the state was read from, saved by ``TrajectoryRecorder.save_frame``
+    frame_path: str | None = None
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "state": state_to_dict(self.state),
+                "action": self.action,
+                "who": self.who,
+                "reward": self.reward,
+                "changed": self.changed,
+                "frame_path": self.frame_path,
+            },
+            ensure_ascii=False,
+        )
+
+    @classmethod
+    def from_json(cls, line: str) -> TrajectoryStep:
+        obj = json.loads(line)
+        return cls(
+            state=state_from_dict(obj["state"]),
+            action=dict(obj.get("action") or {}),
+            who=str(obj.get("who", "")),
+            reward=float(obj.get("reward", 0.0)),
+            changed=obj.get("changed"),
+            frame_path=obj.get("frame_path"),
+        )
+
+
+class TrajectoryRecorder:
+    """Appends (frame, state, action, outcome) steps of a live session to a JSONL file.
+
+    Frames are saved as JPEGs in a directory named after the file (``session_x/``).
+    """
+
+    def __init__(self, path: Path | str | None = None) -> None:
+        if path is None:
+            path = TRAJECTORY_DIR / f"session_{time.strftime('%Y%m%d_%H%M%S')}.jsonl"
+        self.path = Path(path)
+        self.frames_dir = self.path.with_suffix("")
+        self._lock = threading.Lock()
+        self._frames = 0
+
+    def save_frame(self, image: Image.Image) -> str | None:
+        """Save the frame a decision was made on; its path goes in the step's ``frame_path``."""
+        with self._lock:
+            self._frames += 1
+            path = self.frames_dir / f"frame_{self._frames:06d}.jpg"
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            image.convert("RGB").save(path, quality=85)
+        except Exception:
+            return None
+        return str(path)
+
+    def record(self, step: TrajectoryStep) -> None:
+        line = step.to_json()
+        with self._lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except Exception:
+                pass
+
+
+def load_trajectory(path: Path | str) -> Iterator[TrajectoryStep]:
+    with Path(path).open(encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield TrajectoryStep.from_json(line)
+            except Exception:
+                continue
+
+
+# --- policies ------------------------------------------------------------------
+def _heuristic_policy() -> Policy:
+    from app.policy.heuristic import PolicyContext, propose_action
+
+    ctx = PolicyContext()
+
+    def run(state: GameState) -> Action | None:
+        _, action = propose_action(state, ctx)
+        return action  # type: ignore[return-value]
+
+    return run
+
+
+def _hf_policy() -> Policy:
+    from app.services.hf.policy import HFPolicy
+
+    hf = HFPolicy()
+    return lambda state: hf.propose(state).action
+
+
+def _bandit_policy() -> Policy:
+    from app.policy.bandit import ContextualBandit, state_features
+
+    # Loads the persisted model; replay never calls update(), so nothing is written back
+    bandit = ContextualBandit(
+        labels=["episode", "side story", "battle", "hunt", "arena", "summon", "shop", "sanctuary"]
+    )
+    step = 0
+
+    def run(state: GameState) -> Action | None:
+        nonlocal step
+        buttons = [b for b in state.ui_buttons or [] if b.label]
+        if not buttons or not state.img_width or not state.img_height:
+            return None
+        labels = [str(b.label) for b in buttons]
+        label = bandit.select(labels, step, context=state_features(state))
+        step += 1
+        target = next((b for b in buttons if b.label == label), None)
+        if target is None:
+            return None
+        x = int((target.x + target.w // 2) / state.img_width * int(settings.input_base_width))
+        y = int((target.y + target.h // 2) / state.img_height * int(settings.input_base_height))
+        return TapAction(x=x, y=y)
+
+    return run
+
+
+POLICIES: dict[str, Callable[[], Policy]] = {
+    "heuristic": _heuristic_policy,
+    "hf": _hf_policy,
+    "bandit": _bandit_policy,
+}
+
+
+# --- evaluation ----------------------------------------------------------------
+@dataclass
+class EvalReport:
+    policy: str
+    steps: int = 0
+    agreed: int = 0
+    abstained: int = 0
+    errors: int = 0
+    logged_reward: float = 0.0
+    # Sum of logged rewards on steps where the policy picked the logged action
+    matched_reward: float = 0.0
+    elapsed_s: float = 0.0
+    trajectories: list[str] = field(default_factory=list)
+
+    @property
+    def agreement(self) -> float:
+        return self.agreed / self.steps if self.steps else 0.0
+
+    @property
+    def estimated_reward(self) -> float:
+        """Replay estimate: mean logged reward over the steps where the policy agrees."""
+        return self.matched_reward / self.agreed if self.agreed else 0.0
+
+    @property
+    def decisions_per_s(self) -> float:
+        return self.steps / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    def merge(self, other: EvalReport) -> None:
+        self.steps += other.steps
+        self.agreed += other.agreed
+        self.abstained += other.abstained
+        self.errors += other.errors
+        self.logged_reward += other.logged_reward
+        self.matched_reward += other.matched_reward
+        self.elapsed_s += other.elapsed_s
+        self.trajectories.extend(other.trajectories)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "policy": self.policy,
+            "steps": self.steps,
+            "agreement": self.agreement,
+            "estimated_reward": self.estimated_reward,
+            "logged_reward": self.logged_reward / self.steps if self.steps else 0.0,
+            "decisions_per_s": self.decisions_per_s,
+            "abstained": self.abstained,
+            "errors": self.errors,
+            "trajectories": self.trajectories,
+        }
+
+
+def actions_agree(a: Action, b: Action) -> bool:
+    """Same kind and, for taps/swipes, the same coarse target (clickmap cell / direction)."""
+    if a.kind != b.kind:
+        return False
+    return action_signature(a) == action_signature(b)
+
+
+def replay(steps: Iterable[TrajectoryStep], policy: Policy, name: str = "custom") -> EvalReport:
+    report = EvalReport(policy=name)
+    t0 = time.perf_counter()
+    for step in steps:
+        report.steps += 1
+        report.logged_reward += step.reward
+        try:
+            proposed = policy(step.state)
+        except Exception:
+            report.errors += 1
+            continue
+        if proposed is None:
+            report.abstained += 1
+            continue
+        try:
+            logged = action_from_dict(step.action)
+        except ValueError:
+            continue
+        if actions_agree(proposed, logged):
+            report.agreed += 1
+            report.matched_reward += step.reward
+    report.elapsed_s = time.perf_counter() - t0
+    return report
+
+
+def evaluate_file(path: str, policy_name: str) -> EvalReport:
+    # Policies mark modes locked/done as they go; keep replays away from the live profile
+    from app.state import profile as profile_mod
+
+    live = profile_mod.profile
+    with tempfile.TemporaryDirectory() as tmp:
+        profile_mod.profile = profile_mod.ProfileService(path=Path(tmp) / "profile.json")
+        try:
+            report = replay(load_trajectory(path), POLICIES[policy_name](), name=policy_name)
+        finally:
+            profile_mod.profile = live
+    report.trajectories.append(str(path))
+    return report
+
+
+def evaluate(paths: Iterable[Path | str], policy_name: str, workers: int = 1) -> EvalReport:
+    """Replay every trajectory file through ``policy_name``; files run in parallel processes.
+
+    Each trajectory gets a fresh policy instance (its own context), as a new session would.
+    """
+    if policy_name not in POLICIES:
+        raise ValueError(f"Unknown policy: {policy_name}")
+    files = [str(p) for p in paths]
+    total = EvalReport(policy=policy_name)
+    wall0 = time.perf_counter()
+    if workers <= 1 or len(files) <= 1:
+        for f in files:
+            total.merge(evaluate_file(f, policy_name))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+            for rep in pool.map(evaluate_file, files, [policy_name] * len(files)):
+                total.merge(rep)
+    # throughput is measured against wall-clock time, which is what parallelism buys
+    total.elapsed_s = time.perf_counter() - wall0
+    return total
+
+
+def step_from_decision(
+    state: GameState,
+    action: Action,
+    who: str,
+    reward: float,
+    changed: bool | None,
+    frame_path: str | None = None,
+) -> TrajectoryStep:
+    return TrajectoryStep(
+        state=state,
+        action=action_to_dict(action),
+        who=who,
+        reward=reward,
+        changed=changed,
+        frame_path=frame_path,
+    )
@@ -106,6 +106,40 @@ def build_arg_parser() -> argparse.ArgumentParser:
     p_doc = sub.add_parser("doctor", help="Check device display and suggest fixes for Epic7")
     p_doc.set_defaults(func=cmd_doctor)
 
+    p_bb = sub.add_parser(
+        "bandit-bench", help="Replay a synthetic workload and measure bandit regret"
+    )
+    p_bb.add_argument("--events", type=int, default=5000, help="Number of replayed decisions")
+    p_bb.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic workload")
+    p_bb.add_argument("--output", default="bandit_bench.json", help="Where to write the report")
+    p_bb.set_defaults(func=cmd_bandit_bench)
+
+    p_rp = sub.add_parser("replay-eval", help="Replay recorded trajectories through a policy")
+    p_rp.add_argument("paths", nargs="*", help="Trajectory JSONL files (default: all recorded)")
+    p_rp.add_argument("--policy", default="heuristic", choices=["heuristic", "hf", "bandit"])
+    p_rp.add_argument("--workers", type=int, default=4, help="Parallel worker processes")
+    p_rp.add_argument("--output", default="replay_eval.json", help="Where to write the report")
+    p_rp.set_defaults(func=cmd_replay_eval)
+
+    p_hb = sub.add_parser("hf-bench", help="HF policy tokens/latency with and without constraints")
+    p_hb.add_argument("--decisions", type=int, default=20, help="Decisions per mode")
+    p_hb.add_argument("--output", default="hf_bench.json", help="Where to write the report")
+    p_hb.set_defaults(func=cmd_hf_bench)
+
+    p_mb = sub.add_parser("memory-bench", help="Recall/latency of flat, HNSW and IVF-PQ indexes")
+    p_mb.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="Corpus sizes"
+    )
+    p_mb.add_argument("--queries", type=int, default=200, help="Queries per size")
+    p_mb.add_argument("--k", type=int, default=10, help="Neighbours per query (recall@k)")
+    p_mb.add_argument("--output", default="memory_bench.json", help="Where to write the report")
+    p_mb.set_defaults(func=cmd_memory_bench)
+
+    p_qb = sub.add_parser("query-bench", help="Memory search latency with a cold vs cached query")
+    p_qb.add_argument("--repeats", type=int, default=200, help="Cached lookups to time")
+    p_qb.add_argument("--output", default="query_bench.json", help="Where to write the report")
+    p_qb.set_defaults(func=cmd_query_bench)
+
     return parser
 
 
@@ -190,5 +224,106 @@ def cmd_doctor(_args: argparse.Namespace) -> int:
     return 0
 
 
+def cmd_bandit_bench(args: argparse.Namespace) -> int:
+    import random
+    import tempfile
+
+    from app.policy.bandit import ContextualBandit, replay_regret, synthetic_events
+
+    labels = ["episode", "side story", "battle", "hunt", "arena", "summon", "shop", "sanctuary"]
+    events = synthetic_events(labels, int(args.events), seed=int(args.seed))
+    report: dict[str, dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for method in ("linucb", "bandit"):
+            random.seed(int(args.seed))
+            prev = settings.rl_method
+            settings.rl_method = method
+            try:
+                bandit = ContextualBandit(labels, persist_path=str(Path(tmp) / f"{method}.json"))
+                report[method] = replay_regret(bandit, events)
+            finally:
+                settings.rl_method = prev
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0
+
+
+def cmd_hf_bench(args: argparse.Namespace) -> int:
+    from app.analytics.replay import TRAJECTORY_DIR, load_trajectory
+    from app.services.hf.policy import benchmark_policy
+    from app.state.encoder import GameState
+
+    # Prefer real recorded screens; fall back to a few typical OCR snippets
+    states: list[GameState] = []
+    for path in sorted(TRAJECTORY_DIR.glob("*.jsonl")):
+        states.extend(step.state for step in load_trajectory(path))
+        if len(states) >= int(args.decisions):
+            break
+    if not states:
+        texts = ["Lobby Adventure Arena Summon", "Stage Clear Confirm", "Hunt Wyvern Ready"]
+        states = [
+            GameState(
+                timestamp_utc="", stamina_current=None, stamina_cap=None,
+                ocr_text=t, ocr_lines=[t], ocr_tokens=t.split(),
+            )
+            for t in texts
+        ]
+    states = (states * (int(args.decisions) // len(states) + 1))[: int(args.decisions)]
+    report = {
+        "free_form": benchmark_policy(states, constrained=False),
+        "constrained": benchmark_policy(states, constrained=True),
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0
+
+
+def cmd_memory_bench(args: argparse.Namespace) -> int:
+    from dataclasses import asdict
+
+    from app.memory.index import benchmark
+
+    results = benchmark(list(args.sizes), queries=int(args.queries), k=int(args.k))
+    report = [asdict(r) for r in results]
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0
+
+
+def cmd_query_bench(args: argparse.Namespace) -> int:
+    import tempfile
+
+    from app.memory.store import Fact, MemoryStore
+
+    words = ["arena", "battle", "shop", "summon", "hunt", "energy", "gold", "guide"]
+    with tempfile.TemporaryDirectory() as tmp:
+        store = MemoryStore(db_path=str(Path(tmp) / "bench.sqlite3"))
+        store.add_facts([Fact(None, w, "bench", f"{w} tips") for w in words])
+        store.warm()
+        t0 = time.perf_counter()
+        store.search("energy hunt", 3, mode="vector")
+        cold_ms = (time.perf_counter() - t0) * 1000.0
+        lat: list[float] = []
+        for _ in range(max(1, int(args.repeats))):
+            t1 = time.perf_counter()
+            store.search("energy hunt", 3, mode="vector")
+            lat.append((time.perf_counter() - t1) * 1000.0)
+        lat.sort()
+        report = {
+            "cold_ms": cold_ms,
+            "cached_p50_ms": lat[len(lat) // 2],
+            "cached_p95_ms": lat[min(len(lat) - 1, int(len(lat) * 0.95))],
+            "query_cache_hits": float(store.query_cache_hits),
+        }
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0
+
+
+def cmd_replay_eval(args: argparse.Namespace) -> int:
+    from app.analytics.replay import TRAJECTORY_DIR, evaluate
+
+    paths = list(args.paths) or sorted(str(p) for p in TRAJECTORY_DIR.glob("*.jsonl"))
+    report = evaluate(paths, args.policy, workers=int(args.workers))
+    Path(args.output).write_text(json.dumps(report.to_dict(), indent=2), encoding="utf-8")
+    return 0
+
+
 if __name__ == "__main__":  # pragma: no cover
     raise SystemExit(main())
@@ -21,6 +21,8 @@ class Settings(BaseSettings):
     ocr_multi_pass: bool = Field(default=True, alias="OCR_MULTI_PASS")
     ocr_ensemble: bool = Field(default=True, alias="OCR_ENSEMBLE")
     ocr_engines: str = Field(default="paddle,tesseract_batched,tesseract", alias="OCR_ENGINES")
+    # Digits-only OCR of fixed counter ROIs (stamina/gold/skystones) on every frame
+    resource_roi_ocr: bool = Field(default=True, alias="RESOURCE_ROI_OCR")
 
     # AVD / ADB Configuration
     avd_name: str = Field(default="Pixel_9a", alias="AVD_NAME")
@@ -68,12 +70,83 @@ class Settings(BaseSettings):
     hf_model_id_policy: str | None = Field(default=None, alias="HF_MODEL_ID_POLICY")
     hf_model_id_judge: str | None = Field(default=None, alias="HF_MODEL_ID_JUDGE")
     hf_inference_endpoint_url: str | None = Field(default=None, alias="HF_INFERENCE_ENDPOINT_URL")
+    # Shared local inference server: generation cap and request batching
+    hf_max_new_tokens: int = Field(default=96, alias="HF_MAX_NEW_TOKENS")
+    hf_batch_max: int = Field(default=8, alias="HF_BATCH_MAX")
+    hf_batch_window_ms: float = Field(default=10.0, alias="HF_BATCH_WINDOW_MS")
+    # Restrict HF policy output to the action JSON grammar (always parses, fewer tokens)
+    hf_constrained_decoding: bool = Field(default=True, alias="HF_CONSTRAINED_DECODING")
+    # Response cache keyed by (model, prompt version, screen identity, judge candidates)
+    hf_cache_enabled: bool = Field(default=True, alias="HF_CACHE_ENABLED")
+    hf_cache_ttl_s: float = Field(default=900.0, alias="HF_CACHE_TTL_S")
+    hf_cache_max_entries: int = Field(default=4096, alias="HF_CACHE_MAX_ENTRIES")
+    # Empty keeps the cache in memory only
+    hf_cache_path: str = Field(default="data/hf_response_cache.json", alias="HF_CACHE_PATH")
 
     # Memory & knowledge
     db_path: str = Field(default="data/app.sqlite3", alias="DB_PATH")
     embedding_model_id: str = Field(
         default="sentence-transformers/all-MiniLM-L6-v2", alias="EMBEDDING_MODEL_ID"
     )
+    # Load the embedder and build the memory index when the API starts (in the background)
+    memory_warm_on_startup: bool = Field(default=True, alias="MEMORY_WARM_ON_STARTUP")
+    # Fact search: hybrid (BM25 + vectors, RRF) | lexical | vector
+    memory_search_mode: str = Field(default="hybrid", alias="MEMORY_SEARCH_MODE")
+    # Hybrid queries of at most this many terms are answered by BM25 alone when it fills top_k
+    memory_lexical_max_terms: int = Field(default=4, alias="MEMORY_LEXICAL_MAX_TERMS")
+    memory_query_cache_size: int = Field(default=1024, alias="MEMORY_QUERY_CACHE_SIZE")
+    # Web facts expire after this many days (0 = keep forever)
+    memory_web_ttl_days: float = Field(default=30.0, alias="MEMORY_WEB_TTL_DAYS")
+    # Vector index: auto = flat, promoted to HNSW at PROMOTE_AT facts and IVF-PQ at IVF_AT
+    memory_index_kind: str = Field(default="auto", alias="MEMORY_INDEX_KIND")  # auto|flat|hnsw|ivfpq
+    memory_index_promote_at: int = Field(default=20000, alias="MEMORY_INDEX_PROMOTE_AT")
+    memory_index_ivf_at: int = Field(default=500000, alias="MEMORY_INDEX_IVF_AT")
+    memory_hnsw_m: int = Field(default=32, alias="MEMORY_HNSW_M")
+    memory_hnsw_ef_search: int = Field(default=64, alias="MEMORY_HNSW_EF_SEARCH")
+    memory_ivf_nprobe: int = Field(default=16, alias="MEMORY_IVF_NPROBE")
+
+    # Web ingestion: pooled async client, per-host token bucket, on-disk page cache
+    web_max_concurrency: int = Field(default=4, alias="WEB_MAX_CONCURRENCY")
+    web_host_rate: float = Field(default=1.0, alias="WEB_HOST_RATE")  # requests/s per host
+    web_host_burst: float = Field(default=2.0, alias="WEB_HOST_BURST")
+    web_timeout_s: float = Field(default=15.0, alias="WEB_TIMEOUT_S")
+    # Empty disables the disk cache
+    web_cache_dir: str = Field(default="data/web_cache", alias="WEB_CACHE_DIR")
+    # Pages younger than this are served without revalidating
+    web_cache_ttl_s: float = Field(default=3600.0, alias="WEB_CACHE_TTL_S")
+    web_cache_max_entries: int = Field(default=2000, alias="WEB_CACHE_MAX_ENTRIES")
+    web_respect_robots: bool = Field(default=True, alias="WEB_RESPECT_ROBOTS")
+    web_user_agent: str = Field(default="auto-gaming/0.1", alias="WEB_USER_AGENT")
+
+    # Document processing: each page becomes a summary fact plus overlapping passage facts,
+    # at most DOC_MAX_CHUNKS passages (embeddings) per page
+    doc_chunk_words: int = Field(default=120, alias="DOC_CHUNK_WORDS")
+    doc_chunk_overlap: int = Field(default=30, alias="DOC_CHUNK_OVERLAP")
+    doc_max_chunks: int = Field(default=6, alias="DOC_MAX_CHUNKS")
+    doc_summary_sentences: int = Field(default=3, alias="DOC_SUMMARY_SENTENCES")
+
+    # Background knowledge ingestion ("learn about X" jobs queued by the decision path)
+    knowledge_queue_max: int = Field(default=64, alias="KNOWLEDGE_QUEUE_MAX")
+    knowledge_workers: int = Field(default=2, alias="KNOWLEDGE_WORKERS")
+    # A topic learned this recently is not queued again
+    knowledge_repeat_s: float = Field(default=1800.0, alias="KNOWLEDGE_REPEAT_S")
+    knowledge_max_urls: int = Field(default=2, alias="KNOWLEDGE_MAX_URLS")
+    # Comma-separated page templates a topic is learned from ({q} = URL-encoded terms). Search
+    # engine result pages are disallowed by their robots.txt, so they would never be fetched
+    knowledge_seed_urls: str = Field(
+        default="https://epic7x.com/?s={q}", alias="KNOWLEDGE_SEED_URLS"
+    )
+
+    # State identity (perceptual hash + token MinHash); max Hamming bits for "same screen"
+    state_identity_tolerance: int = Field(default=8, alias="STATE_IDENTITY_TOLERANCE")
+
+    # Persistent decision cache (SQLite tier behind the in-memory LRU)
+    decision_cache_db_path: str = Field(
+        default="data/decisions.sqlite3", alias="DECISION_CACHE_DB_PATH"
+    )
+    decision_cache_max_age_s: float = Field(default=7 * 86400.0, alias="DECISION_CACHE_MAX_AGE_S")
+    # Stored decisions whose smoothed success rate falls below this are not served
+    decision_cache_min_success: float = Field(default=0.35, alias="DECISION_CACHE_MIN_SUCCESS")
 
     # Game-Specific Settings (Epic Seven)
     game_name: str = Field(default="Epic Seven", alias="GAME_NAME")
@@ -100,10 +173,31 @@ class Settings(BaseSettings):
 
     # Reinforcement Learning (bandit)
     rl_enabled: bool = Field(default=True, alias="RL_ENABLED")
-    rl_method: str = Field(default="bandit", alias="RL_METHOD")  # bandit|off
+    rl_method: str = Field(default="linucb", alias="RL_METHOD")  # linucb|bandit|off
     rl_eps_start: float = Field(default=0.35, alias="RL_EPS_START")
     rl_eps_end: float = Field(default=0.15, alias="RL_EPS_END")
     rl_persist_path: str = Field(default="data/policy.json", alias="RL_PERSIST_PATH")
+    rl_alpha: float = Field(default=0.8, alias="RL_ALPHA")  # LinUCB exploration bonus
+    rl_flush_every: int = Field(default=16, alias="RL_FLUSH_EVERY")  # rewards per model update
+    # Let the bandit's pick replace the proposed tap when its label is visible on screen
+    rl_drive_actions: bool = Field(default=False, alias="RL_DRIVE_ACTIONS")
+
+    # Speculative decisions for the likeliest next screens while an action is in flight (0 = off)
+    speculative_targets: int = Field(default=0, alias="SPECULATIVE_TARGETS")
+    speculative_min_prob: float = Field(default=0.2, alias="SPECULATIVE_MIN_PROB")
+    # Threads for speculative decisions, apart from the agent pool
+    speculative_workers: int = Field(default=2, alias="SPECULATIVE_WORKERS")
+
+    # Offline evaluation: append (state, action, outcome) steps to data/trajectories/*.jsonl
+    record_trajectories: bool = Field(default=False, alias="RECORD_TRAJECTORIES")
+
+    # Per-frame observations: deduplicated, batch-flushed, capped table separate from facts
+    observation_max_rows: int = Field(default=20000, alias="OBSERVATION_MAX_ROWS")
+    observation_retention_days: int = Field(default=14, alias="OBSERVATION_RETENTION_DAYS")
+    observation_flush_s: float = Field(default=5.0, alias="OBSERVATION_FLUSH_S")
+    observation_batch: int = Field(default=256, alias="OBSERVATION_BATCH")
+    # Cosine similarity above which new content folds into a recent observation (0 = off)
+    observation_near_dup: float = Field(default=0.97, alias="OBSERVATION_NEAR_DUP")
 
 
 settings = Settings()
@@ -2,24 +2,63 @@ from __future__ import annotations
 
 import time
 
+from PIL import Image
+
 from app.actions.executor import execute
 from app.actions.types import TapAction
+from app.actions.waits import WaitResult, wait_for_screen, wait_for_transition
 from app.games.epic7.presets import DEFAULT_PRESET
+from app.navigation.graph import get_graph
 from app.services.capture import capture_frame
 from app.state.encoder import encode_state
+from app.state.identity import StateIdentity, identity_of
+
+
+def _observe(res: WaitResult | None = None) -> tuple[Image.Image, StateIdentity]:
+    """Identity of the frame a wait ended on (or a fresh capture)."""
+    image = res.image if res is not None and res.image is not None else capture_frame()
+    return image, identity_of(encode_state(image))
+
+
+def navigate_to(target: str, max_hops: int = 8, hop_timeout_s: float = 5.0) -> bool:
+    """Walk the learned navigation graph to ``target``; False when no path is known or a hop fails.
+
+    Each hop is verified against the planned destination and fed back into the graph, so a
+    failing edge loses reliability and the next call replans around it.
+    """
+    graph = get_graph()
+    _, cur = _observe()
+    path = graph.plan(cur, target, max_hops=max_hops)
+    if path is None:
+        return False
+    for hop in path:
+        t0 = time.perf_counter()
+        execute(hop.action)
+        # Returns as soon as the expected screen shows up; slow transitions get the full timeout
+        res = wait_for_screen(StateIdentity.from_key(hop.dst), timeout_s=hop_timeout_s)
+        _, nxt = _observe(res)
+        graph.record_transition(cur, hop.action, nxt, latency_s=time.perf_counter() - t0)
+        if graph.resolve(nxt) != hop.dst:
+            return False
+        cur = nxt
+    return True
 
 
 def navigate_to_adventure() -> None:
-    # home -> battle -> adventure
-    x, y = DEFAULT_PRESET.anchors["home_daily"]
-    execute(TapAction(x=x, y=y))
-    time.sleep(1.0)
-    x, y = DEFAULT_PRESET.anchors["battle"]
-    execute(TapAction(x=x, y=y))
-    time.sleep(1.0)
-    x, y = DEFAULT_PRESET.anchors["battle_event"]
-    execute(TapAction(x=x, y=y))
-    time.sleep(1.0)
+    if navigate_to("adventure"):
+        return
+    # Unknown route yet: home -> battle -> adventure via fixed anchors (the graph learns from it)
+    graph = get_graph()
+    image, cur = _observe()
+    route = (("home_daily", None), ("battle", "battle"), ("battle_event", "adventure"))
+    for anchor, label in route:
+        x, y = DEFAULT_PRESET.anchors[anchor]
+        action = TapAction(x=x, y=y)
+        t0 = time.perf_counter()
+        execute(action)
+        image, nxt = _observe(wait_for_transition(image))
+        graph.record_transition(cur, action, nxt, latency_s=time.perf_counter() - t0, label=label)
+        cur = nxt
 
 
 def start_stage_run() -> None:
@@ -35,5 +74,5 @@ def run_daily_missions(max_steps: int = 10) -> None:
         _ = encode_state(img)
         # For MVP, just attempt to start stage repeatedly
         start_stage_run()
-        time.sleep(2.0)
+        wait_for_transition(img, change_timeout_s=2.0, settle_timeout_s=5.0)
         steps += 1
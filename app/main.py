@@ -1,17 +1,48 @@
+import asyncio
+import contextlib
 import logging
+from collections.abc import AsyncIterator
 from pathlib import Path
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.config import settings
+from app.memory.knowledge import get_knowledge_worker
+from app.memory.observations import get_ingestor
+from app.memory.store import get_memory_store
+from app.services.search.web_ingest import get_web_ingestor
 from app.routes.analytics import router as analytics_router
 from app.routes.telemetry import router as telemetry_router
 from app.logging_config import configure_logging
 
 
+@contextlib.asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    # Load the shared embedder and build the memory index in the background, so neither the
+    # first decision nor the first memory API call pays for it
+    warm: asyncio.Task[None] | None = None
+    if settings.memory_warm_on_startup:
+        warm = asyncio.create_task(asyncio.to_thread(get_memory_store().warm))
+    try:
+        yield
+    finally:
+        if warm is not None and warm.done() and not warm.cancelled() and warm.exception():
+            logging.getLogger("memory").warning("memory warm-up failed: %s", warm.exception())
+        with contextlib.suppress(Exception):
+            await get_knowledge_worker().aclose()
+        with contextlib.suppress(Exception):
+            await get_web_ingestor().aclose()
+        with contextlib.suppress(Exception):
+            await asyncio.to_thread(get_ingestor().close)
+        # Snapshot the index so the next start only catches up on new rows
+        with contextlib.suppress(Exception):
+            await asyncio.to_thread(get_memory_store().close)
+
+
 def create_app() -> FastAPI:
     configure_logging()
-    app = FastAPI(title="auto-gaming", version="1.0.0-beta")
+    app = FastAPI(title="auto-gaming", version="1.0.0-beta", lifespan=lifespan)
 
     app.add_middleware(
         CORSMiddleware,
@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+import math
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+import faiss
+import numpy as np
+
+from app.config import settings
+
+KINDS = ("flat", "hnsw", "ivfpq")
+# Promotion only ever moves up this order
+_RANK = {kind: i for i, kind in enumerate(KINDS)}
+# Original vectors for the given ids (same order), e.g. embeddings stored with the rows
+ExactVectors = Callable[[np.ndarray], np.ndarray]
+# Deleted-but-still-indexed share (HNSW cannot remove) that triggers a compaction
+_COMPACT_RATIO = 0.2
+# IVF-PQ candidates fetched per requested result when exact vectors are available to re-rank
+_RERANK_FACTOR = 10
+# IVF-PQ needs ~39 points per 8-bit PQ centroid (256) to train; smaller corpora stay HNSW
+_IVF_MIN_TRAIN = 10_000
+
+
+def _ids(ids: Any) -> np.ndarray:
+    return np.ascontiguousarray(np.asarray(ids, dtype="int64").reshape(-1))
+
+
+def _vecs(vecs: Any) -> np.ndarray:
+    return np.ascontiguousarray(np.asarray(vecs, dtype="float32"))
+
+
+def _kind_of(inner: faiss.Index) -> str:
+    inner = faiss.downcast_index(inner)
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivfpq"
+    return "flat"
+
+
+def _tune(inner: faiss.Index) -> None:
+    """Search-time knobs, which are not part of a serialized index."""
+    inner = faiss.downcast_index(inner)
+    if isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = int(settings.memory_hnsw_ef_search)
+    elif isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = min(int(inner.nlist), int(settings.memory_ivf_nprobe))
+
+
+class VectorIndex:
+    """Inner-product index keyed by SQLite fact ids (``IndexIDMap2``), not list positions.
+
+    Starts flat (exact); once it holds ``promote_at`` vectors it should be rebuilt as HNSW, and
+    past ``ivf_at`` as IVF-PQ, which needs training but keeps memory at a few bytes per vector.
+    ``add`` never rebuilds: ``promotion()`` names the bigger structure the size calls for, and
+    the owner of the original vectors rebuilds with ``load`` (IVF-PQ codes are lossy, so an
+    index is never rebuilt from its own IVF-PQ contents). Shrinking never demotes. ``kind``
+    pins one structure instead of promoting. Flat and IVF-PQ delete in place; HNSW cannot, so
+    its deletes are tombstoned, filtered from results, and compacted away once they make up a
+    fifth of the index. A pinned IVF-PQ index stays HNSW until it holds enough points to
+    train (``_IVF_MIN_TRAIN``), then ``promotion()`` names IVF-PQ as in auto mode.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        kind: str | None = None,
+        promote_at: int | None = None,
+        ivf_at: int | None = None,
+    ) -> None:
+        self.dim = int(dim)
+        mode = (kind or settings.memory_index_kind or "auto").lower()
+        self.mode = mode if mode in KINDS else "auto"
+        self.promote_at = int(settings.memory_index_promote_at if promote_at is None else promote_at)
+        self.ivf_at = int(settings.memory_index_ivf_at if ivf_at is None else ivf_at)
+        self._tombstones: set[int] = set()
+        self._index = self._empty(self._target_kind(0), 0)
+        self.promotions = 0
+
+    # --- construction ----------------------------------------------------
+    def _empty(self, kind: str, n: int) -> faiss.IndexIDMap2:
+        if kind == "hnsw":
+            m = int(settings.memory_hnsw_m)
+            inner = faiss.IndexHNSWFlat(self.dim, m, faiss.METRIC_INNER_PRODUCT)
+            inner.hnsw.efConstruction = 80
+        elif kind == "ivfpq":
+            nlist = max(1, int(4 * math.sqrt(max(1, n))))
+            # 8-bit codes over sub-vectors of (at most) 8 dims
+            m = next(m for m in range(max(1, self.dim // 8), 0, -1) if self.dim % m == 0)
+            inner = faiss.IndexIVFPQ(
+                faiss.IndexFlatIP(self.dim), self.dim, nlist, m, 8, faiss.METRIC_INNER_PRODUCT
+            )
+        else:
+            inner = faiss.IndexFlatIP(self.dim)
+        _tune(inner)
+        return faiss.IndexIDMap2(inner)
+
+    def _target_kind(self, n: int) -> str:
+        if self.mode == "ivfpq" and n < _IVF_MIN_TRAIN:
+            # an untrained IVF-PQ index cannot take vectors
+            return "hnsw"
+        if self.mode != "auto":
+            return self.mode
+        if n >= max(self.ivf_at, _IVF_MIN_TRAIN):
+            return "ivfpq"
+        if n >= self.promote_at:
+            return "hnsw"
+        return "flat"
+
+    @property
+    def kind(self) -> str:
+        return _kind_of(self._index.index)
+
+    def promotion(self) -> str | None:
+        """Bigger structure this index should be rebuilt as for its size, else None."""
+        target = self._target_kind(self.ntotal)
+        return target if _RANK[target] > _RANK[self.kind] else None
+
+    @property
+    def d(self) -> int:
+        return self.dim
+
+    @property
+    def ntotal(self) -> int:
+        return int(self._index.ntotal) - len(self._tombstones)
+
+    def __len__(self) -> int:
+        return self.ntotal
+
+    def ids(self) -> np.ndarray:
+        """Live ids currently in the index."""
+        all_ids = faiss.vector_to_array(self._index.id_map).astype("int64")
+        if not self._tombstones:
+            return all_ids
+        return all_ids[~np.isin(all_ids, np.fromiter(self._tombstones, dtype="int64"))]
+
+    def _all_vectors(self) -> tuple[np.ndarray, np.ndarray]:
+        ids = self.ids()
+        if not len(ids):
+            return ids, np.zeros((0, self.dim), dtype="float32")
+        return ids, np.vstack([self._index.reconstruct(int(i)) for i in ids])
+
+    def rebuild(self, kind: str | None = None) -> None:
+        """Re-create the index (as ``kind``, default: its current kind) from its vectors.
+
+        IVF-PQ stores compressed codes without a direct map, so it cannot be rebuilt from
+        itself; callers with the original vectors (``MemoryStore``) use ``load`` instead.
+        """
+        if self.kind == "ivfpq":
+            raise ValueError("IVF-PQ cannot be rebuilt from its codes; load the original vectors")
+        ids, vecs = self._all_vectors()
+        self._tombstones.clear()
+        self.load(ids, vecs, kind or self.kind)
+
+    def load(self, ids: Any, vecs: Any, kind: str | None = None) -> None:
+        """Replace the contents with ``vecs`` keyed by ``ids`` in a structure sized for them."""
+        ids, vecs = _ids(ids), _vecs(vecs)
+        kind = kind or self._target_kind(len(ids))
+        if kind == "ivfpq" and len(ids) < _IVF_MIN_TRAIN:
+            # not enough points to train the product quantizers
+            kind = "hnsw"
+        index = self._empty(kind, len(ids))
+        if kind == "ivfpq":
+            rng = np.random.default_rng(0)
+            nlist = int(faiss.downcast_index(index.index).nlist)
+            size = min(len(vecs), max(100_000, 40 * nlist))
+            index.index.train(vecs[rng.choice(len(vecs), size=size, replace=False)])
+        if len(ids):
+            index.add_with_ids(vecs, ids)
+        self._tombstones.clear()
+        if self._index.ntotal and _kind_of(self._index.index) != kind:
+            self.promotions += 1
+        self._index = index
+
+    # --- updates ---------------------------------------------------------
+    def add(self, ids: Any, vecs: Any) -> None:
+        ids, vecs = _ids(ids), _vecs(vecs)
+        if not len(ids):
+            return
+        if vecs.shape[1] != self.dim:
+            raise ValueError(f"expected {self.dim}-dim vectors, got {vecs.shape[1]}")
+        present = faiss.vector_to_array(self._index.id_map).astype("int64")
+        replaced = np.isin(ids, present)
+        # HNSW cannot replace an id in place (re-adding one duplicates it): rebuild instead
+        if replaced.any() and self.kind == "hnsw":
+            old_ids, old_vecs = self._all_vectors()
+            keep = ~np.isin(old_ids, ids)
+            self.load(
+                np.concatenate([old_ids[keep], ids]), np.vstack([old_vecs[keep], vecs]), "hnsw"
+            )
+            return
+        if replaced.any():
+            self._index.remove_ids(ids[replaced])
+        self._index.add_with_ids(vecs, ids)
+
+    def remove(self, ids: Any) -> int:
+        ids = _ids(ids)
+        if not len(ids) or not self._index.ntotal:
+            return 0
+        if self.kind != "hnsw":
+            return int(self._index.remove_ids(ids))
+        present = set(faiss.vector_to_array(self._index.id_map).tolist())
+        dead = {int(i) for i in ids if int(i) in present} - self._tombstones
+        self._tombstones |= dead
+        if len(self._tombstones) > _COMPACT_RATIO * self._index.ntotal:
+            self.rebuild()
+        return len(dead)
+
+    # --- queries ---------------------------------------------------------
+    def search(
+        self, q: Any, k: int, exact: ExactVectors | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Top ``k`` (scores, ids) per query row; missing slots have id -1.
+
+        IVF-PQ scores come from compressed codes; with ``exact`` it over-fetches candidates
+        and re-ranks them on the original vectors, recovering most of the lost recall.
+        """
+        q = _vecs(q).reshape(-1, self.dim)
+        k = max(1, int(k))
+        if not self._index.ntotal:
+            return np.zeros((len(q), k), dtype="float32"), np.full((len(q), k), -1, dtype="int64")
+        rerank = exact is not None and self.kind == "ivfpq"
+        want = k * _RERANK_FACTOR if rerank else k
+        fetch = min(int(self._index.ntotal), want + len(self._tombstones))
+        scores, ids = self._index.search(q, fetch)
+        if not self._tombstones and not rerank:
+            return scores, ids
+        out_s = np.zeros((len(q), k), dtype="float32")
+        out_i = np.full((len(q), k), -1, dtype="int64")
+        for r in range(len(q)):
+            keep = [
+                j for j in range(fetch) if ids[r, j] >= 0 and int(ids[r, j]) not in self._tombstones
+            ]
+            row_s, row_i = scores[r, keep], ids[r, keep]
+            if rerank and len(row_i):
+                row_s = exact(row_i) @ q[r]  # type: ignore[misc]
+                order = np.argsort(-row_s)
+                row_s, row_i = row_s[order], row_i[order]
+            n = min(k, len(row_i))
+            out_s[r, :n] = row_s[:n]
+            out_i[r, :n] = row_i[:n]
+        return out_s, out_i
+
+    # --- persistence -----------------------------------------------------
+    def serialize(self) -> bytes:
+        if self._tombstones:
+            self.rebuild()
+        return np.asarray(faiss.serialize_index(self._index)).tobytes()
+
+    @classmethod
+    def deserialize(cls, data: bytes, kind: str | None = None) -> VectorIndex:
+        return cls.from_faiss(faiss.deserialize_index(np.frombuffer(data, dtype="uint8")), kind)
+
+    @classmethod
+    def from_faiss(cls, index: faiss.Index, kind: str | None = None) -> VectorIndex:
+        """Wrap an index read with ``faiss.read_index`` (must be an ``IndexIDMap2``)."""
+        if not isinstance(index, faiss.IndexIDMap2):
+            raise ValueError("expected an id-mapped index")
+        _tune(index.index)
+        out = cls(index.d, kind=kind)
+        out._index = index
+        return out
+
+
+# --- benchmark -----------------------------------------------------------------
+def synthetic_corpus(n: int, dim: int = 384, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    """Normalized vectors around random centroids (embeddings cluster by topic, too)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype("float32")
+    out = np.empty((n, dim), dtype="float32")
+    step = 50_000
+    for i in range(0, n, step):
+        m = min(step, n - i)
+        noise = rng.standard_normal((m, dim)).astype("float32") * 0.6
+        out[i : i + m] = centers[rng.integers(0, clusters, size=m)] + noise
+    faiss.normalize_L2(out)
+    return out
+
+
+@dataclass
+class BenchResult:
+    size: int
+    kind: str
+    build_s: float
+    recall_at_k: float
+    p50_ms: float
+    p95_ms: float
+
+
+def benchmark(
+    sizes: list[int],
+    kinds: tuple[str, ...] = KINDS,
+    dim: int = 384,
+    queries: int = 200,
+    k: int = 10,
+    seed: int = 0,
+) -> list[BenchResult]:
+    """Recall@k against exact search and single-query latency for each size and index kind.
+
+    IVF-PQ is measured with re-ranking on the original vectors, as ``MemoryStore`` runs it.
+    """
+    results: list[BenchResult] = []
+    for n in sizes:
+        corpus = synthetic_corpus(n, dim, seed=seed)
+        ids = np.arange(1, n + 1, dtype="int64")
+        rng = np.random.default_rng(seed + 1)
+        q = corpus[rng.choice(n, size=min(queries, n), replace=False)].copy()
+        q += rng.standard_normal(q.shape).astype("float32") * 0.05
+        faiss.normalize_L2(q)
+        exact = faiss.IndexFlatIP(dim)
+        exact.add(corpus)
+        _, truth = exact.search(q, k)
+        truth_ids = ids[truth]
+        for kind in kinds:
+            idx = VectorIndex(dim, kind=kind)
+            t0 = time.perf_counter()
+            idx.load(ids, corpus, kind)
+            build_s = time.perf_counter() - t0
+            lat: list[float] = []
+            found = np.empty((len(q), k), dtype="int64")
+            for r in range(len(q)):
+                t1 = time.perf_counter()
+                _, got = idx.search(q[r : r + 1], k, exact=lambda i: corpus[i - 1])
+                lat.append((time.perf_counter() - t1) * 1000.0)
+                found[r] = got[0]
+            hits = sum(len(set(found[r]) & set(truth_ids[r])) for r in range(len(q)))
+            results.append(
+                BenchResult(
+                    size=n,
+                    kind=idx.kind,
+                    build_s=build_s,
+                    recall_at_k=hits / float(len(q) * k),
+                    p50_ms=float(np.percentile(lat, 50)),
+                    p95_ms=float(np.percentile(lat, 95)),
+                )
+            )
+    return results
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from urllib.parse import quote_plus
+
+from app.config import settings
+from app.memory.observations import content_hash
+from app.memory.store import Fact, MemoryStore, get_memory_store
+from app.services.search.documents import chunk_text
+from app.services.search.web_ingest import WebDoc, WebIngestor, get_web_ingestor, summarize
+from app.telemetry.bus import bus
+
+# Menu labels memory facts can bias toward (or away from, when the fact says it is locked)
+_MEMORY_LABELS = (
+    "episode", "side story", "battle", "shop", "summon", "event", "sanctuary", "hunt", "arena"
+)
+_LOCKED_PHRASES = ("locked", "unlock after", "you can enter after")
+# Finished topics remembered for the repeat window
+_DONE_KEYS = 4096
+
+
+def fact_meta(title: str, summary: str) -> dict[str, object]:
+    """Labels a fact mentions and whether it says they are locked; stored with web facts."""
+    tl = title.lower()
+    summ = summary.lower()
+    return {
+        "labels": [lbl for lbl in _MEMORY_LABELS if lbl in tl or lbl in summ],
+        "locked": any(s in summ for s in _LOCKED_PHRASES),
+    }
+
+
+def seed_urls(terms: str) -> list[str]:
+    """Pages to learn about ``terms`` from: the ``KNOWLEDGE_SEED_URLS`` templates filled in."""
+    q = quote_plus(" ".join(terms.split()))
+    templates = [t.strip() for t in settings.knowledge_seed_urls.split(",")]
+    return [t.replace("{q}", q) for t in templates if t]
+
+
+def web_fact(title: str, url: str, summary: str, **meta: object) -> Fact:
+    return Fact(
+        id=None,
+        title=title,
+        source_url=url,
+        summary=summary,
+        meta={**fact_meta(title, summary), **meta},
+    )
+
+
+def document_facts(doc: WebDoc) -> list[Fact]:
+    """A page as one summary fact plus one fact per overlapping passage (bounded per page)."""
+    summary = summarize(doc)
+    if not summary:
+        return []
+    facts = [web_fact(doc.title, doc.url, summary, part="summary")]
+    passages = chunk_text(
+        doc.text,
+        int(settings.doc_chunk_words),
+        int(settings.doc_chunk_overlap),
+        int(settings.doc_max_chunks),
+    )
+    # A page short enough to fit its summary needs no passages
+    if len(passages) > 1 or (passages and passages[0] != summary):
+        for i, passage in enumerate(passages, 1):
+            facts.append(
+                web_fact(f"{doc.title} ({i}/{len(passages)})", doc.url, passage, part=i)
+            )
+    return facts
+
+
+@dataclass
+class KnowledgeJob:
+    key: str
+    topic: str
+    urls: list[str]
+    source: str
+    queued_ts: float = field(default_factory=time.monotonic)
+
+
+class KnowledgeWorker:
+    """Learns about topics in the background so decisions never wait on the network.
+
+    ``enqueue`` only records a "learn about X" job and returns. Jobs are deduplicated by topic
+    (digits masked, like observations) against the queue, the jobs in progress and topics
+    finished within ``repeat_s``; a full queue drops its oldest job, whose screen is likely
+    gone. Worker tasks on the event loop fetch the pages, add the facts to the memory store
+    (indexed incrementally) and announce them on the telemetry bus as ``knowledge:learned``;
+    a job whose pages were all blocked or failed learns nothing and announces nothing.
+    """
+
+    def __init__(
+        self,
+        max_queue: int | None = None,
+        workers: int | None = None,
+        repeat_s: float | None = None,
+        max_urls: int | None = None,
+        store: MemoryStore | None = None,
+        ingestor: WebIngestor | None = None,
+    ) -> None:
+        queue = settings.knowledge_queue_max if max_queue is None else max_queue
+        self.max_queue = max(1, int(queue))
+        self.workers = max(1, int(settings.knowledge_workers if workers is None else workers))
+        self.repeat_s = float(settings.knowledge_repeat_s if repeat_s is None else repeat_s)
+        self.max_urls = max(1, int(settings.knowledge_max_urls if max_urls is None else max_urls))
+        self._store = store
+        self._ingestor = ingestor
+        # enqueue may be called from any thread; worker tasks run on one event loop
+        self._lock = threading.Lock()
+        self._pending: OrderedDict[str, KnowledgeJob] = OrderedDict()
+        self._active: set[str] = set()
+        self._done: OrderedDict[str, float] = OrderedDict()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wake: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task[None]] = []
+        self.queued = 0
+        self.deduped = 0
+        self.dropped = 0
+        self.jobs = 0
+        self.failed = 0
+        self.learned = 0
+        self.wait_ms = 0.0
+
+    # --- intake ----------------------------------------------------------
+    def enqueue(self, topic: str, urls: list[str], source: str = "") -> bool:
+        """Queue a job; False when the topic is already queued, running or recently learned."""
+        key = content_hash("learn", topic)
+        now = time.monotonic()
+        with self._lock:
+            done = self._done.get(key)
+            if key in self._pending or key in self._active or (
+                done is not None and now - done < self.repeat_s
+            ):
+                self.deduped += 1
+                return False
+            while len(self._pending) >= self.max_queue:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._pending[key] = KnowledgeJob(key, topic, list(urls)[: self.max_urls], source, now)
+            self.queued += 1
+        self._start()
+        self._notify()
+        return True
+
+    def _start(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop in this thread: jobs wait until one enqueues or calls ``start``
+            return
+        if self._loop is loop and all(not t.done() for t in self._tasks):
+            return
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._tasks = [
+            loop.create_task(self._work(), name=f"knowledge-{i}") for i in range(self.workers)
+        ]
+
+    async def start(self) -> None:
+        self._start()
+        self._notify()
+
+    def _notify(self) -> None:
+        loop, wake = self._loop, self._wake
+        if loop is None or wake is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            wake.set()
+        else:
+            loop.call_soon_threadsafe(wake.set)
+
+    # --- work ------------------------------------------------------------
+    def _next(self) -> KnowledgeJob | None:
+        with self._lock:
+            if not self._pending:
+                return None
+            _, job = self._pending.popitem(last=False)
+            self._active.add(job.key)
+            return job
+
+    async def _work(self) -> None:
+        wake = self._wake
+        if wake is None:
+            return
+        while True:
+            job = self._next()
+            if job is None:
+                await wake.wait()
+                wake.clear()
+                continue
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failed += 1
+            finally:
+                with self._lock:
+                    self._active.discard(job.key)
+                    self._done[job.key] = time.monotonic()
+                    self._done.move_to_end(job.key)
+                    while len(self._done) > _DONE_KEYS:
+                        self._done.popitem(last=False)
+
+    async def _run(self, job: KnowledgeJob) -> None:
+        self.wait_ms += (time.monotonic() - job.queued_ts) * 1000.0
+        ingestor = self._ingestor or get_web_ingestor()
+        docs = await ingestor.fetch_many(job.urls)
+        # Summaries and passages are CPU work (TextRank); keep them off the event loop too
+        facts = await asyncio.to_thread(lambda: [f for d in docs for f in document_facts(d)])
+        self.jobs += 1
+        if not facts:
+            return
+        await asyncio.to_thread(self._replace, [d.url for d in docs], facts)
+        self.learned += len(facts)
+        await bus.publish_step(
+            "knowledge:learned",
+            {
+                "topic": job.topic[:120],
+                "source": job.source,
+                "facts": [f.title for f in facts if f.meta.get("part") == "summary"],
+                "passages": sum(1 for f in facts if f.meta.get("part") != "summary"),
+            },
+        )
+
+    def _replace(self, urls: list[str], facts: list[Fact]) -> None:
+        store = self._store or get_memory_store()
+        # A re-fetched page replaces its previous summary and passages
+        store.delete_sources(urls)
+        # add_facts embeds and extends the live index
+        store.add_facts(facts)
+
+    async def join(self, timeout_s: float = 30.0) -> bool:
+        """Wait until the queue is drained and no job is running; False on timeout."""
+        deadline = time.monotonic() + timeout_s
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._pending and not self._active:
+                    return True
+            await asyncio.sleep(0.01)
+        return False
+
+    async def aclose(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for t in tasks:
+            t.cancel()
+        if tasks and self._loop is asyncio.get_running_loop():
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop = None
+        self._wake = None
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                "queued": float(self.queued),
+                "deduped": float(self.deduped),
+                "dropped": float(self.dropped),
+                "pending": float(len(self._pending)),
+                "active": float(len(self._active)),
+                "jobs": float(self.jobs),
+                "failed": float(self.failed),
+                "learned": float(self.learned),
+                "avg_wait_ms": self.wait_ms / max(1, self.jobs + self.failed),
+            }
+
+
+_worker: KnowledgeWorker | None = None
+
+
+def get_knowledge_worker() -> KnowledgeWorker:
+    global _worker
+    if _worker is None:
+        _worker = KnowledgeWorker()
+    return _worker
@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from app.config import settings
+
+# Batch embedder: texts -> (n, d) L2-normalized float32 vectors
+Embed = Callable[[list[str]], np.ndarray]
+
+# Recent embeddings kept for the near-duplicate check
+_RECENT_VECTORS = 512
+# Content hashes remembered as already stored (or aliased to a stored near-duplicate)
+_SEEN_HASHES = 8192
+
+_DIGITS = re.compile(r"\d+")
+_SPACE = re.compile(r"\s+")
+
+
+def content_hash(kind: str, key: str) -> str:
+    """Hash of an observation's content; digits are masked so ticking timers/counters collide."""
+    norm = _SPACE.sub(" ", _DIGITS.sub("#", key.lower())).strip()
+    return hashlib.blake2b(f"{kind}|{norm}".encode("utf-8"), digest_size=10).hexdigest()
+
+
+@dataclass
+class Observation:
+    kind: str
+    title: str
+    summary: str
+    content_hash: str
+    ts: float
+    hits: int = 1
+
+
+class ObservationIngestor:
+    """Deduplicating, batched writer for per-frame observations.
+
+    ``submit`` is cheap and never touches SQLite: repeats of the same content (by hash) are
+    coalesced in memory and a background flusher writes each batch in one transaction. New
+    content is optionally embedded and folded into a recent near-duplicate. Rows live in a
+    separate ``observations`` table, one row per (day, content), capped by retention days
+    and a row budget, so neither the table nor the fact index grows with uptime.
+    """
+
+    def __init__(
+        self,
+        db_path: str | None = None,
+        max_rows: int | None = None,
+        retention_days: int | None = None,
+        flush_s: float | None = None,
+        batch_size: int | None = None,
+        near_dup: float | None = None,
+        embed: Embed | None = None,
+    ) -> None:
+        self.db_path = db_path or settings.db_path
+        self.max_rows = max(1, int(settings.observation_max_rows if max_rows is None else max_rows))
+        days = settings.observation_retention_days if retention_days is None else retention_days
+        self.retention_days = max(0, int(days))
+        self.flush_s = float(settings.observation_flush_s if flush_s is None else flush_s)
+        batch = settings.observation_batch if batch_size is None else batch_size
+        self.batch_size = max(1, int(batch))
+        self.near_dup = float(settings.observation_near_dup if near_dup is None else near_dup)
+        self._embed = embed
+        self._embed_failed = False
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS observations (
+                  id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  day TEXT NOT NULL,
+                  kind TEXT NOT NULL,
+                  title TEXT NOT NULL,
+                  summary TEXT NOT NULL,
+                  content_hash TEXT NOT NULL,
+                  first_ts REAL NOT NULL,
+                  last_ts REAL NOT NULL,
+                  hits INTEGER NOT NULL DEFAULT 1,
+                  UNIQUE(day, content_hash)
+                );
+                CREATE INDEX IF NOT EXISTS idx_observations_last_ts ON observations(last_ts);
+                """
+            )
+        self._lock = threading.Lock()
+        # One flush at a time (flusher thread vs. explicit flush on stop)
+        self._flush_lock = threading.Lock()
+        self._pending: dict[str, Observation] = {}
+        # hash -> canonical hash already stored (itself, or the near-duplicate it folded into)
+        self._seen: OrderedDict[str, str] = OrderedDict()
+        # kind -> (recent embeddings, their content hashes); near-duplicates never cross kinds
+        self._vectors: dict[str, tuple[np.ndarray, list[str]]] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.submitted = 0
+        self.coalesced = 0
+        self.near_duplicates = 0
+        self.written = 0
+        self.flushes = 0
+        self.pruned = 0
+
+    # --- intake ----------------------------------------------------------
+    def submit(self, kind: str, title: str, summary: str, key: str | None = None) -> None:
+        """Queue one observation; ``key`` (default: the summary) is what gets deduplicated."""
+        h = content_hash(kind, summary if key is None else key)
+        now = time.time()
+        with self._lock:
+            self.submitted += 1
+            h = self._seen.get(h, h)
+            obs = self._pending.get(h)
+            if obs is not None:
+                obs.hits += 1
+                obs.ts = now
+                obs.summary = summary
+                self.coalesced += 1
+            else:
+                self._pending[h] = Observation(kind, title, summary, h, now)
+            full = len(self._pending) >= self.batch_size
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="obs-flusher", daemon=True)
+        self._thread.start()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_s)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    # --- writing ---------------------------------------------------------
+    def flush(self) -> int:
+        """Write everything pending in one transaction; returns the number of rows upserted."""
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self) -> int:
+        with self._lock:
+            batch, self._pending = list(self._pending.values()), {}
+        if not batch:
+            return 0
+        batch = self._fold_near_duplicates(batch)
+        day = time.strftime("%Y-%m-%d", time.gmtime())
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany(
+                """
+                INSERT INTO observations
+                  (day, kind, title, summary, content_hash, first_ts, last_ts, hits)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(day, content_hash) DO UPDATE SET
+                  title = excluded.title,
+                  summary = excluded.summary,
+                  last_ts = MAX(last_ts, excluded.last_ts),
+                  hits = hits + excluded.hits
+                """,
+                [
+                    (day, o.kind, o.title, o.summary, o.content_hash, o.ts, o.ts, o.hits)
+                    for o in batch
+                ],
+            )
+            self.pruned += self._prune(conn)
+        with self._lock:
+            for o in batch:
+                self._remember(o.content_hash, o.content_hash)
+            self.written += len(batch)
+            self.flushes += 1
+        return len(batch)
+
+    def _remember(self, h: str, canonical: str) -> None:
+        self._seen[h] = canonical
+        self._seen.move_to_end(h)
+        while len(self._seen) > _SEEN_HASHES:
+            self._seen.popitem(last=False)
+
+    def _fold_near_duplicates(self, batch: list[Observation]) -> list[Observation]:
+        """Merge never-seen content into a recent stored observation it nearly duplicates."""
+        with self._lock:
+            fresh = [o for o in batch if o.content_hash not in self._seen]
+        if self.near_dup <= 0 or not fresh:
+            return batch
+        vecs = self._encode([o.summary for o in fresh])
+        if vecs is None:
+            return batch
+        merged: dict[str, Observation] = {o.content_hash: o for o in batch}
+        for obs, vec in zip(fresh, vecs):
+            target = None
+            mat, hashes = self._vectors.get(obs.kind, (None, []))
+            if mat is not None and mat.shape[1] == vec.shape[0]:
+                sims = mat @ vec
+                best = int(np.argmax(sims))
+                if float(sims[best]) >= self.near_dup:
+                    target = hashes[best]
+            if target is None or target == obs.content_hash:
+                self._push_vector(obs.kind, obs.content_hash, vec)
+                continue
+            # Fold into the stored near-duplicate; later exact repeats skip the embedder
+            del merged[obs.content_hash]
+            with self._lock:
+                self._remember(obs.content_hash, target)
+            self.near_duplicates += 1
+            into = merged.get(target)
+            if into is not None:
+                into.hits += obs.hits
+                into.ts = max(into.ts, obs.ts)
+            else:
+                merged[target] = Observation(
+                    obs.kind, obs.title, obs.summary, target, obs.ts, obs.hits
+                )
+        return list(merged.values())
+
+    def _push_vector(self, kind: str, h: str, vec: np.ndarray) -> None:
+        row = vec.reshape(1, -1)
+        mat, hashes = self._vectors.get(kind, (None, []))
+        if mat is None or mat.shape[1] != row.shape[1]:
+            self._vectors[kind] = (row, [h])
+            return
+        self._vectors[kind] = (
+            np.vstack([mat, row])[-_RECENT_VECTORS:],
+            (hashes + [h])[-_RECENT_VECTORS:],
+        )
+
+    def _encode(self, texts: list[str]) -> np.ndarray | None:
+        if self._embed is None and not self._embed_failed:
+            try:
+                from app.memory.store import get_embedder
+
+                model = get_embedder()
+                self._embed = lambda xs: model.encode(xs, normalize_embeddings=True)
+            except Exception:
+                self._embed_failed = True
+        if self._embed is None:
+            return None
+        try:
+            return np.asarray(self._embed(texts), dtype="float32")
+        except Exception:
+            return None
+
+    def _prune(self, conn: sqlite3.Connection) -> int:
+        removed = 0
+        if self.retention_days > 0:
+            cutoff = time.strftime(
+                "%Y-%m-%d", time.gmtime(time.time() - self.retention_days * 86400)
+            )
+            removed += conn.execute("DELETE FROM observations WHERE day < ?", (cutoff,)).rowcount
+        (count,) = conn.execute("SELECT COUNT(*) FROM observations").fetchone()
+        if count > self.max_rows:
+            removed += conn.execute(
+                """
+                DELETE FROM observations WHERE id IN (
+                  SELECT id FROM observations ORDER BY last_ts ASC LIMIT ?
+                )
+                """,
+                (count - self.max_rows,),
+            ).rowcount
+        return removed
+
+    # --- reading ---------------------------------------------------------
+    def recent(self, kind: str | None = None, limit: int = 20) -> list[dict[str, object]]:
+        sql = "SELECT day, kind, title, summary, first_ts, last_ts, hits FROM observations"
+        args: tuple[object, ...] = ()
+        if kind is not None:
+            sql += " WHERE kind = ?"
+            args = (kind,)
+        sql += " ORDER BY last_ts DESC LIMIT ?"
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(sql, (*args, int(limit))).fetchall()
+        cols = ("day", "kind", "title", "summary", "first_ts", "last_ts", "hits")
+        return [dict(zip(cols, r)) for r in rows]
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                "submitted": float(self.submitted),
+                "coalesced": float(self.coalesced),
+                "near_duplicates": float(self.near_duplicates),
+                "written": float(self.written),
+                "flushes": float(self.flushes),
+                "pruned": float(self.pruned),
+                "pending": float(len(self._pending)),
+            }
+
+
+_ingestor: ObservationIngestor | None = None
+
+
+def get_ingestor() -> ObservationIngestor:
+    global _ingestor
+    if _ingestor is None:
+        _ingestor = ObservationIngestor()
+    return _ingestor
@@ -1,17 +1,57 @@
 from __future__ import annotations
 
+import json
+import re
 import sqlite3
 from collections.abc import Sequence
 import threading
-from dataclasses import dataclass
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Iterator
+from typing import Any, Iterator
 
 import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
 from app.config import settings
+from app.memory.index import VectorIndex
+
+# Default embedding width (all-MiniLM-L6-v2) for an empty index
+_DIM = 384
+# Facts embedded per encoder call when backfilling
+_ENCODE_BATCH = 64
+# Minimum seconds between automatic index snapshots
+_SAVE_INTERVAL_S = 60.0
+# Minimum seconds between sweeps deleting expired facts
+_PURGE_INTERVAL_S = 300.0
+# Reciprocal rank fusion constant (rank contributions 1 / (k + rank))
+_RRF_K = 60
+_WORD = re.compile(r"\w+")
+
+_embedder: SentenceTransformer | None = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder() -> SentenceTransformer:
+    """Process-wide sentence embedder, loaded once on first use."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = SentenceTransformer(settings.embedding_model_id)
+    return _embedder
+
+
+# Fact namespaces: fetched web pages, and per-frame rows written before observations moved
+# to their own table (``app.memory.observations``)
+NS_WEB = "web"
+NS_OBS = "obs"
+NS_UI = "ui"
+NAMESPACES = (NS_WEB, NS_OBS, NS_UI)
+# What the decision path consults
+KNOWLEDGE_NAMESPACES = (NS_WEB,)
 
 
 @dataclass
@@ -20,12 +60,72 @@ class Fact:
     title: str
     source_url: str
     summary: str
+    namespace: str = NS_WEB
+    created_at: float | None = None
+    # None: never expires (web facts default to MEMORY_WEB_TTL_DAYS)
+    expires_at: float | None = None
+    meta: dict[str, Any] = field(default_factory=dict)
+
+
+def _default_expiry(namespace: str, created_at: float) -> float | None:
+    days = float(settings.memory_web_ttl_days)
+    if namespace == NS_WEB and days > 0:
+        return created_at + days * 86400.0
+    return None
+
+
+def _row_fact(row: tuple) -> Fact:
+    try:
+        meta = json.loads(row[7]) if row[7] else {}
+    except ValueError:
+        meta = {}
+    return Fact(
+        id=row[0],
+        title=row[1],
+        source_url=row[2],
+        summary=row[3],
+        namespace=row[4],
+        created_at=row[5],
+        expires_at=row[6],
+        meta=meta,
+    )
+
+
+def _fact_text(title: str, summary: str) -> str:
+    return f"{title}. {summary}"
+
+
+def _query_key(query: str) -> str:
+    """Lowercased words of ``query``: case, punctuation and spacing jitter share an entry."""
+    return " ".join(_WORD.findall(query.lower()))
+
+
+def _fts_terms(query: str) -> list[str]:
+    """Distinct lowercase word terms of ``query`` (quoted later, so FTS syntax cannot leak in)."""
+    seen: dict[str, None] = {}
+    for t in _WORD.findall(query.lower()):
+        if len(t) > 1:
+            seen.setdefault(t, None)
+    return list(seen)
 
 
 class MemoryStore:
+    """Facts in SQLite with their embeddings, plus one vector index per namespace.
+
+    Facts are typed by namespace (``web`` knowledge, legacy ``obs``/``ui`` rows) and
+    carry created/expiry timestamps and JSON metadata; searches can be restricted to the
+    namespaces they need and never return expired facts. Each row's embedding is stored as a
+    float32 BLOB when the fact is added, and every namespace index is snapshotted to
+    ``<db>.<namespace>.faiss``, so a cold start only catches up on rows a snapshot lacks (or
+    drops ids it has that were deleted). Changing the embedding model drops the stored
+    vectors once. An index that outgrows its structure (flat -> HNSW -> IVF-PQ) is rebuilt
+    from the stored embeddings on a background thread.
+    """
+
     def __init__(self, db_path: str | None = None) -> None:
         self.db_path = db_path or settings.db_path
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.model_id = settings.embedding_model_id
         # Initialize schema once (use short-lived connection)
         with sqlite3.connect(self.db_path, check_same_thread=False) as conn:
             conn.execute(
@@ -34,34 +134,173 @@ class MemoryStore:
                   id INTEGER PRIMARY KEY AUTOINCREMENT,
                   title TEXT NOT NULL,
                   source_url TEXT NOT NULL,
-                  summary TEXT NOT NULL
+                  summary TEXT NOT NULL,
+                  embedding BLOB,
+                  namespace TEXT NOT NULL DEFAULT 'web',
+                  created_at REAL,
+                  expires_at REAL,
+                  meta TEXT NOT NULL DEFAULT '{}'
                 );
                 """
             )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS memory_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            self._migrate(conn)
+            conn.executescript(
+                """
+                CREATE INDEX IF NOT EXISTS idx_facts_namespace_created
+                  ON facts(namespace, created_at);
+                CREATE INDEX IF NOT EXISTS idx_facts_expires
+                  ON facts(expires_at) WHERE expires_at IS NOT NULL;
+                CREATE INDEX IF NOT EXISTS idx_facts_source ON facts(source_url);
+                """
+            )
+            row = conn.execute(
+                "SELECT value FROM memory_meta WHERE key = 'embedding_model'"
+            ).fetchone()
+            if row is not None and row[0] != self.model_id:
+                # Vectors from another model are not comparable: re-embed lazily
+                conn.execute("UPDATE facts SET embedding = NULL")
+                self._drop_snapshots()
+            conn.execute(
+                "INSERT OR REPLACE INTO memory_meta (key, value) VALUES ('embedding_model', ?)",
+                (self.model_id,),
+            )
+            self._init_fts(conn)
             conn.commit()
 
         # Serialize sqlite access across threads
         self._lock = threading.Lock()
-        # Lazy components for embeddings/index
-        self._embedder: SentenceTransformer | None = None
-        self._index: faiss.IndexFlatIP | None = None
-        self._embeddings: np.ndarray | None = None
-        # Cached rows: (id, title, source_url, summary)
-        self._rows: list[tuple[int, str, str, str]] | None = None
+        # Guards the indexes; held only for FAISS calls, never while encoding
+        self._index_lock = threading.Lock()
+        # One cold load at a time; concurrent first searches wait for it instead of repeating it
+        self._build_lock = threading.Lock()
+        self._indexes: dict[str, VectorIndex] | None = None
+        # Bumped on invalidation so a load racing a write does not install stale indexes
+        self._generation = 0
+        self._dirty: set[str] = set()
+        # Namespaces being rebuilt as a bigger index structure in the background
+        self._promoting: dict[str, threading.Thread] = {}
+        self._last_save_ts = 0.0
+        self._last_purge_ts = 0.0
+        self.encoded = 0
+        self.searches: dict[str, int] = {"lexical": 0, "vector": 0, "hybrid": 0}
+        # Normalized query text -> embedding; OCR queries repeat frame after frame
+        self._query_cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._query_cache_size = max(1, int(settings.memory_query_cache_size))
+        self._query_lock = threading.Lock()
+        self.query_cache_hits = 0
+        self.query_cache_misses = 0
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        cols = {r[1] for r in conn.execute("PRAGMA table_info(facts)").fetchall()}
+        if "embedding" not in cols:
+            conn.execute("ALTER TABLE facts ADD COLUMN embedding BLOB")
+        if "namespace" not in cols:
+            conn.execute("ALTER TABLE facts ADD COLUMN namespace TEXT NOT NULL DEFAULT 'web'")
+            # Per-frame rows written before observations had their own table
+            conn.execute("UPDATE facts SET namespace = 'obs' WHERE title LIKE 'obs:%'")
+            conn.execute("UPDATE facts SET namespace = 'ui' WHERE title LIKE 'ui:%'")
+            # the single pre-namespace snapshot no longer matches any index
+            legacy = Path(self.db_path).with_suffix(".faiss")
+            legacy.unlink(missing_ok=True)
+            Path(f"{legacy}.json").unlink(missing_ok=True)
+        if "created_at" not in cols:
+            conn.execute("ALTER TABLE facts ADD COLUMN created_at REAL")
+        if "expires_at" not in cols:
+            conn.execute("ALTER TABLE facts ADD COLUMN expires_at REAL")
+        if "meta" not in cols:
+            conn.execute("ALTER TABLE facts ADD COLUMN meta TEXT NOT NULL DEFAULT '{}'")
+        # Rows from before timestamps: their age is unknown, so they count from now and web
+        # rows get the usual TTL instead of living forever
+        now = time.time()
+        expiry = _default_expiry(NS_WEB, now)
+        if expiry is not None:
+            conn.execute(
+                "UPDATE facts SET expires_at = ? WHERE created_at IS NULL AND expires_at IS NULL"
+                " AND namespace = ?",
+                (expiry, NS_WEB),
+            )
+        conn.execute("UPDATE facts SET created_at = ? WHERE created_at IS NULL", (now,))
+
+    @staticmethod
+    def _init_fts(conn: sqlite3.Connection) -> None:
+        """FTS5 mirror of facts (external content), kept in sync by triggers."""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'facts_fts'"
+        ).fetchone()
+        conn.executescript(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS facts_fts USING fts5(
+              title, summary, content='facts', content_rowid='id',
+              tokenize='unicode61 remove_diacritics 2'
+            );
+            CREATE TRIGGER IF NOT EXISTS facts_fts_ai AFTER INSERT ON facts BEGIN
+              INSERT INTO facts_fts(rowid, title, summary) VALUES (new.id, new.title, new.summary);
+            END;
+            CREATE TRIGGER IF NOT EXISTS facts_fts_ad AFTER DELETE ON facts BEGIN
+              INSERT INTO facts_fts(facts_fts, rowid, title, summary)
+                VALUES ('delete', old.id, old.title, old.summary);
+            END;
+            CREATE TRIGGER IF NOT EXISTS facts_fts_au AFTER UPDATE OF title, summary ON facts BEGIN
+              INSERT INTO facts_fts(facts_fts, rowid, title, summary)
+                VALUES ('delete', old.id, old.title, old.summary);
+              INSERT INTO facts_fts(rowid, title, summary) VALUES (new.id, new.title, new.summary);
+            END;
+            """
+        )
+        if not exists:
+            # facts written before the mirror existed
+            conn.execute("INSERT INTO facts_fts(facts_fts) VALUES ('rebuild')")
 
     def _connect(self) -> sqlite3.Connection:
         # Return a new connection for the current thread; caller must close or use context manager
         return sqlite3.connect(self.db_path, check_same_thread=False)
 
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        embedder = self._get_embedder()
+        vecs_list: list[np.ndarray] = []
+        # Stream encoding to reduce peak memory
+        for i in range(0, len(texts), _ENCODE_BATCH):
+            chunk = texts[i : i + _ENCODE_BATCH]
+            embs = embedder.encode(chunk, normalize_embeddings=True)
+            vecs_list.append(np.asarray(embs, dtype="float32"))
+        self.encoded += len(texts)
+        return np.concatenate(vecs_list, axis=0)
+
     def add_facts(self, facts: Sequence[Fact]) -> list[int]:
+        # Embed before taking any lock; a failure leaves the rows to be embedded on load
+        try:
+            vecs: np.ndarray | None = (
+                self._encode([_fact_text(f.title, f.summary) for f in facts]) if facts else None
+            )
+        except Exception:
+            vecs = None
+        now = time.time()
         ids: list[int] = []
         with self._lock:
             with self._connect() as conn:
                 cur = conn.cursor()
-                for f in facts:
+                for i, f in enumerate(facts):
+                    blob = vecs[i].tobytes() if vecs is not None else None
+                    created = f.created_at if f.created_at is not None else now
+                    expires = f.expires_at if f.expires_at is not None else _default_expiry(
+                        f.namespace, created
+                    )
                     cur.execute(
-                        "INSERT INTO facts (title, source_url, summary) VALUES (?, ?, ?)",
-                        (f.title, f.source_url, f.summary),
+                        "INSERT INTO facts (title, source_url, summary, embedding, namespace,"
+                        " created_at, expires_at, meta) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            f.title,
+                            f.source_url,
+                            f.summary,
+                            blob,
+                            f.namespace,
+                            created,
+                            expires,
+                            json.dumps(f.meta or {}, ensure_ascii=False),
+                        ),
                     )
                     last_id = cur.lastrowid
                     if isinstance(last_id, int):
@@ -69,84 +308,518 @@ class MemoryStore:
                     else:
                         raise RuntimeError("Failed to obtain lastrowid from SQLite insert")
                 conn.commit()
-            # If index is already built, update incrementally to avoid expensive full rebuilds
-            if self._index is not None and self._embeddings is not None and self._rows is not None and len(ids) == len(facts):
-                try:
-                    embedder = self._get_embedder()
-                    corpus_new = [f"{f.title}. {f.summary}" for f in facts]
-                    embs_new = embedder.encode(corpus_new, normalize_embeddings=True)
-                    import numpy as _np
-                    vecs_new = _np.asarray(embs_new, dtype="float32")
-                    # Append to in-memory rows and embeddings
-                    self._rows.extend([(i, f.title, f.source_url, f.summary) for i, f in zip(ids, facts)])
-                    self._embeddings = _np.vstack([self._embeddings, vecs_new]) if self._embeddings.size else vecs_new
-                    # Add to FAISS index
-                    self._index.add(vecs_new)
-                    return ids
-                except Exception:
-                    # Fallback to lazy rebuild on next search
-                    self._index = None
-                    self._embeddings = None
-                    self._rows = None
-                    return ids
-            else:
-                # No existing index: trigger lazy rebuild on next search
-                self._index = None
-                self._embeddings = None
-                self._rows = None
+            # If indexes are already built, update incrementally to avoid expensive full rebuilds
+            if vecs is None or len(ids) != len(facts):
+                self._invalidate()
                 return ids
+            grown: list[str] = []
+            with self._index_lock:
+                if self._indexes is None:
+                    return ids
+                for ns in {f.namespace for f in facts}:
+                    rows = [j for j, f in enumerate(facts) if f.namespace == ns]
+                    index = self._indexes.setdefault(ns, VectorIndex(vecs.shape[1]))
+                    try:
+                        index.add([ids[j] for j in rows], vecs[rows])
+                    except Exception:
+                        # e.g. a different embedding width: the rows are committed, so the
+                        # next search rebuilds the indexes from them
+                        self._generation += 1
+                        self._indexes = None
+                        return ids
+                    self._dirty.add(ns)
+                    if index.promotion() is not None:
+                        grown.append(ns)
+        for ns in grown:
+            self._schedule_promotion(ns)
+        self.maybe_save()
+        return ids
+
+    def delete_facts(self, ids: Sequence[int]) -> int:
+        """Remove facts from SQLite and the indexes; returns how many rows were deleted."""
+        if not ids:
+            return 0
+        with self._lock:
+            with self._connect() as conn:
+                removed = conn.executemany(
+                    "DELETE FROM facts WHERE id = ?", [(int(i),) for i in ids]
+                ).rowcount
+                conn.commit()
+            with self._index_lock:
+                for ns, index in (self._indexes or {}).items():
+                    if index.remove(list(ids)):
+                        self._dirty.add(ns)
+        self.maybe_save()
+        return int(removed)
+
+    def delete_sources(self, urls: Sequence[str]) -> int:
+        """Delete every fact (summary and passages) ingested from ``urls``."""
+        if not urls:
+            return 0
+        marks = ",".join("?" * len(urls))
+        with self._connect() as conn:
+            ids = [
+                int(r[0])
+                for r in conn.execute(
+                    f"SELECT id FROM facts WHERE source_url IN ({marks})", list(urls)
+                ).fetchall()
+            ]
+        return self.delete_facts(ids)
+
+    def purge_expired(self, now: float | None = None) -> int:
+        """Delete facts past their ``expires_at``; searches already skip them."""
+        now = time.time() if now is None else now
+        self._last_purge_ts = time.monotonic()
+        with self._connect() as conn:
+            ids = [
+                int(r[0])
+                for r in conn.execute(
+                    "SELECT id FROM facts WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                    (now,),
+                ).fetchall()
+            ]
+        return self.delete_facts(ids)
 
+    def _invalidate(self) -> None:
+        with self._index_lock:
+            self._generation += 1
+            self._indexes = None
+
+    # --- cold load -------------------------------------------------------
     def _ensure_index(self) -> None:
-        if self._index is not None and self._embeddings is not None and self._rows is not None:
+        if self._indexes is not None:
+            return
+        with self._build_lock:
+            if self._indexes is not None:
+                return
+            generation = self._generation
+            with self._lock:
+                with self._connect() as conn:
+                    by_ns: dict[str, list[int]] = {}
+                    for fid, ns in conn.execute("SELECT id, namespace FROM facts").fetchall():
+                        by_ns.setdefault(str(ns), []).append(int(fid))
+            indexes: dict[str, VectorIndex] = {}
+            changed: set[str] = set()
+            for ns in set(by_ns) | set(self._snapshot_namespaces()):
+                db_ids = np.asarray(by_ns.get(ns, []), dtype="int64")
+                index, dirty = self._load_namespace(ns, db_ids)
+                if len(index) or ns in by_ns:
+                    indexes[ns] = index
+                if dirty:
+                    changed.add(ns)
+            with self._index_lock:
+                if generation != self._generation:
+                    return
+                self._indexes = indexes
+                self._dirty |= changed
+        if changed:
+            self.save_index()
+        for ns, index in indexes.items():
+            if index.promotion() is not None:
+                self._schedule_promotion(ns)
+
+    # --- promotion -------------------------------------------------------
+    def _schedule_promotion(self, ns: str) -> None:
+        """Rebuild ``ns`` as the structure its size calls for, on a background thread."""
+        with self._index_lock:
+            running = self._promoting.get(ns)
+            if running is not None and running.is_alive():
+                return
+            t = threading.Thread(
+                target=self._promote, args=(ns,), name=f"memory-promote-{ns}", daemon=True
+            )
+            self._promoting[ns] = t
+        t.start()
+
+    def _promote(self, ns: str) -> None:
+        """Build the bigger index from the rows' stored embeddings, then swap it in.
+
+        Reading rows, encoding and IVF training hold no lock, so adds and searches carry on
+        against the old index. Rows added meanwhile are copied over at the swap, which takes
+        the same locks as ``add_facts``; an invalidation or reload meanwhile abandons it.
+        """
+        try:
+            with self._index_lock:
+                index = (self._indexes or {}).get(ns)
+                kind = index.promotion() if index is not None else None
+                if index is None or kind is None:
+                    return
+                generation = self._generation
+                ids = index.ids()
+            rows = self._fetch_rows(ids)
+            vecs = self._row_vectors(rows)
+            if len(vecs) and vecs.shape[1] != index.d:
+                return
+            fresh = VectorIndex(
+                index.d, kind=index.mode, promote_at=index.promote_at, ivf_at=index.ivf_at
+            )
+            fresh.load([r[0] for r in rows], vecs, kind)
+            with self._lock:
+                with self._index_lock:
+                    current = (self._indexes or {}).get(ns)
+                    if generation != self._generation or current is not index:
+                        return
+                    live, built = index.ids(), fresh.ids()
+                    fresh.remove(built[~np.isin(built, live)])
+                    added = live[~np.isin(live, built)]
+                    if len(added):
+                        fresh.add(added, self._stored_vectors(added, index.d))
+                    fresh.promotions = index.promotions + 1
+                    self._indexes[ns] = fresh
+                    self._dirty.add(ns)
+        except Exception:
             return
+
+    def join_promotions(self, timeout_s: float = 60.0) -> bool:
+        """Wait for background index rebuilds; False on timeout."""
+        deadline = time.monotonic() + timeout_s
+        for t in list(self._promoting.values()):
+            t.join(max(0.0, deadline - time.monotonic()))
+        return not any(t.is_alive() for t in self._promoting.values())
+
+    def _load_namespace(self, ns: str, db_ids: np.ndarray) -> tuple[VectorIndex, bool]:
+        """Snapshot of ``ns`` reconciled with its rows; also whether it had to change."""
+        index = self._load_snapshot(ns)
+        if index is None:
+            missing, stale = db_ids, np.zeros(0, dtype="int64")
+        else:
+            have = index.ids()
+            missing = db_ids[~np.isin(db_ids, have)]
+            stale = have[~np.isin(have, db_ids)]
+        rows = self._fetch_rows(missing)
+        vecs = self._row_vectors(rows)
+        if index is not None and len(vecs) and index.d != vecs.shape[1]:
+            # snapshot from a different embedding width: rebuild from the rows
+            index = None
+            rows = self._fetch_rows(db_ids)
+            vecs = self._row_vectors(rows)
+        if index is None:
+            index = VectorIndex(vecs.shape[1] if len(vecs) else _DIM)
+            index.load([r[0] for r in rows], vecs)
+            return index, True
+        index.remove(stale)
+        index.add([r[0] for r in rows], vecs)
+        return index, bool(len(rows) or len(stale))
+
+    def _fetch_rows(self, ids: np.ndarray) -> list[tuple]:
+        """(id, title, summary, embedding) for ``ids``, in id order."""
+        out: list[tuple] = []
+        ids = np.sort(np.asarray(ids, dtype="int64"))
         with self._lock:
             with self._connect() as conn:
-                rows_full = list(
-                    conn.execute(
-                        "SELECT id, title, source_url, summary FROM facts ORDER BY id ASC"
-                    ).fetchall()
+                for i in range(0, len(ids), 500):
+                    chunk = [int(x) for x in ids[i : i + 500]]
+                    marks = ",".join("?" * len(chunk))
+                    out.extend(
+                        conn.execute(
+                            "SELECT id, title, summary, embedding FROM facts"
+                            f" WHERE id IN ({marks}) ORDER BY id",
+                            chunk,
+                        ).fetchall()
+                    )
+        return out
+
+    def _row_vectors(self, rows: list[tuple]) -> np.ndarray:
+        """Stored embeddings of ``rows``; rows without one are encoded and written back."""
+        if not rows:
+            return np.zeros((0, _DIM), dtype="float32")
+        vecs: list[np.ndarray | None] = [
+            np.frombuffer(r[3], dtype="float32") if r[3] else None for r in rows
+        ]
+        dims = {len(v) for v in vecs if v is not None}
+        if len(dims) > 1:
+            # mixed widths cannot share one index; treat every row as missing
+            vecs = [None] * len(rows)
+        missing = [i for i, v in enumerate(vecs) if v is None]
+        if missing:
+            fresh = self._encode([_fact_text(rows[i][1], rows[i][2]) for i in missing])
+            if dims and fresh.shape[1] not in dims:
+                return self._row_vectors([(*r[:3], None) for r in rows])
+            for i, v in zip(missing, fresh):
+                vecs[i] = v
+            with self._lock:
+                with self._connect() as conn:
+                    conn.executemany(
+                        "UPDATE facts SET embedding = ? WHERE id = ?",
+                        [(fresh[j].tobytes(), rows[i][0]) for j, i in enumerate(missing)],
+                    )
+                    conn.commit()
+        return np.vstack(vecs).astype("float32", copy=False)
+
+    # --- snapshots -------------------------------------------------------
+    def snapshot_path(self, ns: str) -> Path:
+        return Path(self.db_path).with_suffix(f".{ns}.faiss")
+
+    def _snapshot_namespaces(self) -> list[str]:
+        stem = Path(self.db_path).stem
+        return [
+            p.name[len(stem) + 1 : -len(".faiss")]
+            for p in Path(self.db_path).parent.glob(f"{stem}.*.faiss")
+        ]
+
+    def _drop_snapshots(self) -> None:
+        for ns in self._snapshot_namespaces():
+            self.snapshot_path(ns).unlink(missing_ok=True)
+            Path(f"{self.snapshot_path(ns)}.json").unlink(missing_ok=True)
+
+    def _load_snapshot(self, ns: str = NS_WEB) -> VectorIndex | None:
+        path = self.snapshot_path(ns)
+        try:
+            meta = json.loads(Path(f"{path}.json").read_text(encoding="utf-8"))
+            if meta.get("model") != self.model_id:
+                return None
+            return VectorIndex.from_faiss(faiss.read_index(str(path)))
+        except Exception:
+            return None
+
+    def save_index(self) -> None:
+        with self._index_lock:
+            if self._indexes is None:
+                return
+            # serialize under the lock; the copies are written to disk outside it
+            out = [
+                (ns, self._indexes[ns].serialize(), self._indexes[ns])
+                for ns in sorted(self._dirty)
+                if ns in self._indexes
+            ]
+            payload = [
+                (ns, data, {"model": self.model_id, "kind": idx.kind, "count": len(idx)})
+                for ns, data, idx in out
+            ]
+            self._dirty.clear()
+            self._last_save_ts = time.monotonic()
+        for ns, data, meta in payload:
+            path = self.snapshot_path(ns)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(".faiss.tmp")
+                tmp.write_bytes(data)
+                tmp.replace(path)
+                meta_path = Path(f"{path}.json")
+                meta_tmp = meta_path.with_suffix(".tmp")
+                meta_tmp.write_text(json.dumps(meta), encoding="utf-8")
+                meta_tmp.replace(meta_path)
+            except Exception:
+                pass
+
+    def maybe_save(self) -> None:
+        if (time.monotonic() - self._last_purge_ts) >= _PURGE_INTERVAL_S:
+            try:
+                self.purge_expired()
+            except Exception:
+                pass
+        if self._dirty and (time.monotonic() - self._last_save_ts) >= _SAVE_INTERVAL_S:
+            self.save_index()
+
+    def close(self) -> None:
+        if self._dirty:
+            self.save_index()
+
+    # --- queries ---------------------------------------------------------
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        mode: str | None = None,
+        namespaces: Sequence[str] | None = None,
+    ) -> list[Fact]:
+        """Top facts for ``query``: ``lexical`` (BM25), ``vector`` (embeddings) or ``hybrid``.
+
+        Hybrid fuses both rankings with reciprocal rank fusion. A short query whose terms
+        already fill ``top_k`` lexical hits is answered by BM25 alone, without the embedder.
+        ``namespaces`` limits the search (default: all); expired facts are never returned.
+        """
+        return self.search_many([query], top_k, mode, namespaces)[0]
+
+    def search_many(
+        self,
+        queries: Sequence[str],
+        top_k: int = 5,
+        mode: str | None = None,
+        namespaces: Sequence[str] | None = None,
+    ) -> list[list[Fact]]:
+        """``search`` for several queries: one batched encode and one FAISS call per index."""
+        mode = (mode or settings.memory_search_mode or "hybrid").lower()
+        spaces = tuple(namespaces) if namespaces else None
+        now = time.time()
+        pool = top_k if mode == "vector" else max(top_k * 2, 10)
+        rankings: list[list[int]] = [[] for _ in queries]
+        lexical: list[list[int]] = [[] for _ in queries]
+        need_vector: list[int] = []
+        for qi, query in enumerate(queries):
+            if mode == "vector":
+                need_vector.append(qi)
+                continue
+            k = top_k if mode == "lexical" else pool
+            lexical[qi] = [i for i, _ in self._lexical(query, k, spaces, now)]
+            short = len(_fts_terms(query)) <= int(settings.memory_lexical_max_terms)
+            if mode == "lexical" or (len(lexical[qi]) >= top_k and short):
+                self.searches["lexical"] += 1
+                rankings[qi] = lexical[qi][:top_k]
+            else:
+                need_vector.append(qi)
+        if need_vector:
+            vectors = self._vector_many([queries[qi] for qi in need_vector], pool, spaces)
+            for qi, vector in zip(need_vector, vectors):
+                if mode == "vector":
+                    self.searches["vector"] += 1
+                    rankings[qi] = vector
+                    continue
+                self.searches["hybrid"] += 1
+                fused: dict[int, float] = {}
+                for ranking in (lexical[qi], vector):
+                    for rank, fid in enumerate(ranking):
+                        fused[fid] = fused.get(fid, 0.0) + 1.0 / (_RRF_K + rank + 1)
+                rankings[qi] = sorted(fused, key=lambda fid: -fused[fid])
+        found = self._fetch_facts(sorted({i for r in rankings for i in r}), now)
+        facts = {f.id: f for f in found}
+        # Keep rank order; deleted or expired ids are skipped
+        return [[facts[i] for i in r if i in facts][:top_k] for r in rankings]
+
+    def _vector_many(
+        self, queries: list[str], top_k: int, namespaces: tuple[str, ...] | None
+    ) -> list[list[int]]:
+        self._ensure_index()
+        q = self._embed_queries(queries)
+        # Over-fetch a little so expired facts filtered later do not starve the result
+        k = top_k + 5
+        merged: list[list[tuple[float, int]]] = [[] for _ in queries]
+        with self._index_lock:
+            for ns, index in (self._indexes or {}).items():
+                if (namespaces is not None and ns not in namespaces) or not len(index):
+                    continue
+                if index.d != q.shape[1]:
+                    continue
+                scores, idxs = index.search(
+                    q, k, exact=lambda ids, d=index.d: self._stored_vectors(ids, d)
                 )
-        self._rows = rows_full
-        if not rows_full:
-            self._index = faiss.IndexFlatIP(384)
-            self._embeddings = np.zeros((0, 384), dtype="float32")
-            return
-        embedder = self._get_embedder()
-        corpus = [f"{title}. {summary}" for (_id, title, _src, summary) in rows_full]
-        # Stream encoding to reduce peak memory
-        batch_size = 64
-        vecs_list: list[np.ndarray] = []
-        for i in range(0, len(corpus), batch_size):
-            chunk = corpus[i : i + batch_size]
-            embs = embedder.encode(chunk, normalize_embeddings=True)
-            vecs_list.append(np.asarray(embs, dtype="float32"))
-        embs = np.concatenate(vecs_list, axis=0) if vecs_list else np.zeros((0, 384), dtype="float32")
-        vecs = np.asarray(embs, dtype="float32")
-        self._embeddings = vecs
-        self._index = faiss.IndexFlatIP(vecs.shape[1])
-        self._index.add(vecs)
+                for r in range(len(queries)):
+                    merged[r].extend(
+                        (float(s), int(i)) for s, i in zip(scores[r], idxs[r]) if i >= 0
+                    )
+        return [[i for _, i in sorted(m, key=lambda t: -t[0])[:k]] for m in merged]
+
+    def _embed_queries(self, queries: list[str]) -> np.ndarray:
+        """Query embeddings via the LRU (keyed by normalized text); misses share one encode."""
+        keys = [_query_key(q) for q in queries]
+        found: dict[str, np.ndarray] = {}
+        with self._query_lock:
+            for key in keys:
+                vec = self._query_cache.get(key)
+                if vec is not None:
+                    self._query_cache.move_to_end(key)
+                    found[key] = vec
+            hits = sum(1 for k in keys if k in found)
+            self.query_cache_hits += hits
+            self.query_cache_misses += len(keys) - hits
+        misses = [k for k in dict.fromkeys(keys) if k not in found]
+        if misses:
+            fresh = self._encode(misses)
+            with self._query_lock:
+                for key, vec in zip(misses, fresh):
+                    found[key] = vec
+                    self._query_cache[key] = vec
+                while len(self._query_cache) > self._query_cache_size:
+                    self._query_cache.popitem(last=False)
+        return np.vstack([found[k] for k in keys]).astype("float32", copy=False)
 
-    def search(self, query: str, top_k: int = 5) -> list[Fact]:
+    def _lexical(
+        self,
+        query: str,
+        top_k: int,
+        namespaces: tuple[str, ...] | None = None,
+        now: float | None = None,
+    ) -> list[tuple[int, float]]:
+        """(fact id, BM25 score) best first; any query term may match."""
+        terms = _fts_terms(query)
+        if not terms:
+            return []
+        match = " OR ".join(f'"{t}"' for t in terms)
+        sql = (
+            # bm25() is lower-is-better; title matches weigh double
+            "SELECT f.id, bm25(facts_fts, 2.0, 1.0) AS score FROM facts_fts"
+            " JOIN facts f ON f.id = facts_fts.rowid"
+            " WHERE facts_fts MATCH ? AND (f.expires_at IS NULL OR f.expires_at > ?)"
+        )
+        args: list[object] = [match, time.time() if now is None else now]
+        if namespaces is not None:
+            sql += f" AND f.namespace IN ({','.join('?' * len(namespaces))})"
+            args.extend(namespaces)
+        sql += " ORDER BY score LIMIT ?"
+        args.append(int(top_k))
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(sql, args).fetchall()
+        except sqlite3.Error:
+            return []
+        return [(int(r[0]), -float(r[1])) for r in rows]
+
+    def _fetch_facts(self, ids: list[int], now: float | None = None) -> list[Fact]:
+        if not ids:
+            return []
+        with self._connect() as conn:
+            marks = ",".join("?" * len(ids))
+            rows = conn.execute(
+                "SELECT id, title, source_url, summary, namespace, created_at, expires_at, meta"
+                f" FROM facts WHERE id IN ({marks})"
+                " AND (expires_at IS NULL OR expires_at > ?)",
+                [*ids, time.time() if now is None else now],
+            ).fetchall()
+        by_id = {r[0]: r for r in rows}
+        # Keep rank order; ids deleted or expired since the search are skipped
+        return [_row_fact(r) for r in (by_id.get(i) for i in ids) if r is not None]
+
+    def _stored_vectors(self, ids: np.ndarray, dim: int = _DIM) -> np.ndarray:
+        """Embeddings stored with the rows, for re-ranking compressed-index candidates."""
+        marks = ",".join("?" * len(ids))
+        with self._connect() as conn:
+            rows = dict(
+                conn.execute(
+                    f"SELECT id, embedding FROM facts WHERE id IN ({marks})",
+                    [int(i) for i in ids],
+                ).fetchall()
+            )
+        out = np.zeros((len(ids), dim), dtype="float32")
+        for j, i in enumerate(ids):
+            blob = rows.get(int(i))
+            if blob and len(blob) == dim * 4:
+                out[j] = np.frombuffer(blob, dtype="float32")
+        return out
+
+    def index_stats(self) -> dict[str, float | str]:
+        with self._index_lock:
+            if self._indexes is None:
+                return {"kind": "cold", "size": 0.0}
+            out: dict[str, float | str] = {
+                "size": float(sum(len(i) for i in self._indexes.values())),
+                "promotions": float(sum(i.promotions for i in self._indexes.values())),
+            }
+            largest = max(self._indexes.values(), key=len, default=None)
+            out["kind"] = largest.kind if largest is not None else "flat"
+            for ns, index in self._indexes.items():
+                out[f"{ns}_size"] = float(len(index))
+                out[f"{ns}_kind"] = index.kind
+            return out
+
+    def warm(self) -> None:
+        """Load the embedder and build the indexes now rather than on the first search."""
+        self._get_embedder()
+        self.purge_expired()
         self._ensure_index()
-        assert self._index is not None
-        assert self._embeddings is not None
-        embedder = self._get_embedder()
-        q = embedder.encode([query], normalize_embeddings=True).astype("float32")
-        scores, idxs = self._index.search(q, top_k)
-        results: list[Fact] = []
-        if idxs.size == 0:
-            return results
-        # Map FAISS indices directly to cached rows
-        assert self._rows is not None
-        id_rows = self._rows
-        for i in idxs[0]:
-            if i < 0 or i >= len(id_rows):
-                continue
-            row = id_rows[int(i)]
-            results.append(Fact(id=row[0], title=row[1], source_url=row[2], summary=row[3]))
-        return results
 
     def _get_embedder(self) -> SentenceTransformer:
-        if self._embedder is None:
-            self._embedder = SentenceTransformer(settings.embedding_model_id)
-        return self._embedder
+        return get_embedder()
+
+
+_store: MemoryStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_memory_store() -> MemoryStore:
+    """The process-wide store: one index shared by the runner, agents and API routes."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MemoryStore()
+    return _store
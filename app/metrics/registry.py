@@ -3,8 +3,14 @@ from __future__ import annotations
 from collections.abc import Mapping
 from dataclasses import dataclass
 
+from app.perception.resources import ResourceTracker, tracker as resource_tracker
 from app.state.encoder import GameState
 
+# Window over which resource deltas feed farm efficiency
+_EFFICIENCY_WINDOW_S = 600.0
+# Gold per stamina spent that counts as a fully efficient farming run
+_GOLD_PER_STAMINA_REF = 1000.0
+
 
 @dataclass(frozen=True)
 class Metrics:
@@ -14,15 +20,36 @@ class Metrics:
     arena_focus: float
 
 
-def compute_metrics(state: GameState) -> Metrics:
-    # Simplified initial metrics using stamina presence as proxy
-    has_stamina = (state.stamina_current is not None) and (state.stamina_cap is not None)
-    resource_safety = 1.0 if has_stamina else 0.0
-    # Placeholders; to be refined with real signals
+def _stamina(state: GameState, history: ResourceTracker) -> tuple[int, int] | None:
+    if state.stamina_current is not None and state.stamina_cap is not None:
+        return state.stamina_current, state.stamina_cap
+    counter = state.resource("stamina")
+    if counter is not None and counter.cap:
+        return counter.value, counter.cap
+    last = history.latest("stamina")
+    if last is not None and last.cap:
+        return last.value, last.cap
+    return None
+
+
+def compute_metrics(state: GameState, history: ResourceTracker | None = None) -> Metrics:
+    hist = resource_tracker if history is None else history
+    stamina = _stamina(state, hist)
+    resource_safety = 0.0
+    if stamina is not None:
+        cur, cap = stamina
+        # Sitting at/over cap wastes natural regen; anything below is safe
+        resource_safety = 1.0 if cur < max(1, cap) else 0.5
+    # Farm efficiency: gold earned per stamina spent over the recent window
+    farm_efficiency = 0.0
+    spent = hist.spent("stamina", _EFFICIENCY_WINDOW_S)
+    if spent > 0:
+        gold = hist.gained("gold", _EFFICIENCY_WINDOW_S)
+        farm_efficiency = min(1.0, gold / (spent * _GOLD_PER_STAMINA_REF))
     return Metrics(
         daily_progress=0.0,
         resource_safety=resource_safety,
-        farm_efficiency=0.0,
+        farm_efficiency=farm_efficiency,
         arena_focus=0.0,
     )
 
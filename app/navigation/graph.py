@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Literal
+
+from app.actions.types import (
+    Action,
+    SwipeAction,
+    TapAction,
+    WaitAction,
+    action_from_dict,
+    action_to_dict,
+)
+from app.perception.clickmap import CELL
+from app.state.identity import NearDuplicateIndex, StateIdentity
+
+NAVGRAPH_PATH = Path("data/navgraph.json")
+# Minimum seconds between automatic saves; transitions arrive at capture FPS
+_SAVE_INTERVAL_S = 5.0
+# Cost per second of observed transition latency, relative to -log(success_rate)
+_LATENCY_WEIGHT = 0.1
+
+Objective = Literal["reliable", "shortest"]
+
+
+@dataclass
+class ScreenNode:
+    key: str
+    title: str = ""
+    # Labels of the actions that led here (e.g. tapping "hunt" reaches the Hunt screen)
+    via: list[str] = field(default_factory=list)
+    visits: int = 0
+    last_ts: float = 0.0
+
+
+@dataclass
+class EdgeStats:
+    action: dict[str, Any]
+    count: int = 0
+    mean_latency_s: float = 0.0
+    last_ts: float = 0.0
+
+
+@dataclass(frozen=True)
+class PlannedHop:
+    src: str
+    dst: str
+    action: Action
+    success_rate: float
+    latency_s: float
+
+
+def action_signature(action: Action) -> str | None:
+    """Coarse action key so jittered taps on the same button share an edge; waits are ignored."""
+    if isinstance(action, TapAction):
+        return f"tap:{action.x // CELL},{action.y // CELL}"
+    if isinstance(action, SwipeAction):
+        dx, dy = action.x2 - action.x1, action.y2 - action.y1
+        if abs(dx) >= abs(dy):
+            return "swipe:right" if dx >= 0 else "swipe:left"
+        return "swipe:down" if dy >= 0 else "swipe:up"
+    if isinstance(action, WaitAction):
+        return None
+    return "back"
+
+
+class NavigationGraph:
+    """Screens (state identities) as nodes, observed actions as edges.
+
+    ``attempts[src][sig]`` counts how often an action was taken on a screen and
+    ``edges[src][sig][dst]`` how often it led to ``dst``, so the empirical success rate of a hop is
+    ``count / attempts``. Updated incrementally from the runner and persisted to JSON.
+    """
+
+    def __init__(self, path: Path | str | None = None, tolerance: int | None = None) -> None:
+        self.path = Path(path) if path is not None else NAVGRAPH_PATH
+        self.nodes: dict[str, ScreenNode] = {}
+        self.attempts: dict[str, dict[str, int]] = {}
+        self.edges: dict[str, dict[str, dict[str, EdgeStats]]] = {}
+        self._index: NearDuplicateIndex[str] = NearDuplicateIndex(tolerance)
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._last_save_ts = 0.0
+        self._load()
+
+    # --- node resolution -------------------------------------------------
+    def resolve(self, ident: StateIdentity, title: str = "", visit: bool = False) -> str:
+        """Return the node key for a screen, merging near-duplicates into an existing node."""
+        with self._lock:
+            key = self._index.get(ident)
+            if key is None:
+                key = ident.key
+                self.nodes[key] = ScreenNode(key=key)
+                self._index.put(ident, key)
+                self._dirty = True
+            node = self.nodes[key]
+            if title and not node.title:
+                node.title = title[:60]
+            if visit:
+                node.visits += 1
+                node.last_ts = time.time()
+                self._dirty = True
+            return key
+
+    # --- learning --------------------------------------------------------
+    def record_transition(
+        self,
+        src: StateIdentity,
+        action: Action,
+        dst: StateIdentity,
+        latency_s: float,
+        label: str | None = None,
+        dst_title: str = "",
+    ) -> None:
+        sig = action_signature(action)
+        if sig is None:
+            return
+        with self._lock:
+            src_key = self.resolve(src)
+            dst_key = self.resolve(dst, title=dst_title, visit=True)
+            if label and dst_key != src_key:
+                via = self.nodes[dst_key].via
+                if label.lower() not in via:
+                    via.append(label.lower())
+            per_src = self.attempts.setdefault(src_key, {})
+            per_src[sig] = per_src.get(sig, 0) + 1
+            if dst_key != src_key:
+                e = self.edges.setdefault(src_key, {}).setdefault(sig, {}).get(dst_key)
+                if e is None:
+                    e = EdgeStats(action=action_to_dict(action))
+                    self.edges[src_key][sig][dst_key] = e
+                e.count += 1
+                e.mean_latency_s += (float(latency_s) - e.mean_latency_s) / float(e.count)
+                e.last_ts = time.time()
+            self._dirty = True
+        self.maybe_save()
+
+    # --- planning --------------------------------------------------------
+    def success_rate(self, src_key: str, sig: str, dst_key: str) -> float:
+        tries = self.attempts.get(src_key, {}).get(sig, 0)
+        e = self.edges.get(src_key, {}).get(sig, {}).get(dst_key)
+        if not e or tries <= 0:
+            return 0.0
+        return min(1.0, e.count / float(tries))
+
+    def likely_next(
+        self, src: StateIdentity, action: Action, k: int = 2, min_prob: float = 0.0
+    ) -> list[tuple[str, float]]:
+        """Most frequent destinations of ``action`` on ``src`` with their empirical probability."""
+        sig = action_signature(action)
+        if sig is None:
+            return []
+        with self._lock:
+            src_key = self._index.get(src)
+            if src_key is None:
+                return []
+            dsts = self.edges.get(src_key, {}).get(sig, {})
+            ranked = sorted(
+                ((dst, self.success_rate(src_key, sig, dst)) for dst in dsts),
+                key=lambda kv: kv[1],
+                reverse=True,
+            )
+        return [(dst, p) for dst, p in ranked[: max(0, int(k))] if p >= min_prob]
+
+    def find_targets(self, target: str) -> list[str]:
+        """Nodes reached via an action labelled ``target`` first, else nodes whose title matches."""
+        t = target.strip().lower()
+        if not t:
+            return []
+        with self._lock:
+            by_via = [k for k, n in self.nodes.items() if t in n.via]
+            if by_via:
+                return by_via
+            return [k for k, n in self.nodes.items() if t in n.title.lower()]
+
+    def plan(
+        self,
+        src: StateIdentity,
+        target: str | StateIdentity,
+        objective: Objective = "reliable",
+        max_hops: int = 8,
+    ) -> list[PlannedHop] | None:
+        """Dijkstra from the current screen to the target screen(s).
+
+        ``reliable`` minimizes ``-log(success_rate) + latency``; ``shortest`` minimizes hop count.
+        Returns [] when already on a target screen and None when no path is known.
+        """
+        with self._lock:
+            src_key = self._index.get(src)
+            if src_key is None:
+                return None
+            if isinstance(target, StateIdentity):
+                tk = self._index.get(target)
+                targets = {tk} if tk is not None else set()
+            else:
+                targets = set(self.find_targets(target))
+            if not targets:
+                return None
+            if src_key in targets:
+                return []
+            dist: dict[str, float] = {src_key: 0.0}
+            prev: dict[str, tuple[str, PlannedHop]] = {}
+            hops: dict[str, int] = {src_key: 0}
+            heap: list[tuple[float, str]] = [(0.0, src_key)]
+            while heap:
+                d, u = heapq.heappop(heap)
+                if d > dist.get(u, math.inf):
+                    continue
+                if u in targets:
+                    path: list[PlannedHop] = []
+                    cur = u
+                    while cur != src_key:
+                        p, hop = prev[cur]
+                        path.append(hop)
+                        cur = p
+                    return list(reversed(path))
+                if hops[u] >= max_hops:
+                    continue
+                for sig, dsts in self.edges.get(u, {}).items():
+                    for v, e in dsts.items():
+                        rate = self.success_rate(u, sig, v)
+                        if rate <= 0.0:
+                            continue
+                        if objective == "shortest":
+                            w = 1.0
+                        else:
+                            w = -math.log(rate) + _LATENCY_WEIGHT * e.mean_latency_s
+                        nd = d + w
+                        if nd < dist.get(v, math.inf):
+                            dist[v] = nd
+                            hops[v] = hops[u] + 1
+                            hop = PlannedHop(
+                                src=u,
+                                dst=v,
+                                action=action_from_dict(e.action),
+                                success_rate=rate,
+                                latency_s=e.mean_latency_s,
+                            )
+                            prev[v] = (u, hop)
+                            heapq.heappush(heap, (nd, v))
+            return None
+
+    def summary(self) -> dict[str, int]:
+        with self._lock:
+            n_edges = sum(len(d) for sigs in self.edges.values() for d in sigs.values())
+            return {"nodes": len(self.nodes), "edges": n_edges}
+
+    def top_nodes(self, limit: int = 50) -> list[dict[str, Any]]:
+        """Most visited screens, copied under the lock."""
+        with self._lock:
+            nodes = sorted(self.nodes.values(), key=lambda n: n.visits, reverse=True)[:limit]
+            return [
+                {"key": n.key, "title": n.title, "via": n.via, "visits": n.visits} for n in nodes
+            ]
+
+    # --- persistence -----------------------------------------------------
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            obj = json.loads(self.path.read_text(encoding="utf-8"))
+            for k, v in obj.get("nodes", {}).items():
+                self.nodes[k] = ScreenNode(**{**v, "key": k})
+                self._index.put(StateIdentity.from_key(k), k)
+            for k, v in obj.get("attempts", {}).items():
+                self.attempts[k] = {sig: int(c) for sig, c in v.items()}
+            for src, sigs in obj.get("edges", {}).items():
+                for sig, dsts in sigs.items():
+                    for dst, e in dsts.items():
+                        self.edges.setdefault(src, {}).setdefault(sig, {})[dst] = EdgeStats(**e)
+        except Exception:
+            # corrupt/legacy file: start fresh
+            self.nodes, self.attempts, self.edges = {}, {}, {}
+            self._index.clear()
+
+    def save(self) -> None:
+        with self._lock:
+            obj = {
+                "nodes": {k: asdict(n) for k, n in self.nodes.items()},
+                "attempts": self.attempts,
+                "edges": {
+                    src: {
+                        sig: {dst: asdict(e) for dst, e in dsts.items()}
+                        for sig, dsts in sigs.items()
+                    }
+                    for src, sigs in self.edges.items()
+                },
+            }
+            self._dirty = False
+            self._last_save_ts = time.monotonic()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(obj, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(self.path)
+        except Exception:
+            pass
+
+    def maybe_save(self) -> None:
+        if self._dirty and (time.monotonic() - self._last_save_ts) >= _SAVE_INTERVAL_S:
+            self.save()
+
+
+_graph: NavigationGraph | None = None
+
+
+def get_graph() -> NavigationGraph:
+    global _graph
+    if _graph is None:
+        _graph = NavigationGraph()
+    return _graph
@@ -29,6 +29,12 @@ STAMINA_PATTERNS: list[re.Pattern[str]] = [
     re.compile(r"stamina\s*[:：]?\s*(\d+)\s*/\s*(\d+)", re.I),
     re.compile(r"(\d+)\s*/\s*(\d+)\s*stamina", re.I),
 ]
+# Applied to lines normalized to [a-z0-9/] to tolerate odd punctuation/spacing
+STAMINA_NORM_PATTERNS: list[re.Pattern[str]] = [
+    re.compile(r"stamina(\d+)/(\d+)"),
+    re.compile(r"(\d+)/(\d+)stamina"),
+]
+_NON_ALNUM_SLASH = re.compile(r"[^a-z0-9/]+")
 
 
 def extract_stamina(lines: Iterable[str]) -> tuple[int, int] | None:
@@ -41,11 +47,8 @@ def extract_stamina(lines: Iterable[str]) -> tuple[int, int] | None:
                 cap = int(m.group(2))
                 return cur, cap
         # normalized: strip non-alnum except '/', lower-case; tolerate odd punctuation
-        norm = re.sub(r"[^a-z0-9/]+", "", line.lower())
-        for pat in (
-            re.compile(r"stamina(\d+)/(\d+)"),
-            re.compile(r"(\d+)/(\d+)stamina"),
-        ):
+        norm = _NON_ALNUM_SLASH.sub("", line.lower())
+        for pat in STAMINA_NORM_PATTERNS:
             m2 = pat.search(norm)
             if m2:
                 return int(m2.group(1)), int(m2.group(2))
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+
+from PIL import Image
+
+from app.perception.ui_elements import ResourceCounter
+
+# Fixed counter regions on the Epic7 lobby top bar, based on the 882x496 layout and scaled to the
+# current image size. name, x_frac, y_frac, w_frac, h_frac (top-left corner + size)
+_RESOURCE_ROIS: list[tuple[str, float, float, float, float]] = [
+    ("stamina", 0.52, 0.015, 0.10, 0.05),
+    ("gold", 0.65, 0.015, 0.12, 0.05),
+    ("skystones", 0.80, 0.015, 0.09, 0.05),
+]
+
+_COUNTER_RE = re.compile(r"(\d[\d,]*)\s*(?:/\s*(\d[\d,]*))?")
+
+# Counters above these are OCR garbage (merged digits, icons read as digits)
+_MAX_VALUES: dict[str, int] = {
+    "stamina": 9_999,
+    "gold": 999_999_999,
+    "skystones": 999_999,
+}
+
+
+def roi_boxes(width: int, height: int) -> list[tuple[str, tuple[int, int, int, int]]]:
+    boxes: list[tuple[str, tuple[int, int, int, int]]] = []
+    for name, xf, yf, wf, hf in _RESOURCE_ROIS:
+        left = max(0, min(width - 1, int(xf * width)))
+        top = max(0, min(height - 1, int(yf * height)))
+        right = max(left + 1, min(width, int((xf + wf) * width)))
+        bottom = max(top + 1, min(height, int((yf + hf) * height)))
+        boxes.append((name, (left, top, right, bottom)))
+    return boxes
+
+
+def parse_counter(name: str, text: str) -> ResourceCounter | None:
+    m = _COUNTER_RE.search(text or "")
+    if not m:
+        return None
+    value = int(m.group(1).replace(",", ""))
+    cap = int(m.group(2).replace(",", "")) if m.group(2) else None
+    limit = _MAX_VALUES.get(name)
+    if limit is not None and (value > limit or (cap is not None and cap > limit)):
+        return None
+    return ResourceCounter(name=name, value=value, cap=cap)
+
+
+def read_resources(
+    image: Image.Image, ocr: Callable[[Image.Image], str] | None = None
+) -> list[ResourceCounter]:
+    """OCR the fixed counter ROIs with a digits-only whitelist."""
+    if ocr is None:
+        from app.services.ocr.tesseract_adapter import run_ocr_digits
+
+        ocr = run_ocr_digits
+    w, h = image.size
+    out: list[ResourceCounter] = []
+    for name, box in roi_boxes(w, h):
+        try:
+            counter = parse_counter(name, ocr(image.crop(box)))
+        except Exception:
+            counter = None
+        if counter is not None:
+            out.append(counter)
+    return out
+
+
+@dataclass(frozen=True)
+class ResourceSample:
+    ts: float
+    value: int
+    cap: int | None = None
+
+
+class ResourceTracker:
+    """Bounded time series of resource counters (monotonic timestamps)."""
+
+    def __init__(self, maxlen: int = 2000) -> None:
+        self._series: dict[str, deque[ResourceSample]] = {}
+        self._maxlen = int(maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, counters: Iterable[ResourceCounter], ts: float | None = None) -> None:
+        now = time.monotonic() if ts is None else float(ts)
+        with self._lock:
+            for c in counters:
+                arr = self._series.setdefault(c.name, deque(maxlen=self._maxlen))
+                arr.append(ResourceSample(ts=now, value=int(c.value), cap=c.cap))
+
+    def latest(self, name: str) -> ResourceSample | None:
+        with self._lock:
+            arr = self._series.get(name)
+            return arr[-1] if arr else None
+
+    def series(self, name: str) -> list[ResourceSample]:
+        with self._lock:
+            return list(self._series.get(name, ()))
+
+    def gained(self, name: str, window_s: float, now: float | None = None) -> float:
+        """Sum of positive deltas within the window (ignores spending and OCR misreads).
+
+        A single sample that jumps and bounces back (1000 -> 100 -> 1000) is an OCR misread,
+        not spending followed by income: deltas are taken over a 3-sample running median.
+        """
+        return self._sum_deltas(name, window_s, now, sign=1)
+
+    def spent(self, name: str, window_s: float, now: float | None = None) -> float:
+        """Sum of negative deltas within the window, as a positive number."""
+        return self._sum_deltas(name, window_s, now, sign=-1)
+
+    def _sum_deltas(self, name: str, window_s: float, now: float | None, sign: int) -> float:
+        now = time.monotonic() if now is None else float(now)
+        values = _despike([p.value for p in self.series(name) if now - p.ts <= window_s])
+        total = 0.0
+        for a, b in zip(values, values[1:]):
+            d = (b - a) * sign
+            if d > 0:
+                total += d
+        return total
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+def _despike(values: list[int]) -> list[int]:
+    """3-sample running median; the endpoints are kept as read."""
+    if len(values) < 3:
+        return values
+    mid = [sorted(values[i - 1 : i + 2])[1] for i in range(1, len(values) - 1)]
+    return [values[0], *mid, values[-1]]
+
+
+tracker = ResourceTracker()
@@ -19,6 +19,7 @@ class UiButton:
 class ResourceCounter:
     name: str
     value: int
+    cap: int | None = None
 
 
 # label, x_frac, y_frac, w_frac, h_frac
@@ -3,12 +3,21 @@ from __future__ import annotations
 import json
 import math
 import random
+import time
 from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, Iterable, List
+
+import numpy as np
 
 from app.config import settings
 
+if TYPE_CHECKING:
+    from app.state.encoder import GameState
+
+# Compact context: bias, stamina fraction, stamina known, buttons, tokens, stuck level, hour (2)
+FEATURE_DIM = 8
+
 
 @dataclass
 class ArmStats:
@@ -16,18 +25,56 @@ class ArmStats:
     mean: float = 0.0
 
 
+def state_features(state: "GameState", unchanged_count: int = 0) -> np.ndarray:
+    """Fixed-size context vector in roughly [-1, 1] for the contextual bandit."""
+    x = np.zeros(FEATURE_DIM, dtype=np.float64)
+    x[0] = 1.0
+    if state.stamina_current is not None and state.stamina_cap:
+        x[1] = min(1.5, state.stamina_current / max(1, state.stamina_cap))
+        x[2] = 1.0
+    x[3] = min(1.0, len(state.ui_buttons or []) / 10.0)
+    x[4] = min(1.0, len(state.ocr_tokens or []) / 60.0)
+    x[5] = min(1.0, max(0, unchanged_count) / 5.0)
+    hour = time.gmtime().tm_hour + time.gmtime().tm_min / 60.0
+    x[6] = math.sin(2.0 * math.pi * hour / 24.0)
+    x[7] = math.cos(2.0 * math.pi * hour / 24.0)
+    return x
+
+
 class ContextualBandit:
-    """Simple per-label bandit with epsilon-greedy and running mean rewards.
+    """LinUCB over a compact state feature vector, one linear model per label arm.
 
     Arms are high-level targets (e.g., 'episode', 'side story', 'battle', 'hunt', 'arena', 'summon', 'shop', 'sanctuary').
+    All eligible arms are scored in one vectorized pass over stacked ``A^-1``/``b``. Rewards are
+    buffered and folded into the model (and persisted) in batches. ``RL_METHOD=bandit`` keeps the
+    previous context-free epsilon-greedy behaviour over per-arm running means.
     """
 
-    def __init__(self, labels: List[str], persist_path: str | None = None) -> None:
-        self.labels = labels
+    def __init__(
+        self,
+        labels: List[str],
+        persist_path: str | None = None,
+        dim: int = FEATURE_DIM,
+        alpha: float | None = None,
+        flush_every: int | None = None,
+        flush_interval_s: float = 30.0,
+    ) -> None:
+        self.labels = list(labels)
         self.persist_path = persist_path or settings.rl_persist_path
-        self.arms: Dict[str, ArmStats] = {lbl: ArmStats() for lbl in labels}
+        self.dim = int(dim)
+        self.alpha = float(settings.rl_alpha if alpha is None else alpha)
+        self.flush_every = int(settings.rl_flush_every if flush_every is None else flush_every)
+        self.flush_interval_s = float(flush_interval_s)
+        self.arms: Dict[str, ArmStats] = {lbl: ArmStats() for lbl in self.labels}
+        self._index: Dict[str, int] = {lbl: i for i, lbl in enumerate(self.labels)}
+        self._A = np.tile(np.eye(self.dim), (len(self.labels), 1, 1))
+        self._A_inv = self._A.copy()
+        self._b = np.zeros((len(self.labels), self.dim))
+        self._pending: list[tuple[int, np.ndarray, float]] = []
+        self._last_flush = time.monotonic()
         self._load()
 
+    # --- persistence -----------------------------------------------------
     def _load(self) -> None:
         p = Path(self.persist_path)
         if not p.exists():
@@ -37,6 +84,13 @@ class ContextualBandit:
             for k, v in obj.get("arms", {}).items():
                 if k in self.arms:
                     self.arms[k] = ArmStats(count=int(v.get("count", 0)), mean=float(v.get("mean", 0.0)))
+            lin = obj.get("linucb", {})
+            if int(lin.get("dim", -1)) == self.dim:
+                for k, v in lin.get("arms", {}).items():
+                    i = self._ensure_arm(k)
+                    self._A[i] = np.asarray(v["A"], dtype=np.float64).reshape(self.dim, self.dim)
+                    self._b[i] = np.asarray(v["b"], dtype=np.float64).reshape(self.dim)
+                    self._A_inv[i] = np.linalg.inv(self._A[i])
         except Exception:
             # ignore
             pass
@@ -44,29 +98,93 @@ class ContextualBandit:
     def save(self) -> None:
         try:
             Path(self.persist_path).parent.mkdir(parents=True, exist_ok=True)
-            obj = {"arms": {k: asdict(v) for k, v in self.arms.items()}}
-            Path(self.persist_path).write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
+            obj = {
+                "arms": {k: asdict(v) for k, v in self.arms.items()},
+                "linucb": {
+                    "dim": self.dim,
+                    "arms": {
+                        lbl: {"A": self._A[i].ravel().tolist(), "b": self._b[i].tolist()}
+                        for lbl, i in self._index.items()
+                    },
+                },
+            }
+            tmp = Path(self.persist_path).with_suffix(".tmp")
+            tmp.write_text(json.dumps(obj, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(self.persist_path)
         except Exception:
             pass
 
-    def select(self, eligible: List[str], step: int, explore_boost: float = 0.0, avoid: list[str] | None = None) -> str | None:
-        if not settings.rl_enabled:
+    def _ensure_arm(self, label: str) -> int:
+        i = self._index.get(label)
+        if i is not None:
+            return i
+        i = len(self.labels)
+        self.labels.append(label)
+        self._index[label] = i
+        self.arms.setdefault(label, ArmStats())
+        eye = np.eye(self.dim)[None]
+        self._A = np.concatenate([self._A, eye])
+        self._A_inv = np.concatenate([self._A_inv, eye])
+        self._b = np.concatenate([self._b, np.zeros((1, self.dim))])
+        return i
+
+    def _context(self, context: np.ndarray | None) -> np.ndarray:
+        if context is None:
+            x = np.zeros(self.dim)
+            x[0] = 1.0
+            return x
+        return np.asarray(context, dtype=np.float64).reshape(self.dim)
+
+    # --- scoring ---------------------------------------------------------
+    def scores(
+        self, eligible: Iterable[str], context: np.ndarray | None = None, alpha: float | None = None
+    ) -> Dict[str, float]:
+        """Upper confidence bound of every eligible arm, computed in one batched pass."""
+        labels = list(eligible)
+        if not labels:
+            return {}
+        x = self._context(context)
+        idx = np.asarray([self._ensure_arm(lbl) for lbl in labels])
+        A_inv = self._A_inv[idx]
+        theta = np.einsum("kij,kj->ki", A_inv, self._b[idx])
+        mean = theta @ x
+        var = np.einsum("i,kij,j->k", x, A_inv, x)
+        a = self.alpha if alpha is None else alpha
+        ucb = mean + a * np.sqrt(np.maximum(var, 0.0))
+        return {lbl: float(s) for lbl, s in zip(labels, ucb)}
+
+    def select(
+        self,
+        eligible: List[str],
+        step: int,
+        explore_boost: float = 0.0,
+        avoid: list[str] | None = None,
+        context: np.ndarray | None = None,
+    ) -> str | None:
+        if not settings.rl_enabled or (settings.rl_method or "").lower() == "off":
             return None
         if not eligible:
             return None
-        eps0 = max(0.0, min(1.0, settings.rl_eps_start))
-        eps1 = max(0.0, min(1.0, settings.rl_eps_end))
-        # simple exponential decay with step proxy
-        decay = 0.995 ** max(0, step)
-        eps = max(eps1, min(1.0, eps0 * decay + max(0.0, min(1.0, explore_boost))))
+        self.maybe_flush()
         pool = [e for e in eligible if not avoid or e not in avoid] or eligible
-        if random.random() < eps:
-            return random.choice(pool)
-        # exploit: pick arm with highest mean among eligible
-        best = max(pool, key=lambda a: self.arms.get(a, ArmStats()).mean)
-        return best
+        if (settings.rl_method or "").lower() == "bandit":
+            eps0 = max(0.0, min(1.0, settings.rl_eps_start))
+            eps1 = max(0.0, min(1.0, settings.rl_eps_end))
+            # simple exponential decay with step proxy
+            decay = 0.995 ** max(0, step)
+            eps = max(eps1, min(1.0, eps0 * decay + max(0.0, min(1.0, explore_boost))))
+            if random.random() < eps:
+                return random.choice(pool)
+            # exploit: pick arm with highest mean among eligible
+            return max(pool, key=lambda a: self.arms.get(a, ArmStats()).mean)
+        # LinUCB: widen the confidence bonus when the runner signals it is stuck
+        ucb = self.scores(pool, context, alpha=self.alpha * (1.0 + max(0.0, explore_boost)))
+        best = max(ucb.values())
+        # random tie-break so untried arms are visited in no fixed order
+        return random.choice([lbl for lbl, s in ucb.items() if s >= best - 1e-9])
 
-    def update(self, label: str, reward: float) -> None:
+    # --- learning --------------------------------------------------------
+    def update(self, label: str, reward: float, context: np.ndarray | None = None) -> None:
         if not settings.rl_enabled:
             return
         stats = self.arms.setdefault(label, ArmStats())
@@ -74,6 +192,75 @@ class ContextualBandit:
         # running mean
         stats.mean += (reward - stats.mean) / float(stats.count)
         self.arms[label] = stats
+        self._pending.append((self._ensure_arm(label), self._context(context), float(reward)))
+        self.maybe_flush()
+
+    def maybe_flush(self) -> None:
+        if not self._pending:
+            return
+        due = (time.monotonic() - self._last_flush) >= self.flush_interval_s
+        if len(self._pending) >= self.flush_every or due:
+            self.flush()
+
+    def flush(self) -> None:
+        """Fold buffered rewards into the per-arm models, then persist once."""
+        pending, self._pending = self._pending, []
+        self._last_flush = time.monotonic()
+        if not pending:
+            return
+        touched: set[int] = set()
+        for i, x, r in pending:
+            self._A[i] += np.outer(x, x)
+            self._b[i] += r * x
+            touched.add(i)
+        for i in touched:
+            self._A_inv[i] = np.linalg.inv(self._A[i])
         self.save()
 
 
+@dataclass(frozen=True)
+class ReplayEvent:
+    context: np.ndarray
+    # Reward each eligible arm would have produced (full feedback, so regret is exact)
+    rewards: Dict[str, float]
+
+
+def synthetic_events(
+    labels: List[str], n: int, dim: int = FEATURE_DIM, noise: float = 0.1, seed: int = 0
+) -> list[ReplayEvent]:
+    """Linear-reward environment for benchmarking: each arm has a hidden weight vector."""
+    rng = np.random.default_rng(seed)
+    weights = {lbl: rng.normal(0.0, 1.0, dim) for lbl in labels}
+    events: list[ReplayEvent] = []
+    for _ in range(int(n)):
+        x = rng.uniform(-1.0, 1.0, dim)
+        x[0] = 1.0
+        eligible = [lbl for lbl in labels if rng.random() < 0.8] or labels[:1]
+        rewards = {lbl: float(weights[lbl] @ x + rng.normal(0.0, noise)) for lbl in eligible}
+        events.append(ReplayEvent(context=x, rewards=rewards))
+    return events
+
+
+def replay_regret(bandit: ContextualBandit, events: Iterable[ReplayEvent]) -> dict[str, float]:
+    """Replay events through ``bandit`` online and report cumulative regret and throughput."""
+    regret = 0.0
+    total = 0.0
+    n = 0
+    t0 = time.perf_counter()
+    for step, ev in enumerate(events):
+        arms = list(ev.rewards)
+        chosen = bandit.select(arms, step, context=ev.context) or arms[0]
+        r = ev.rewards[chosen]
+        regret += max(ev.rewards.values()) - r
+        total += r
+        bandit.update(chosen, r, context=ev.context)
+        n += 1
+    elapsed = time.perf_counter() - t0
+    bandit.flush()
+    return {
+        "events": float(n),
+        "cumulative_regret": regret,
+        "mean_regret": regret / n if n else 0.0,
+        "mean_reward": total / n if n else 0.0,
+        "decisions_per_s": n / elapsed if elapsed > 0 else 0.0,
+    }
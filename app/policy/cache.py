@@ -1,10 +1,23 @@
 from __future__ import annotations
 
+import json
+import sqlite3
+import threading
 import time
 from collections import OrderedDict
 from dataclasses import dataclass
+from pathlib import Path
 from typing import Any, Tuple
 
+from app.actions.types import action_from_dict, action_to_dict
+from app.config import settings
+from app.state.identity import NearDuplicateIndex, StateIdentity
+
+# Persistent-tier writes (hit counts, decisions, outcomes) are committed in batches, never one
+# commit per frame
+_FLUSH_EVERY = 64
+_FLUSH_S = 30.0
+
 
 @dataclass
 class CacheEntry:
@@ -15,36 +28,366 @@ class CacheEntry:
 
 
 class DecisionCache:
-    def __init__(self, capacity: int = 256, ttl_s: float = 120.0) -> None:
+    """LRU + TTL cache of decisions.
+
+    Keys are either plain strings (e.g. ``state_hash``) or ``StateIdentity`` values; identity keys
+    also match near-duplicate screens within ``tolerance`` Hamming bits.
+    """
+
+    def __init__(
+        self, capacity: int = 256, ttl_s: float = 120.0, tolerance: int | None = None
+    ) -> None:
         self.capacity = int(capacity)
         self.ttl_s = float(ttl_s)
         self._store: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._near: NearDuplicateIndex[str] = NearDuplicateIndex(tolerance)
+        self._idents: dict[str, StateIdentity] = {}
 
-    def get(self, key: str) -> Tuple[float, Any, str] | None:
+    def _resolve(self, key: str | StateIdentity) -> str:
+        if not isinstance(key, StateIdentity):
+            return key
+        if key.key in self._store:
+            return key.key
+        hit = self._near.get(key)
+        return hit if hit is not None else key.key
+
+    def _drop(self, key: str) -> None:
+        self._store.pop(key, None)
+        ident = self._idents.pop(key, None)
+        if ident is not None:
+            self._near.remove(ident)
+
+    def get(self, key: str | StateIdentity) -> Tuple[float, Any, str] | None:
         now = time.monotonic()
-        entry = self._store.get(key)
+        skey = self._resolve(key)
+        entry = self._store.get(skey)
         if not entry:
             return None
         if now - entry.ts > self.ttl_s:
             # expired
-            try:
-                del self._store[key]
-            except Exception:
-                pass
+            self._drop(skey)
             return None
         # refresh LRU
-        self._store.move_to_end(key)
+        self._store.move_to_end(skey)
         return entry.score, entry.action, entry.who
 
-    def set(self, key: str, score: float, action: Any, who: str) -> None:
+    def drop(self, key: str | StateIdentity) -> None:
+        self._drop(self._resolve(key))
+
+    def set(self, key: str | StateIdentity, score: float, action: Any, who: str) -> None:
         now = time.monotonic()
-        self._store[key] = CacheEntry(score=score, action=action, who=who, ts=now)
-        self._store.move_to_end(key)
+        if isinstance(key, StateIdentity):
+            skey = key.key
+            self._near.put(key, skey)
+            self._idents[skey] = key
+        else:
+            skey = key
+        self._store[skey] = CacheEntry(score=score, action=action, who=who, ts=now)
+        self._store.move_to_end(skey)
         # enforce capacity
         while len(self._store) > self.capacity:
             try:
-                self._store.popitem(last=False)
-            except Exception:
+                oldest = next(iter(self._store))
+            except StopIteration:
                 break
+            self._drop(oldest)
+
+
+@dataclass
+class StoredDecision:
+    key: str
+    score: float
+    action: dict[str, Any]
+    who: str
+    updated_ts: float
+    hits: int = 0
+    successes: int = 0
+    failures: int = 0
+
+    @property
+    def success_rate(self) -> float:
+        # Laplace-smoothed so a fresh entry starts at 0.5
+        return (self.successes + 1.0) / (self.successes + self.failures + 2.0)
+
+
+class DecisionStore:
+    """SQLite tier of the decision cache, keyed by state identity and shared across sessions.
+
+    All keys are mirrored in a near-duplicate index so lookups tolerate OCR/visual jitter. Each
+    entry carries outcome counts (did the screen react to the cached action?). Hit counts are
+    kept in memory; they, new decisions and outcomes are committed every ``_FLUSH_EVERY`` writes
+    or ``_FLUSH_S`` seconds, so the decision loop never waits on a commit. ``updated_ts`` only
+    moves when a screen gets a different action, so an entry's age is the age of its decision.
+    """
+
+    def __init__(
+        self, db_path: str | None = None, tolerance: int | None = None, max_rows: int = 5000
+    ) -> None:
+        self.db_path = db_path or settings.decision_cache_db_path
+        self.max_rows = int(max_rows)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS decisions (
+              key TEXT PRIMARY KEY,
+              score REAL NOT NULL,
+              action TEXT NOT NULL,
+              who TEXT NOT NULL,
+              updated_ts REAL NOT NULL,
+              hits INTEGER NOT NULL DEFAULT 0,
+              successes INTEGER NOT NULL DEFAULT 0,
+              failures INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+        self._conn.commit()
+        self._near: NearDuplicateIndex[str] = NearDuplicateIndex(tolerance)
+        self._hits: dict[str, int] = {}
+        self._pending = 0
+        self._flushed_ts = time.monotonic()
+        for (key,) in self._conn.execute("SELECT key FROM decisions"):
+            try:
+                self._near.put(StateIdentity.from_key(key), key)
+            except Exception:
+                continue
+
+    def __len__(self) -> int:
+        return len(self._near)
+
+    def get(self, ident: StateIdentity) -> StoredDecision | None:
+        with self._lock:
+            key = self._near.get(ident)
+            if key is None:
+                return None
+            row = self._conn.execute(
+                "SELECT key, score, action, who, updated_ts, hits, successes, failures "
+                "FROM decisions WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            hits = self._hits[key] = self._hits.get(key, 0) + 1
+            self._wrote_locked()
+        return StoredDecision(
+            key=row[0],
+            score=float(row[1]),
+            action=json.loads(row[2]),
+            who=row[3],
+            updated_ts=float(row[4]),
+            hits=int(row[5]) + hits,
+            successes=int(row[6]),
+            failures=int(row[7]),
+        )
+
+    def put(self, ident: StateIdentity, score: float, action: Any, who: str) -> None:
+        payload = json.dumps(action_to_dict(action))
+        with self._lock:
+            # Near-duplicate of a stored screen: update that entry instead of adding a twin
+            key = self._near.get(ident) or ident.key
+            self._conn.execute(
+                """
+                INSERT INTO decisions (key, score, action, who, updated_ts) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                  score = excluded.score,
+                  who = excluded.who,
+                  -- a different action starts a fresh outcome record and a fresh age
+                  updated_ts = CASE WHEN action = excluded.action THEN updated_ts
+                    ELSE excluded.updated_ts END,
+                  successes = CASE WHEN action = excluded.action THEN successes ELSE 0 END,
+                  failures = CASE WHEN action = excluded.action THEN failures ELSE 0 END,
+                  action = excluded.action
+                """,
+                (key, float(score), payload, who, time.time()),
+            )
+            self._wrote_locked()
+            if key == ident.key:
+                self._near.put(ident, key)
+            if len(self._near) > self.max_rows:
+                self._prune_locked()
+
+    def record_outcome(self, ident: StateIdentity, success: bool) -> None:
+        col = "successes" if success else "failures"
+        with self._lock:
+            key = self._near.get(ident)
+            if key is None:
+                return
+            self._conn.execute(f"UPDATE decisions SET {col} = {col} + 1 WHERE key = ?", (key,))
+            self._wrote_locked()
+
+    def drop(self, ident: StateIdentity) -> None:
+        with self._lock:
+            key = self._near.get(ident)
+            if key is None:
+                return
+            self._conn.execute("DELETE FROM decisions WHERE key = ?", (key,))
+            self._near.remove(StateIdentity.from_key(key))
+            self._wrote_locked()
+
+    def flush(self) -> None:
+        """Commit the hit counts and writes gathered since the last commit."""
+        with self._lock:
+            if self._hits or self._pending:
+                self._flush_hits_locked()
+                self._conn.commit()
 
+    def _wrote_locked(self) -> None:
+        self._pending += 1
+        if self._pending >= _FLUSH_EVERY or time.monotonic() - self._flushed_ts >= _FLUSH_S:
+            self._flush_hits_locked()
+            self._conn.commit()
+
+    def _flush_hits_locked(self) -> None:
+        if self._hits:
+            self._conn.executemany(
+                "UPDATE decisions SET hits = hits + ? WHERE key = ?",
+                [(n, key) for key, n in self._hits.items()],
+            )
+            self._hits = {}
+        self._pending = 0
+        self._flushed_ts = time.monotonic()
+
+    def _prune_locked(self) -> None:
+        # Keep the most useful rows: reliable, frequently hit, recently refreshed
+        self._flush_hits_locked()
+        excess = len(self._near) - int(self.max_rows * 0.9)
+        rows = self._conn.execute(
+            """
+            SELECT key FROM decisions
+            ORDER BY (successes + 1.0) / (successes + failures + 2.0) * (1 + hits), updated_ts
+            LIMIT ?
+            """,
+            (max(0, excess),),
+        ).fetchall()
+        for (key,) in rows:
+            self._conn.execute("DELETE FROM decisions WHERE key = ?", (key,))
+            self._near.remove(StateIdentity.from_key(key))
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._flush_hits_locked()
+                self._conn.commit()
+            finally:
+                self._conn.close()
+
+
+class TieredDecisionCache:
+    """Hot in-memory LRU in front of the persistent ``DecisionStore``.
+
+    Stored decisions are only served while their observed success rate stays above
+    ``min_success`` and they are younger than ``max_age_s``; a failed outcome also evicts the hot
+    entry so the next frame re-plans. ``stats()`` reports hit rate, latency saved and staleness.
+    """
+
+    def __init__(
+        self,
+        hot: DecisionCache | None = None,
+        store: DecisionStore | None = None,
+        min_success: float | None = None,
+        max_age_s: float | None = None,
+    ) -> None:
+        self.hot = hot or DecisionCache()
+        self._store = store
+        self.min_success = (
+            float(settings.decision_cache_min_success) if min_success is None else min_success
+        )
+        self.max_age_s = (
+            float(settings.decision_cache_max_age_s) if max_age_s is None else max_age_s
+        )
+        self.hot_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.latency_saved_ms = 0.0
+        self.last_staleness_s = 0.0
+        # Running mean of full decision latency, i.e. what a hit saves
+        self._decide_ms = 0.0
+        self._decide_n = 0
+
+    @property
+    def store(self) -> DecisionStore | None:
+        if self._store is None:
+            try:
+                self._store = DecisionStore()
+            except Exception:
+                return None
+        return self._store
+
+    def get(self, key: str | StateIdentity) -> Tuple[float, Any, str] | None:
+        hit = self.hot.get(key)
+        if hit is not None:
+            self.hot_hits += 1
+            self.last_staleness_s = 0.0
+            self.latency_saved_ms += self._decide_ms
+            return hit
+        entry = None
+        if isinstance(key, StateIdentity) and (store := self.store) is not None:
+            entry = store.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        age = time.time() - entry.updated_ts
+        if age > self.max_age_s or entry.success_rate < self.min_success:
+            self.rejected += 1
+            self.misses += 1
+            if age > self.max_age_s:
+                # Expired: the next decision for this screen starts a fresh entry
+                try:
+                    store.drop(key)
+                except Exception:
+                    pass
+            return None
+        try:
+            action = action_from_dict(entry.action)
+        except ValueError:
+            self.misses += 1
+            return None
+        self.store_hits += 1
+        self.last_staleness_s = age
+        self.latency_saved_ms += self._decide_ms
+        self.hot.set(key, entry.score, action, entry.who)
+        return entry.score, action, entry.who
+
+    def set(self, key: str | StateIdentity, score: float, action: Any, who: str) -> None:
+        self.hot.set(key, score, action, who)
+        if isinstance(key, StateIdentity) and (store := self.store) is not None:
+            try:
+                store.put(key, score, action, who)
+            except Exception:
+                pass
+
+    def flush(self) -> None:
+        if self._store is not None:
+            try:
+                self._store.flush()
+            except Exception:
+                pass
+
+    def note_decision_latency(self, ms: float) -> None:
+        self._decide_n += 1
+        self._decide_ms += (float(ms) - self._decide_ms) / float(self._decide_n)
+
+    def record_outcome(self, key: str | StateIdentity, success: bool) -> None:
+        if not success:
+            self.hot.drop(key)
+        if isinstance(key, StateIdentity) and (store := self.store) is not None:
+            try:
+                store.record_outcome(key, success)
+            except Exception:
+                pass
 
+    def stats(self) -> dict[str, float]:
+        lookups = self.hot_hits + self.store_hits + self.misses
+        return {
+            "hit_rate": (self.hot_hits + self.store_hits) / lookups if lookups else 0.0,
+            "hot_hits": float(self.hot_hits),
+            "store_hits": float(self.store_hits),
+            "misses": float(self.misses),
+            "rejected": float(self.rejected),
+            "latency_saved_ms": self.latency_saved_ms,
+            "staleness_s": self.last_staleness_s,
+            "stored": float(len(self._store)) if self._store is not None else 0.0,
+        }
@@ -5,18 +5,58 @@ from app.metrics.registry import compute_metrics, score_metrics
 from app.state.encoder import GameState
 from app.config import settings
 from app.state.profile import is_mode_sufficient, mark_mode_done, reset_daily_if_new_day, is_mode_locked, set_mode_locked
+from app.state.identity import StateIdentity, identity_of, same_screen
+from dataclasses import dataclass, field, replace
 import random
+import threading
 
 
-# Sticky memory to reduce repeated tapping on unchanged scenes
-_last_ocr_fingerprint: str | None = None
-_repeat_count: int = 0
-# Track per-label cooldown to avoid immediate re-taps on the same menu label
-_label_cooldown: dict[str, int] = {}
-# Rotate through matched targets to avoid hammering a single spot
-_last_choice_idx: int = -1
-# Track last selected label to correlate lock popups
-_last_selected_label: str | None = None
+@dataclass
+class PolicyContext:
+    """Per-session policy memory; one per runner/device so decisions never share state."""
+
+    # Sticky memory to reduce repeated tapping on unchanged scenes
+    last_identity: StateIdentity | None = None
+    repeat_count: int = 0
+    # Track per-label cooldown to avoid immediate re-taps on the same menu label
+    label_cooldown: dict[str, int] = field(default_factory=dict)
+    # Rotate through matched targets to avoid hammering a single spot
+    last_choice_idx: int = -1
+    # Track last selected label to correlate lock popups
+    last_selected_label: str | None = None
+    # Rotating exploration pattern when nothing recognizable is on screen
+    exploration_pattern: int = 0
+    # Icon-prior agent: repeated taps on the same icon trigger a heuristic fallback
+    last_icon_coords: tuple[int, int] | None = None
+    icon_repeat_count: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+    # Speculative decisions run on an old snapshot: they must not write the profile, queue
+    # knowledge jobs, publish steps or run HF inference
+    speculative: bool = False
+    # Base proposal memo (state, proposal) kept by the orchestrator; it lives and dies with the
+    # context, and has its own lock because the heuristic takes ``lock`` while proposing
+    proposal: tuple[GameState, tuple[float, object]] | None = field(
+        default=None, repr=False, compare=False
+    )
+    proposal_lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def fork(self, speculative: bool = False) -> PolicyContext:
+        """Independent copy (own lock) for decisions that may be thrown away, e.g. speculation."""
+        with self.lock:
+            return replace(
+                self,
+                label_cooldown=dict(self.label_cooldown),
+                lock=threading.Lock(),
+                speculative=speculative,
+                proposal=None,
+                proposal_lock=threading.Lock(),
+            )
+
+
+# Shared context for callers that do not manage their own (scripts, tests)
+default_context = PolicyContext()
 
 # Common lock popup cues
 _LOCK_CUES: tuple[str, ...] = (
@@ -76,54 +116,17 @@ _TARGETS = [
 ]
 
 
-def _fingerprint(text: str, tokens: list[str] | None = None) -> str:
-    # Normalize OCR text aggressively to detect "same screen" despite small OCR jitter
-    t = (text or "").lower()
-    # Keep letters and spaces only; collapse spaces
-    cleaned = []
-    prev_space = False
-    for ch in t:
-        if ch.isalpha():
-            cleaned.append(ch)
-            prev_space = False
-        elif ch.isspace():
-            if not prev_space:
-                cleaned.append(" ")
-            prev_space = True
-        # drop digits/punctuations
-    norm = ("".join(cleaned)).strip()
-    # Focus on presence of key labels to be robust
-    keys = [
-        "episode",
-        "side story",
-        "battle",
-        "arena",
-        "summon",
-        "shop",
-        "event",
-        "sanctuary",
-    ]
-    present = []
-    base = norm
-    for k in keys:
-        if k in norm:
-            present.append(k)
-    if tokens:
-        token_set = set(tokens)
-        for k in keys:
-            if k in token_set and k not in present:
-                present.append(k)
-    if present:
-        present.sort()
-        base = "|".join(present)
-    return base[:200]
+def propose_action(state: GameState, ctx: PolicyContext | None = None) -> tuple[float, object]:
+    if ctx is None:
+        ctx = default_context
+    with ctx.lock:
+        return _propose(state, ctx)
 
 
-def propose_action(state: GameState) -> tuple[float, object]:
-    global _last_selected_label, _last_choice_idx, _label_cooldown, _mode_sufficient, _mode_locked
-    global _last_fingerprint, _last_action_time, _last_action_type, _last_ocr_fingerprint, _repeat_count
+def _propose(state: GameState, ctx: PolicyContext) -> tuple[float, object]:
     # Reset daily sufficiency flags if a new day
-    reset_daily_if_new_day()
+    if not ctx.speculative:
+        reset_daily_if_new_day()
     metrics = compute_metrics(state)
     score = score_metrics(metrics)
     # Bias toward progress: small preference for moving toward common progression menus
@@ -132,17 +135,17 @@ def propose_action(state: GameState) -> tuple[float, object]:
     if any(k in text_lower for k in progress_keywords):
         score += 0.05
 
-    # Avoid hammering: back off when OCR text hasn't changed across frames
-    fp = _fingerprint(state.ocr_text, state.ocr_tokens)
-    if _last_ocr_fingerprint is not None and fp == _last_ocr_fingerprint:
-        _repeat_count += 1
+    # Avoid hammering: back off when the screen identity hasn't changed across frames
+    ident = identity_of(state)
+    if same_screen(ctx.last_identity, ident):
+        ctx.repeat_count += 1
     else:
-        _repeat_count = 0
-    _last_ocr_fingerprint = fp
+        ctx.repeat_count = 0
+    ctx.last_identity = ident
 
-    if _repeat_count >= 2:
+    if ctx.repeat_count >= 2:
         # Progressive backoff ladder: wait → back → gentle swipes (up/down) → wait
-        step = _repeat_count % 6
+        step = ctx.repeat_count % 6
         base_w = max(1, int(settings.input_base_width))
         base_h = max(1, int(settings.input_base_height))
         if step == 2:
@@ -162,15 +165,16 @@ def propose_action(state: GameState) -> tuple[float, object]:
         return score, WaitAction(seconds=0.5)
     # If OCR mentions multiple 'locked' items on battle screen, deprioritize 'battle' quickly
     if "battle" in text_lower and "locked" in text_lower:
-        _label_cooldown["battle"] = max(_label_cooldown.get("battle", 0), 50)
+        ctx.label_cooldown["battle"] = max(ctx.label_cooldown.get("battle", 0), 50)
 
     # If a lock popup is on screen, mark last selected label as locked and set a long cooldown
     if any(cue in text_lower for cue in _LOCK_CUES):
         try:
-            target_label = _last_selected_label or _infer_label_from_text(text_lower)
+            target_label = ctx.last_selected_label or _infer_label_from_text(text_lower)
             if target_label:
-                set_mode_locked(target_label, True)
-                _label_cooldown[target_label] = max(_label_cooldown.get(target_label, 0), 300)
+                if not ctx.speculative:
+                    set_mode_locked(target_label, True)
+                ctx.label_cooldown[target_label] = max(ctx.label_cooldown.get(target_label, 0), 300)
         except Exception:
             pass
 
@@ -179,10 +183,11 @@ def propose_action(state: GameState) -> tuple[float, object]:
     # If we see locked cues, record lock for 'arena' and apply a long cooldown to avoid re-targeting
     if any(s in text for s in ("rookie arena", "unlock after", "arena locked")):
         try:
-            set_mode_locked("arena", True)
+            if not ctx.speculative:
+                set_mode_locked("arena", True)
         except Exception:
             pass
-        _label_cooldown["arena"] = max(_label_cooldown.get("arena", 0), 50)
+        ctx.label_cooldown["arena"] = max(ctx.label_cooldown.get("arena", 0), 50)
     
     # Enhanced text matching: be more flexible with OCR noise
     token_set = set((state.ocr_tokens or []))
@@ -218,7 +223,7 @@ def propose_action(state: GameState) -> tuple[float, object]:
             matched.append((name, xf, yf))
     
     # Filter out arena if on long cooldown or persisted as locked
-    matched = [m for m in matched if not (m[0] == "arena" and (_label_cooldown.get("arena", 0) > 0 or is_mode_locked("arena")))]
+    matched = [m for m in matched if not (m[0] == "arena" and (ctx.label_cooldown.get("arena", 0) > 0 or is_mode_locked("arena")))]
     # If no text matches, try icon/button anchors detected by perception
     if not matched and getattr(state, "ui_buttons", None):
         # Prefer known buttons that are not locked
@@ -233,7 +238,7 @@ def propose_action(state: GameState) -> tuple[float, object]:
                 cy = b.y + b.h // 2
                 x = int(cx / state.img_width * base_w)
                 y = int(cy / state.img_height * base_h)
-                _last_selected_label = b.label
+                ctx.last_selected_label = b.label
                 return score, TapAction(x=x, y=y)
     # As a last resort, sample likely icon anchors even if OCR did not see text
     if not matched and not getattr(state, "ui_buttons", None):
@@ -254,13 +259,13 @@ def propose_action(state: GameState) -> tuple[float, object]:
                 cy = b.y + b.h // 2
                 x = int(cx / state.img_width * base_w)
                 y = int(cy / state.img_height * base_h)
-                _last_selected_label = b.label
+                ctx.last_selected_label = b.label
                 return score, TapAction(x=x, y=y)
     if matched:
         # Filter out labels on cooldown
-        ready = [t for t in matched if _label_cooldown.get(t[0], 0) <= 0] or matched
-        _last_choice_idx = (_last_choice_idx + 1) % len(ready)
-        name, xf, yf = ready[_last_choice_idx]
+        ready = [t for t in matched if ctx.label_cooldown.get(t[0], 0) <= 0] or matched
+        ctx.last_choice_idx = (ctx.last_choice_idx + 1) % len(ready)
+        name, xf, yf = ready[ctx.last_choice_idx]
         # If a mode is already considered sufficient today, deprioritize by small bias
         if is_mode_sufficient(name):
             score -= 0.03
@@ -275,11 +280,11 @@ def propose_action(state: GameState) -> tuple[float, object]:
         x = max(0, min(base_w - 1, x))
         y = max(0, min(base_h - 1, y))
         # Set a short cooldown to avoid immediate re-selection
-        _label_cooldown[name] = max(3, _label_cooldown.get(name, 0))
+        ctx.label_cooldown[name] = max(3, ctx.label_cooldown.get(name, 0))
         # Decay existing cooldowns
-        for k in list(_label_cooldown.keys()):
-            _label_cooldown[k] = max(0, _label_cooldown[k] - 1)
-        _last_selected_label = name
+        for k in list(ctx.label_cooldown.keys()):
+            ctx.label_cooldown[k] = max(0, ctx.label_cooldown[k] - 1)
+        ctx.last_selected_label = name
         return score, TapAction(x=x, y=y)
 
     # Simple heuristic: if stamina exists and is low percentage, wait; else tap near center to advance
@@ -293,29 +298,26 @@ def propose_action(state: GameState) -> tuple[float, object]:
     base_h = max(1, int(settings.input_base_height))
     
     # Track exploration pattern to avoid repetition
-    global _exploration_pattern
-    if '_exploration_pattern' not in globals():
-        _exploration_pattern = 0
-    
-    _exploration_pattern = (_exploration_pattern + 1) % 6
+    ctx.exploration_pattern = (ctx.exploration_pattern + 1) % 6
+    exploration_pattern = ctx.exploration_pattern
     
-    if _exploration_pattern == 0:
+    if exploration_pattern == 0:
         # Pattern 1: Center exploration band (30%-60% height)
         x = int(base_w * (0.35 + random.random() * 0.30))
         y = int(base_h * (0.30 + random.random() * 0.30))
-    elif _exploration_pattern == 1:
+    elif exploration_pattern == 1:
         # Pattern 2: Left side exploration (10%-40% width, 20%-80% height)
         x = int(base_w * (0.10 + random.random() * 0.30))
         y = int(base_h * (0.20 + random.random() * 0.60))
-    elif _exploration_pattern == 2:
+    elif exploration_pattern == 2:
         # Pattern 3: Right side exploration (60%-90% width, 20%-80% height)
         x = int(base_w * (0.60 + random.random() * 0.30))
         y = int(base_h * (0.20 + random.random() * 0.60))
-    elif _exploration_pattern == 3:
+    elif exploration_pattern == 3:
         # Pattern 4: Top exploration (20%-80% width, 10%-40% height)
         x = int(base_w * (0.20 + random.random() * 0.60))
         y = int(base_h * (0.10 + random.random() * 0.30))
-    elif _exploration_pattern == 4:
+    elif exploration_pattern == 4:
         # Pattern 5: Bottom exploration (20%-80% width, 60%-90% height)
         x = int(base_w * (0.20 + random.random() * 0.60))
         y = int(base_h * (0.60 + random.random() * 0.30))
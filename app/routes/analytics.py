@@ -6,6 +6,7 @@ from fastapi import APIRouter, Query, Body
 
 from app.analytics.metrics import store
 from app.analytics.session import session
+from app.navigation.graph import get_graph
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
@@ -63,3 +64,9 @@ async def compare_metrics(n: int = 5) -> dict[str, dict[str, object]]:
             delta = avgs[-1] - avgs[-2]
         result[name] = {"chunks": avgs, "delta": delta}
     return result
+
+
+@router.get("/navigation")
+async def navigation_summary() -> dict[str, Any]:
+    g = get_graph()
+    return {**g.summary(), "top_nodes": g.top_nodes(50)}
@@ -5,7 +5,7 @@ from typing import Any
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Body
 
-from app.memory.store import MemoryStore
+from app.memory.store import get_memory_store
 from app.telemetry.bus import Guidance, bus
 from app.agents.runner import runner
 from app.services.capture.window_manage import (
@@ -22,6 +22,8 @@ from app.diagnostics.doctor import run_self_check, suggestions_for
 from app.actions.executor import execute
 from app.actions.types import BackAction, WaitAction, SwipeAction
 from app.agents.orchestrator import set_hf_policy_enabled, get_hf_policy_enabled
+from app.services.hf.cache import get_response_cache
+from app.services.hf.server import server_stats
 from app.telemetry.bus import bus
 
 router = APIRouter(prefix="/telemetry", tags=["telemetry"])
@@ -41,6 +43,18 @@ async def status() -> dict[str, Any]:
 @router.get("/decisions")
 async def decisions() -> list[dict[str, Any]]:
     return bus.get_decision_log()
+
+
+@router.get("/decisions/cache")
+async def decision_cache_stats() -> dict[str, float]:
+    return runner.cache_stats()
+
+
+@router.get("/hf")
+async def hf_stats() -> dict[str, Any]:
+    return {"cache": get_response_cache().stats(), "servers": server_stats()}
+
+
 @router.get("/logs")
 async def recent_logs(limit: int = 200) -> list[dict[str, Any]]:
     return bus.recent_logs(limit)
@@ -72,8 +86,7 @@ async def control_stop() -> dict[str, str]:
 
 @router.get("/memory/search")
 async def memory_search(q: str) -> list[dict[str, Any]]:
-    store = MemoryStore()
-    results = store.search(q)
+    results = await asyncio.to_thread(get_memory_store().search, q)
     return [r.__dict__ for r in results]
 
 
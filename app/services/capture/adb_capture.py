@@ -7,7 +7,10 @@ from app.config import settings
 
 
 class AdbCaptureError(RuntimeError):
-    pass
+    def __init__(self, message: str, stdout: bytes | None = None) -> None:
+        super().__init__(message)
+        # Whatever the command printed before it failed (partial batch-script marks)
+        self.stdout = stdout
 
 
 def adb_exec(args: list[str], timeout: float = 10.0) -> bytes:
@@ -15,9 +18,10 @@ def adb_exec(args: list[str], timeout: float = 10.0) -> bytes:
     try:
         proc = subprocess.run(cmd, capture_output=True, timeout=timeout, check=True)
     except subprocess.CalledProcessError as exc:
-        raise AdbCaptureError(exc.stderr.decode("utf-8", errors="ignore")) from exc
+        raise AdbCaptureError(exc.stderr.decode("utf-8", errors="ignore"), exc.stdout) from exc
     except subprocess.TimeoutExpired as exc:
-        raise AdbCaptureError(f"ADB command timed out: {' '.join(cmd)}") from exc
+        out = exc.stdout if isinstance(exc.stdout, bytes) else None
+        raise AdbCaptureError(f"ADB command timed out: {' '.join(cmd)}", out) from exc
     return proc.stdout
 
 
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from app.config import settings
+from app.navigation.graph import action_signature
+from app.state.identity import NearDuplicateIndex, StateIdentity
+
+# Minimum seconds between automatic saves of the persistent cache
+_SAVE_INTERVAL_S = 10.0
+
+
+@dataclass
+class CachedResponse:
+    value: str
+    created_ts: float
+    # Model time the response took to produce; credited as "saved" on every hit
+    cost_s: float = 0.0
+    hits: int = 0
+
+
+def candidates_signature(candidates: Iterable[tuple[float, Any, str]]) -> str:
+    """Order-sensitive key of a judge candidate list; scores are ignored, taps keyed by cell."""
+    parts = []
+    for _, action, who in candidates:
+        try:
+            sig = action_signature(action) or "wait"
+        except Exception:
+            sig = type(action).__name__
+        parts.append(f"{who}:{sig}")
+    return hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def response_scope(model_id: str, template_version: str, candidates: str = "") -> str:
+    """Everything except the screen that determines a response: model, prompt, candidate set."""
+    return f"{model_id}|{template_version}|{candidates}"
+
+
+class ResponseCache:
+    """LRU + TTL cache of raw HF responses keyed by (scope, state identity).
+
+    Identities are matched within the state identity tolerance, so a screen whose OCR or pixels
+    jitter slightly still reuses the response. Optionally persisted to JSON so repeated screens
+    are served from cache across restarts too.
+    """
+
+    def __init__(
+        self,
+        max_entries: int | None = None,
+        ttl_s: float | None = None,
+        path: Path | str | None = None,
+    ) -> None:
+        cap = settings.hf_cache_max_entries if max_entries is None else max_entries
+        self.max_entries = max(1, int(cap))
+        self.ttl_s = float(settings.hf_cache_ttl_s if ttl_s is None else ttl_s)
+        self.path = Path(path) if path else None
+        self._entries: OrderedDict[tuple[str, str], CachedResponse] = OrderedDict()
+        self._indexes: dict[str, NearDuplicateIndex[str]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save_ts = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.saved_s = 0.0
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expired(self, entry: CachedResponse, now: float) -> bool:
+        return self.ttl_s > 0 and now - entry.created_ts > self.ttl_s
+
+    def _drop(self, scope: str, key: str) -> None:
+        self._entries.pop((scope, key), None)
+        idx = self._indexes.get(scope)
+        if idx is not None:
+            idx.remove(StateIdentity.from_key(key))
+            if not len(idx):
+                del self._indexes[scope]
+
+    def get(self, scope: str, ident: StateIdentity) -> str | None:
+        with self._lock:
+            idx = self._indexes.get(scope)
+            key = idx.get(ident) if idx is not None else None
+            entry = self._entries.get((scope, key)) if key is not None else None
+            if entry is None or key is None:
+                self.misses += 1
+                return None
+            if self._expired(entry, time.time()):
+                self._drop(scope, key)
+                self._dirty = True
+                self.misses += 1
+                return None
+            self._entries.move_to_end((scope, key))
+            entry.hits += 1
+            self.hits += 1
+            self.saved_s += entry.cost_s
+            return entry.value
+
+    def put(self, scope: str, ident: StateIdentity, value: str, cost_s: float = 0.0) -> None:
+        with self._lock:
+            self._insert(scope, ident.key, CachedResponse(value, time.time(), float(cost_s)))
+            self._dirty = True
+        self.maybe_save()
+
+    def _insert(self, scope: str, key: str, entry: CachedResponse) -> None:
+        self._entries[(scope, key)] = entry
+        self._entries.move_to_end((scope, key))
+        self._indexes.setdefault(scope, NearDuplicateIndex()).put(StateIdentity.from_key(key), key)
+        while len(self._entries) > self.max_entries:
+            (old_scope, old_key), _ = next(iter(self._entries.items()))
+            self._drop(old_scope, old_key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._indexes.clear()
+            self._dirty = True
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": float(len(self._entries)),
+                "hits": float(self.hits),
+                "misses": float(self.misses),
+                "hit_rate": self.hits / total if total else 0.0,
+                "model_time_saved_s": self.saved_s,
+            }
+
+    # --- persistence -----------------------------------------------------
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            obj = json.loads(self.path.read_text(encoding="utf-8"))
+            now = time.time()
+            for row in obj.get("entries", []):
+                entry = CachedResponse(
+                    value=str(row["value"]),
+                    created_ts=float(row["created_ts"]),
+                    cost_s=float(row.get("cost_s", 0.0)),
+                    hits=int(row.get("hits", 0)),
+                )
+                if not self._expired(entry, now):
+                    self._insert(str(row["scope"]), str(row["key"]), entry)
+        except Exception:
+            # corrupt file: start empty
+            self._entries.clear()
+            self._indexes.clear()
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            rows = [
+                {"scope": scope, "key": key, **asdict(e)}
+                for (scope, key), e in self._entries.items()
+            ]
+            self._dirty = False
+            self._last_save_ts = time.monotonic()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"entries": rows}, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(self.path)
+        except Exception:
+            pass
+
+    def maybe_save(self) -> None:
+        if self._dirty and (time.monotonic() - self._last_save_ts) >= _SAVE_INTERVAL_S:
+            self.save()
+
+
+_cache: ResponseCache | None = None
+
+
+def get_response_cache() -> ResponseCache:
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(path=settings.hf_cache_path or None)
+    return _cache
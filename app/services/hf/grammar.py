@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import functools
+from dataclasses import dataclass, field
+from typing import Any, Union
+
+
+@dataclass(frozen=True)
+class Lit:
+    text: str
+
+
+@dataclass(frozen=True)
+class Choice:
+    """One of a finite set of strings (bounded numbers are enumerated up front)."""
+
+    values: frozenset[str]
+    prefixes: frozenset[str]
+    # prefix -> characters that extend it towards some value
+    follow: dict[str, frozenset[str]] = field(compare=False, hash=False)
+
+    @classmethod
+    def of(cls, values: list[str]) -> Choice:
+        follow: dict[str, set[str]] = {}
+        for v in values:
+            for i in range(len(v)):
+                follow.setdefault(v[:i], set()).add(v[i])
+        prefixes = set(follow) | set(values)
+        return cls(
+            values=frozenset(values),
+            prefixes=frozenset(prefixes),
+            follow={k: frozenset(c) for k, c in follow.items()},
+        )
+
+
+Segment = Union[Lit, Choice]
+# (template index, segment index, text consumed within the segment)
+_Pos = tuple[int, int, str]
+
+
+def int_choice(lo: int, hi: int) -> Choice:
+    return Choice.of([str(v) for v in range(int(lo), int(hi) + 1)])
+
+
+def tenths_choice(lo: float, hi: float) -> Choice:
+    """Decimals with one fractional digit, e.g. 0.2..2.0."""
+    a, b = int(round(lo * 10)), int(round(hi * 10))
+    return Choice.of([f"{v // 10}.{v % 10}" for v in range(a, b + 1)])
+
+
+class Grammar:
+    """Union of flat templates, matched one character at a time.
+
+    Small enough to track every live (template, segment, offset) position at once, so
+    alternatives sharing a prefix (``{"type":"t...``) stay ambiguous until a character decides.
+    """
+
+    def __init__(self, templates: list[tuple[Segment, ...]]) -> None:
+        self.templates = [tuple(t) for t in templates]
+
+    def start(self) -> GrammarState:
+        return GrammarState(self, frozenset((i, 0, "") for i in range(len(self.templates))))
+
+
+@dataclass(frozen=True)
+class GrammarState:
+    grammar: Grammar = field(compare=False)
+    positions: frozenset[_Pos]
+
+    def _step(self, pos: _Pos, ch: str) -> list[_Pos]:
+        t, s, buf = pos
+        segs = self.grammar.templates[t]
+        if s >= len(segs):
+            return []
+        seg = segs[s]
+        out: list[_Pos] = []
+        if isinstance(seg, Lit):
+            if seg.text[len(buf)] == ch:
+                nb = buf + ch
+                out.append((t, s + 1, "") if nb == seg.text else (t, s, nb))
+            return out
+        if buf + ch in seg.prefixes:
+            out.append((t, s, buf + ch))
+        if buf in seg.values:
+            # the choice may end here; the character then belongs to the next segment
+            out.extend(self._step((t, s + 1, ""), ch))
+        return out
+
+    def advance(self, ch: str) -> GrammarState | None:
+        nxt = frozenset(p for pos in self.positions for p in self._step(pos, ch))
+        return GrammarState(self.grammar, nxt) if nxt else None
+
+    def advance_text(self, text: str) -> GrammarState | None:
+        st: GrammarState | None = self
+        for ch in text:
+            st = st.advance(ch) if st is not None else None
+        return st
+
+    def _next_chars(self, pos: _Pos) -> set[str]:
+        t, s, buf = pos
+        segs = self.grammar.templates[t]
+        if s >= len(segs):
+            return set()
+        seg = segs[s]
+        if isinstance(seg, Lit):
+            return {seg.text[len(buf)]}
+        chars = set(seg.follow.get(buf, ()))
+        if buf in seg.values:
+            chars |= self._next_chars((t, s + 1, ""))
+        return chars
+
+    def next_chars(self) -> set[str]:
+        out: set[str] = set()
+        for pos in self.positions:
+            out |= self._next_chars(pos)
+        return out
+
+    @property
+    def complete(self) -> bool:
+        return any(s >= len(self.grammar.templates[t]) for t, s, _ in self.positions)
+
+    @property
+    def done(self) -> bool:
+        return self.complete and not self.next_chars()
+
+    def forced(self) -> str:
+        """Characters the grammar leaves no choice about from here (jump-forward text)."""
+        out: list[str] = []
+        st: GrammarState | None = self
+        while st is not None and not st.complete:
+            chars = st.next_chars()
+            if len(chars) != 1:
+                break
+            ch = next(iter(chars))
+            out.append(ch)
+            st = st.advance(ch)
+        return "".join(out)
+
+
+@dataclass(frozen=True)
+class ActionGrammar:
+    """Compact action JSON with coordinates bounded by the input base resolution."""
+
+    width: int
+    height: int
+
+    def compile(self) -> Grammar:
+        return _compile_action(int(self.width), int(self.height))
+
+    def json_schema(self) -> dict[str, Any]:
+        x = {"type": "integer", "minimum": 0, "maximum": int(self.width)}
+        y = {"type": "integer", "minimum": 0, "maximum": int(self.height)}
+
+        def obj(kind: str, props: dict[str, Any]) -> dict[str, Any]:
+            return {
+                "type": "object",
+                "properties": {"type": {"const": kind}, **props},
+                "required": ["type", *props],
+                "additionalProperties": False,
+            }
+
+        return {
+            "oneOf": [
+                obj("tap", {"x": x, "y": y}),
+                obj(
+                    "swipe",
+                    {
+                        "x1": x,
+                        "y1": y,
+                        "x2": x,
+                        "y2": y,
+                        "duration_ms": {"type": "integer", "minimum": 50, "maximum": 1200},
+                    },
+                ),
+                obj("wait", {"seconds": {"type": "number", "minimum": 0.2, "maximum": 2.0}}),
+                obj("back", {}),
+            ]
+        }
+
+
+@functools.lru_cache(maxsize=4)
+def _compile_action(width: int, height: int) -> Grammar:
+    x, y = int_choice(0, width), int_choice(0, height)
+    return Grammar(
+        [
+            (Lit('{"type":"tap","x":'), x, Lit(',"y":'), y, Lit("}")),
+            (
+                Lit('{"type":"swipe","x1":'),
+                x,
+                Lit(',"y1":'),
+                y,
+                Lit(',"x2":'),
+                x,
+                Lit(',"y2":'),
+                y,
+                Lit(',"duration_ms":'),
+                int_choice(50, 1200),
+                Lit("}"),
+            ),
+            (Lit('{"type":"wait","seconds":'), tenths_choice(0.2, 2.0), Lit("}")),
+            (Lit('{"type":"back"}'),),
+        ]
+    )
+
+
+class TokenTrie:
+    """Character trie over the decoded vocabulary, walked in lockstep with a grammar state."""
+
+    def __init__(self) -> None:
+        self.children: dict[str, TokenTrie] = {}
+        self.ids: list[int] = []
+
+    @classmethod
+    def from_vocab(cls, pieces: dict[int, str]) -> TokenTrie:
+        root = cls()
+        for tid, text in pieces.items():
+            # skip special tokens and partial UTF-8 byte pieces
+            if not text or "\ufffd" in text:
+                continue
+            node = root
+            for ch in text:
+                node = node.children.setdefault(ch, cls())
+            node.ids.append(tid)
+        return root
+
+    def allowed(self, state: GrammarState) -> dict[int, GrammarState]:
+        """Every token whose full text the grammar accepts from ``state``, with the new state."""
+        out: dict[int, GrammarState] = {}
+        stack: list[tuple[TokenTrie, GrammarState]] = [(self, state)]
+        while stack:
+            node, st = stack.pop()
+            for ch in st.next_chars():
+                child = node.children.get(ch)
+                if child is None:
+                    continue
+                nxt = st.advance(ch)
+                if nxt is None:
+                    continue
+                for tid in child.ids:
+                    out[tid] = nxt
+                stack.append((child, nxt))
+        return out
+
+    def tokenize_forced(self, state: GrammarState, text: str) -> tuple[list[int], GrammarState]:
+        """Greedy longest-match tokens for forced ``text``; stops early if no token fits."""
+        ids: list[int] = []
+        i = 0
+        while i < len(text):
+            node, best, j = self, None, i
+            while j < len(text) and text[j] in node.children:
+                node = node.children[text[j]]
+                j += 1
+                if node.ids:
+                    best = (node.ids[0], j)
+            if best is None:
+                break
+            nxt = state.advance_text(text[i : best[1]])
+            if nxt is None:
+                break
+            ids.append(best[0])
+            state = nxt
+            i = best[1]
+        return ids, state
@@ -1,43 +1,38 @@
 from __future__ import annotations
 
 import json
+import time
 from typing import Any, List, Tuple
 
 from app.actions.types import BackAction, SwipeAction, TapAction, WaitAction
 from app.config import settings
+from app.services.hf.cache import candidates_signature, get_response_cache, response_scope
+from app.services.hf.server import InferenceServer, get_server
 from app.state.encoder import GameState
+from app.state.identity import identity_of
+
+# Bump whenever the prompt text changes so cached verdicts of the old prompt are not reused
+JUDGE_PROMPT_VERSION = "judge-v1"
+_JUDGE_PREFIX = (
+    "You are a judge. Review candidate actions and pick the best index. Return strict JSON: {\"index\": int, \"reason\": str}.\n"
+    "Rules: avoid external links/programs and avoid selling/removing heroes or equipment. Prefer safe navigation.\n"
+)
 
 
 class HFJudge:
     """Judge that selects the best candidate via Hugging Face (local or hosted)."""
 
     def __init__(self) -> None:
-        self._pipeline: Any | None = None
-        self._client: Any | None = None
+        self._server: InferenceServer | None = None
+        self._model_id = ""
 
     def _ensure_backend(self) -> None:
         model_id = settings.hf_model_id_judge
         if not model_id:
             raise RuntimeError("HF judge model id is not configured")
-        if self._pipeline or self._client:
-            return
-        if settings.hf_inference_endpoint_url:
-            from huggingface_hub import InferenceClient
-
-            self._client = InferenceClient(
-                model=model_id,
-                token=settings.huggingface_hub_token,
-                timeout=30,
-            )
-        else:
-            from transformers import pipeline
-
-            self._pipeline = pipeline(
-                "text-generation",
-                model=model_id,
-                device_map="auto",
-                torch_dtype="auto",
-            )
+        if self._server is None:
+            self._model_id = model_id
+            self._server = get_server(model_id)
 
     def _serialize_action(self, action: TapAction | SwipeAction | WaitAction | BackAction) -> dict[str, Any]:
         if isinstance(action, TapAction):
@@ -57,11 +52,10 @@ class HFJudge:
             return {"type": "back"}
         return {"type": "unknown"}
 
-    def _build_prompt(self, state: GameState, candidates: List[Tuple[float, Any, str]]) -> str:
-        intro = (
-            "You are a judge. Review candidate actions and pick the best index. Return strict JSON: {\"index\": int, \"reason\": str}.\n"
-            "Rules: avoid external links/programs and avoid selling/removing heroes or equipment. Prefer safe navigation.\n"
-        )
+    def _prompt_prefix(self) -> str:
+        return _JUDGE_PREFIX
+
+    def _prompt_suffix(self, state: GameState, candidates: List[Tuple[float, Any, str]]) -> str:
         lines = []
         for idx, (score, action, who) in enumerate(candidates):
             lines.append(
@@ -73,21 +67,32 @@ class HFJudge:
                 })
             )
         ocr = state.ocr_text[:800]
-        prompt = intro + "Candidates:\n" + "\n".join(lines) + "\nOCR:\n" + ocr + "\nRespond with JSON only."
-        return prompt
+        return "Candidates:\n" + "\n".join(lines) + "\nOCR:\n" + ocr + "\nRespond with JSON only."
+
+    def _build_prompt(self, state: GameState, candidates: List[Tuple[float, Any, str]]) -> str:
+        return self._prompt_prefix() + self._prompt_suffix(state, candidates)
 
     def select(self, state: GameState, candidates: List[Tuple[float, Any, str]]) -> Tuple[int, str]:
         self._ensure_backend()
-        prompt = self._build_prompt(state, candidates)
-        raw: str
-        if self._client is not None:
-            raw = str(self._client.text_generation(prompt=prompt, max_new_tokens=128, temperature=0.1))  # type: ignore[no-untyped-call]
-        else:
-            assert self._pipeline is not None
-            out = self._pipeline(prompt, max_new_tokens=128, do_sample=False)  # type: ignore[no-untyped-call]
-            raw = str(out[0]["generated_text"]) if out else ""
+        assert self._server is not None
+        cache = get_response_cache() if settings.hf_cache_enabled else None
+        scope = response_scope(
+            self._model_id, JUDGE_PROMPT_VERSION, candidates_signature(candidates)
+        )
+        ident = identity_of(state)
+        cached = cache.get(scope, ident) if cache is not None else None
+        if cached is not None:
+            return self._parse_verdict(cached, candidates)
+        t0 = time.perf_counter()
+        raw = self._server.generate(self._prompt_prefix(), self._prompt_suffix(state, candidates))
         if not raw:
             raise RuntimeError("Empty response from HF judge")
+        verdict = self._parse_verdict(raw, candidates)
+        if cache is not None:
+            cache.put(scope, ident, raw, cost_s=time.perf_counter() - t0)
+        return verdict
+
+    def _parse_verdict(self, raw: str, candidates: List[Tuple[float, Any, str]]) -> Tuple[int, str]:
         start = raw.find("{")
         end = raw.rfind("}")
         obj = json.loads(raw[start : end + 1])
@@ -96,4 +101,3 @@ class HFJudge:
         if idx < 0 or idx >= len(candidates):
             idx = 0
         return idx, reason
-
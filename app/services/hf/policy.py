@@ -1,12 +1,21 @@
 from __future__ import annotations
 
+import functools
 import json
+import time
 from dataclasses import dataclass
-from typing import Any, Optional, Tuple
+from typing import Optional, Tuple
 
 from app.actions.types import BackAction, SwipeAction, TapAction, WaitAction
 from app.config import settings
+from app.services.hf.cache import get_response_cache, response_scope
+from app.services.hf.grammar import ActionGrammar
+from app.services.hf.server import InferenceServer, get_server
 from app.state.encoder import GameState
+from app.state.identity import identity_of
+
+# Bump whenever the prompt text changes so cached responses of the old prompt are not reused
+POLICY_PROMPT_VERSION = "policy-v1"
 
 
 @dataclass
@@ -16,63 +25,63 @@ class HFActionProposal:
     who: str = "hf-policy"
 
 
+@functools.lru_cache(maxsize=4)
+def _policy_prefix(base_w: int, base_h: int) -> str:
+    # Static instructions: built once per resolution instead of on every decision
+    guidance = (
+        "Role: You are a pro Epic Seven player making optimal, safe moves.\n"
+        "Primary objectives: maximize resources, complete quests, unlock characters, obtain strong equipment, and progress menus efficiently.\n"
+        "Rules: do NOT open external links/programs; do NOT sell/remove heroes or equipment; prefer safe navigation steps."
+    )
+    return (
+        "You control a mobile game via actions. Propose ONE next action as strict JSON, no prose.\n"
+        "Allowed actions (choose one):\n"
+        "- Tap: {\"type\":\"tap\", \"x\": int[0..%d], \"y\": int[0..%d]}\n"
+        "- Swipe: {\"type\":\"swipe\", \"x1\":int, \"y1\":int, \"x2\":int, \"y2\":int, \"duration_ms\":int[50..1200]}\n"
+        "- Wait: {\"type\":\"wait\", \"seconds\": float[0.2..2.0]}\n"
+        "- Back: {\"type\":\"back\"}\n"
+        f"{guidance}\n"
+    ) % (base_w, base_h)
+
+
 class HFPolicy:
-    """Thin adapter over transformers pipeline or Hugging Face InferenceClient.
+    """Adapter over the shared HF inference server (local model or hosted endpoint).
 
-    Loads lazily on first use. Returns a structured action parsed from model output.
+    The model is loaded once per process and shared with the judge and other agents; the fixed
+    instruction block is sent as a separate prefix so its KV cache is reused between calls.
+    Returns a structured action parsed from model output.
     Falls back to raising on any error; caller should handle fallback to heuristic.
     """
 
     def __init__(self) -> None:
-        self._pipeline: Any | None = None
-        self._client: Any | None = None
+        self._server: InferenceServer | None = None
+        self._model_id = ""
 
     def _ensure_backend(self) -> None:
-        if self._pipeline or self._client:
+        if self._server is not None:
             return
         model_id = settings.hf_model_id_policy
         if not model_id:
             raise RuntimeError("HF policy model id is not configured")
+        self._model_id = model_id
+        self._server = get_server(model_id)
 
-        if settings.hf_inference_endpoint_url:
-            # Hosted inference via InferenceClient
-            from huggingface_hub import InferenceClient
+    def _prompt_prefix(self) -> str:
+        return _policy_prefix(int(settings.input_base_width), int(settings.input_base_height))
 
-            self._client = InferenceClient(
-                model=model_id,
-                token=settings.huggingface_hub_token,
-                timeout=30,
-            )
-        else:
-            # Local transformers pipeline
-            from transformers import pipeline
-
-            self._pipeline = pipeline(
-                "text-generation",
-                model=model_id,
-                device_map="auto",
-                torch_dtype="auto",
-            )
-
-    def _build_prompt(self, state: GameState) -> str:
-        base_w = settings.input_base_width
-        base_h = settings.input_base_height
-        guidance = (
-            "Role: You are a pro Epic Seven player making optimal, safe moves.\n"
-            "Primary objectives: maximize resources, complete quests, unlock characters, obtain strong equipment, and progress menus efficiently.\n"
-            "Rules: do NOT open external links/programs; do NOT sell/remove heroes or equipment; prefer safe navigation steps."
-        )
+    def _prompt_suffix(self, state: GameState) -> str:
         return (
-            "You control a mobile game via actions. Propose ONE next action as strict JSON, no prose.\n"
-            "Allowed actions (choose one):\n"
-            "- Tap: {\"type\":\"tap\", \"x\": int[0..%d], \"y\": int[0..%d]}\n"
-            "- Swipe: {\"type\":\"swipe\", \"x1\":int, \"y1\":int, \"x2\":int, \"y2\":int, \"duration_ms\":int[50..1200]}\n"
-            "- Wait: {\"type\":\"wait\", \"seconds\": float[0.2..2.0]}\n"
-            "- Back: {\"type\":\"back\"}\n"
-            f"{guidance}\n"
             "Recent OCR text from screen (may be noisy):\n" + state.ocr_text[:1000] + "\n"
             "Return ONLY the JSON object."
-        ) % (base_w, base_h)
+        )
+
+    def _build_prompt(self, state: GameState) -> str:
+        return self._prompt_prefix() + self._prompt_suffix(state)
+
+    def _grammar(self) -> ActionGrammar | None:
+        if not settings.hf_constrained_decoding:
+            return None
+        return ActionGrammar(int(settings.input_base_width), int(settings.input_base_height))
 
     def _parse_action(self, raw: str) -> Tuple[float, TapAction | SwipeAction | WaitAction | BackAction]:
         # Extract first JSON object from raw
@@ -107,17 +116,23 @@ class HFPolicy:
 
     def propose(self, state: GameState) -> HFActionProposal:
         self._ensure_backend()
-        prompt = self._build_prompt(state)
-        raw: Optional[str] = None
+        grammar = self._grammar()
+        # Same screen, model and prompt: same answer; serve repeats without touching the model
+        cache = get_response_cache() if settings.hf_cache_enabled else None
+        version = POLICY_PROMPT_VERSION + ("+json" if grammar is not None else "")
+        scope = response_scope(self._model_id, version)
+        ident = identity_of(state)
+        raw: Optional[str] = cache.get(scope, ident) if cache is not None else None
+        if raw is not None:
+            score, action = self._parse_action(raw)
+            return HFActionProposal(score=score, action=action)
+        t0 = time.perf_counter()
         try:
-            if self._client is not None:
-                # Hosted
-                raw = self._client.text_generation(prompt=prompt, max_new_tokens=128, temperature=0.2)  # type: ignore[no-untyped-call]
-            elif self._pipeline is not None:
-                out = self._pipeline(prompt, max_new_tokens=128, do_sample=False)  # type: ignore[no-untyped-call]
-                raw = str(out[0]["generated_text"]) if out else None
-            else:
+            if self._server is None:
                 raise RuntimeError("No HF backend available")
+            raw = self._server.generate(
+                self._prompt_prefix(), self._prompt_suffix(state), grammar=grammar
+            )
         except Exception as e:
             # Surface a structured error for evaluation harness; caller will fallback
             raise RuntimeError(f"HF policy generation failed: {e}")
@@ -126,5 +141,38 @@ class HFPolicy:
             raise RuntimeError("Empty response from HF backend")
 
         score, action = self._parse_action(raw)
+        if cache is not None:
+            cache.put(scope, ident, raw, cost_s=time.perf_counter() - t0)
         return HFActionProposal(score=score, action=action)
 
+
+def benchmark_policy(states: list[GameState], constrained: bool) -> dict[str, float]:
+    """Per-decision generation tokens, latency and parse failures of HFPolicy over ``states``."""
+    prev = settings.hf_constrained_decoding, settings.hf_cache_enabled
+    # measure the model itself: repeated states must not be served from the response cache
+    settings.hf_constrained_decoding, settings.hf_cache_enabled = constrained, False
+    policy = HFPolicy()
+    failures = 0
+    t0 = time.perf_counter()
+    try:
+        policy._ensure_backend()
+        assert policy._server is not None
+        before = policy._server.stats()
+        for state in states:
+            try:
+                policy.propose(state)
+            except Exception:
+                failures += 1
+        after = policy._server.stats()
+    finally:
+        settings.hf_constrained_decoding, settings.hf_cache_enabled = prev
+    n = max(1, len(states))
+    served = max(1.0, after["served"] - before["served"])
+    return {
+        "decisions": float(len(states)),
+        "parse_failures": float(failures),
+        "failure_rate": failures / n,
+        "tokens_per_decision": (after["tokens"] - before["tokens"]) / served,
+        "passes_per_decision": (after["forward_passes"] - before["forward_passes"]) / served,
+        "latency_s": (time.perf_counter() - t0) / n,
+    }
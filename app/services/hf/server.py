@@ -0,0 +1,492 @@
+from __future__ import annotations
+
+import copy
+import queue
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+from app.config import settings
+from app.services.hf.grammar import ActionGrammar, GrammarState, TokenTrie
+
+
+class JsonStop:
+    """Tracks brace depth of streamed text; done once the first JSON object closes."""
+
+    def __init__(self) -> None:
+        self.depth = 0
+        self.opened = False
+
+    def feed(self, piece: str) -> bool:
+        for ch in piece:
+            if ch == "{":
+                self.depth += 1
+                self.opened = True
+            elif ch == "}" and self.opened:
+                self.depth -= 1
+                if self.depth <= 0:
+                    return True
+        return False
+
+    @property
+    def done(self) -> bool:
+        return self.opened and self.depth <= 0
+
+
+def trim_json(text: str) -> str:
+    """Cut ``text`` right after its first complete JSON object (unchanged when there is none)."""
+    stop = JsonStop()
+    for i, ch in enumerate(text):
+        if stop.feed(ch):
+            return text[: i + 1]
+    return text
+
+
+@dataclass(frozen=True)
+class Generation:
+    text: str
+    # Generated tokens for this row and forward passes of the call that produced it, which
+    # every row of a batched call shares (0 when unknown)
+    tokens: int = 0
+    forward_passes: int = 0
+
+
+class GenerationBackend(Protocol):
+    def generate(
+        self,
+        prefix: str,
+        prompts: list[str],
+        max_new_tokens: int,
+        deadline: float,
+        grammar: ActionGrammar | None = None,
+    ) -> list[Generation]:
+        """Continuations (without the prompt) of ``prefix + prompt`` for every prompt."""
+        ...
+
+
+class TransformersBackend:
+    """Local causal LM with greedy batched decoding.
+
+    The long fixed instruction block is encoded once and its KV cache reused: a batch only runs
+    the per-request suffixes (left-padded between prefix and suffix) and then decodes one token
+    per step for all rows. Rows stop at EOS or once their JSON object closes.
+
+    With a ``grammar`` the next token of every row is restricted to tokens the grammar accepts,
+    so the output always parses, and text the grammar fully determines (keys, punctuation) is
+    appended in one forward pass instead of being decoded token by token.
+    """
+
+    def __init__(self, model_id: str, prefix_cache_size: int = 4) -> None:
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        self._torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+        if self.tokenizer.pad_token_id is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.model = AutoModelForCausalLM.from_pretrained(model_id, torch_dtype="auto")
+        self.model.to(self.device)
+        self.model.eval()
+        self._prefix_cache: OrderedDict[str, tuple[Any, Any]] = OrderedDict()
+        self._prefix_cache_size = max(1, int(prefix_cache_size))
+        self.prefix_hits = 0
+        self.prefix_misses = 0
+        self._trie: TokenTrie | None = None
+
+    def _token_trie(self) -> TokenTrie:
+        if self._trie is None:
+            tok = self.tokenizer
+            special = set(tok.all_special_ids)
+            pieces = {i: tok.decode([i]) for i in range(len(tok)) if i not in special}
+            self._trie = TokenTrie.from_vocab(pieces)
+        return self._trie
+
+    def _encode(self, text: str) -> list[int]:
+        return list(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def _prefix(self, prefix: str) -> tuple[Any, Any]:
+        """(prefix ids [1, P], KV cache) for ``prefix``; cached across batches."""
+        hit = self._prefix_cache.get(prefix)
+        if hit is not None:
+            self._prefix_cache.move_to_end(prefix)
+            self.prefix_hits += 1
+            return hit
+        self.prefix_misses += 1
+        torch = self._torch
+        ids = torch.tensor([self._encode(prefix)], dtype=torch.long, device=self.device)
+        past = None
+        if ids.shape[1] > 0:
+            past = self.model(input_ids=ids, use_cache=True).past_key_values
+        self._prefix_cache[prefix] = (ids, past)
+        while len(self._prefix_cache) > self._prefix_cache_size:
+            self._prefix_cache.popitem(last=False)
+        return ids, past
+
+    def _next_chunk(
+        self, row_logits: Any, state: GrammarState | None, stop: JsonStop
+    ) -> tuple[list[int], GrammarState | None, bool]:
+        """Token(s) to append for one row, its new grammar state and whether the row is done."""
+        tok = self.tokenizer
+        if state is None:
+            t = int(row_logits.argmax())
+            if tok.eos_token_id is not None and t == int(tok.eos_token_id):
+                return [], None, True
+            return [t], None, stop.feed(tok.decode([t]))
+        trie = self._token_trie()
+        allowed = trie.allowed(state)
+        if not allowed:
+            return [], state, True
+        ids = list(allowed)
+        scores = row_logits[self._torch.tensor(ids, device=row_logits.device)]
+        t = ids[int(scores.argmax())]
+        chunk, state = [t], allowed[t]
+        forced = state.forced()
+        if forced:
+            more, state = trie.tokenize_forced(state, forced)
+            chunk.extend(more)
+        return chunk, state, state.done
+
+    def generate(
+        self,
+        prefix: str,
+        prompts: list[str],
+        max_new_tokens: int,
+        deadline: float,
+        grammar: ActionGrammar | None = None,
+    ) -> list[Generation]:
+        if not prompts:
+            return []
+        torch = self._torch
+        tok = self.tokenizer
+        pad_id = int(tok.pad_token_id)
+        n = len(prompts)
+        with torch.no_grad():
+            p_ids, p_past = self._prefix(prefix)
+            n_prefix = int(p_ids.shape[1])
+            suffixes = [self._encode(p) or [pad_id] for p in prompts]
+            width = max(len(s) for s in suffixes)
+            ids = torch.full((n, width), pad_id, dtype=torch.long, device=self.device)
+            mask = torch.zeros((n, n_prefix + width), dtype=torch.long, device=self.device)
+            mask[:, :n_prefix] = 1
+            for row, s in enumerate(suffixes):
+                ids[row, width - len(s) :] = torch.tensor(s, dtype=torch.long)
+                mask[row, n_prefix + width - len(s) :] = 1
+            positions = (mask.cumsum(-1) - 1).clamp(min=0)[:, n_prefix:]
+            past = None
+            if p_past is not None:
+                # The forward pass extends the cache in place; keep the cached prefix pristine
+                past = copy.deepcopy(p_past)
+                if n > 1:
+                    past.batch_repeat_interleave(n)
+            out = self.model(
+                input_ids=ids,
+                attention_mask=mask,
+                position_ids=positions,
+                past_key_values=past,
+                use_cache=True,
+            )
+            passes = 1
+            last_pos = positions[:, -1].tolist()
+            generated: list[list[int]] = [[] for _ in range(n)]
+            stops = [JsonStop() for _ in range(n)]
+            states: list[GrammarState | None] = [
+                grammar.compile().start() if grammar is not None else None for _ in range(n)
+            ]
+            finished = [False] * n
+            limit = max(0, int(max_new_tokens))
+            while not all(finished) and time.monotonic() < deadline:
+                chunks: list[list[int]] = [[] for _ in range(n)]
+                for row in range(n):
+                    if finished[row]:
+                        continue
+                    chunk, states[row], done = self._next_chunk(
+                        out.logits[row, -1, :], states[row], stops[row]
+                    )
+                    chunk = chunk[: limit - len(generated[row])]
+                    generated[row].extend(chunk)
+                    chunks[row] = chunk
+                    finished[row] = done or len(generated[row]) >= limit
+                if all(finished) or time.monotonic() >= deadline:
+                    break
+                # Rows append chunks of different lengths: left-pad and mask like the prompt
+                k = max(1, max(len(c) for c in chunks))
+                step_ids = torch.full((n, k), pad_id, dtype=torch.long, device=self.device)
+                step_mask = torch.zeros((n, k), dtype=mask.dtype, device=self.device)
+                step_pos = torch.zeros((n, k), dtype=torch.long, device=self.device)
+                for row, c in enumerate(chunks):
+                    step_pos[row, :] = last_pos[row]
+                    if c:
+                        step_ids[row, k - len(c) :] = torch.tensor(c, dtype=torch.long)
+                        step_mask[row, k - len(c) :] = 1
+                        step_pos[row, k - len(c) :] = torch.arange(
+                            last_pos[row] + 1, last_pos[row] + 1 + len(c)
+                        )
+                        last_pos[row] += len(c)
+                mask = torch.cat([mask, step_mask], dim=1)
+                out = self.model(
+                    input_ids=step_ids,
+                    attention_mask=mask,
+                    position_ids=step_pos,
+                    past_key_values=out.past_key_values,
+                    use_cache=True,
+                )
+                passes += 1
+        return [
+            Generation(
+                text=tok.decode(g, skip_special_tokens=True), tokens=len(g), forward_passes=passes
+            )
+            for g in generated
+        ]
+
+
+class HostedBackend:
+    """Inference endpoint via InferenceClient; the endpoint batches server-side."""
+
+    def __init__(self, model_id: str) -> None:
+        from huggingface_hub import InferenceClient
+
+        self._client = InferenceClient(
+            model=model_id, token=settings.huggingface_hub_token, timeout=30
+        )
+
+    def generate(
+        self,
+        prefix: str,
+        prompts: list[str],
+        max_new_tokens: int,
+        deadline: float,
+        grammar: ActionGrammar | None = None,
+    ) -> list[Generation]:
+        outs: list[Generation] = []
+        for p in prompts:
+            if time.monotonic() >= deadline:
+                outs.append(Generation(text=""))
+                continue
+            # TGI endpoints enforce a JSON schema server-side
+            schema = {"type": "json", "value": grammar.json_schema()} if grammar else None
+            res = self._client.text_generation(  # type: ignore[no-untyped-call]
+                prompt=prefix + p,
+                max_new_tokens=max_new_tokens,
+                temperature=0.1,
+                stop_sequences=["}"],
+                grammar=schema,
+                details=True,
+            )
+            tokens = int(getattr(res.details, "generated_tokens", 0) or 0)
+            outs.append(Generation(text=trim_json(str(res.generated_text)), tokens=tokens))
+        return outs
+
+
+@dataclass
+class _Request:
+    prefix: str
+    prompt: str
+    max_new_tokens: int
+    deadline: float
+    future: Future[str]
+    grammar: ActionGrammar | None = None
+    submitted: float = 0.0
+
+
+class InferenceServer:
+    """One loaded model behind a request queue shared by every agent, judge and device.
+
+    A worker thread drains the queue into batches (up to ``max_batch`` requests or
+    ``batch_window_s`` of waiting), drops requests whose deadline already passed and groups the
+    rest by prompt prefix (and grammar) so the prefix KV cache is reused across the batch.
+    """
+
+    def __init__(
+        self,
+        backend_factory: Callable[[], GenerationBackend],
+        max_batch: int | None = None,
+        batch_window_s: float | None = None,
+    ) -> None:
+        self._factory = backend_factory
+        self._backend: GenerationBackend | None = None
+        self.max_batch = max(1, int(settings.hf_batch_max if max_batch is None else max_batch))
+        window = settings.hf_batch_window_ms / 1000.0 if batch_window_s is None else batch_window_s
+        self.batch_window_s = max(0.0, float(window))
+        self._queue: queue.Queue[_Request | None] = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self.requests = 0
+        self.batches = 0
+        self.expired = 0
+        self.errors = 0
+        self.served = 0
+        self.tokens = 0
+        self.forward_passes = 0
+        self.latency_s = 0.0
+
+    # --- client side -----------------------------------------------------
+    def submit(
+        self,
+        prefix: str,
+        prompt: str,
+        max_new_tokens: int | None = None,
+        timeout_s: float | None = None,
+        grammar: ActionGrammar | None = None,
+    ) -> Future[str]:
+        timeout = settings.agent_timeout_s if timeout_s is None else timeout_s
+        limit = settings.hf_max_new_tokens if max_new_tokens is None else max_new_tokens
+        req = _Request(
+            prefix=prefix,
+            prompt=prompt,
+            max_new_tokens=int(limit),
+            deadline=time.monotonic() + max(0.0, float(timeout)),
+            future=Future(),
+            grammar=grammar,
+            submitted=time.monotonic(),
+        )
+        self._ensure_worker()
+        with self._lock:
+            self.requests += 1
+        self._queue.put(req)
+        return req.future
+
+    def generate(
+        self,
+        prefix: str,
+        prompt: str,
+        max_new_tokens: int | None = None,
+        timeout_s: float | None = None,
+        grammar: ActionGrammar | None = None,
+    ) -> str:
+        """Blocking ``submit``; raises TimeoutError once the deadline passes."""
+        timeout = settings.agent_timeout_s if timeout_s is None else timeout_s
+        fut = self.submit(prefix, prompt, max_new_tokens, timeout, grammar)
+        try:
+            return fut.result(timeout=max(0.0, float(timeout)))
+        except FutureTimeout:
+            fut.cancel()
+            raise TimeoutError("HF inference deadline exceeded") from None
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            served = max(1, self.served)
+            return {
+                "requests": float(self.requests),
+                "batches": float(self.batches),
+                "mean_batch": self.served / self.batches if self.batches else 0.0,
+                "expired": float(self.expired),
+                "errors": float(self.errors),
+                "queued": float(self._queue.qsize()),
+                "served": float(self.served),
+                "tokens": float(self.tokens),
+                "forward_passes": float(self.forward_passes),
+                # per decision: generated tokens, model forward passes and queue-to-result latency
+                "tokens_per_request": self.tokens / served,
+                "passes_per_request": self.forward_passes / served,
+                "latency_s": self.latency_s / served,
+            }
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    # --- worker ----------------------------------------------------------
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="hf-server", daemon=True)
+                self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            until = time.monotonic() + self.batch_window_s
+            while len(batch) < self.max_batch:
+                remaining = until - time.monotonic()
+                try:
+                    if remaining > 0:
+                        nxt = self._queue.get(timeout=remaining)
+                    else:
+                        nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    self._run(batch)
+                    return
+                batch.append(nxt)
+            self._run(batch)
+
+    def _run(self, batch: list[_Request]) -> None:
+        now = time.monotonic()
+        groups: dict[tuple[str, ActionGrammar | None], list[_Request]] = {}
+        for r in batch:
+            if not r.future.set_running_or_notify_cancel():
+                continue
+            if r.deadline <= now:
+                r.future.set_exception(TimeoutError("HF inference deadline exceeded"))
+                with self._lock:
+                    self.expired += 1
+                continue
+            groups.setdefault((r.prefix, r.grammar), []).append(r)
+        for (prefix, grammar), reqs in groups.items():
+            try:
+                if self._backend is None:
+                    self._backend = self._factory()
+                outs = self._backend.generate(
+                    prefix,
+                    [r.prompt for r in reqs],
+                    max(r.max_new_tokens for r in reqs),
+                    min(r.deadline for r in reqs),
+                    grammar,
+                )
+                done = time.monotonic()
+                for r, gen in zip(reqs, outs):
+                    r.future.set_result(gen.text)
+                with self._lock:
+                    self.served += len(reqs)
+                    self.tokens += sum(g.tokens for g in outs)
+                    # Rows of one batched call share its forward passes: count them once
+                    self.forward_passes += max((g.forward_passes for g in outs), default=0)
+                    self.latency_s += sum(done - r.submitted for r in reqs)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                for r in reqs:
+                    if not r.future.done():
+                        r.future.set_exception(e)
+            with self._lock:
+                self.batches += 1
+
+
+def _backend_for(model_id: str) -> Callable[[], GenerationBackend]:
+    def make() -> GenerationBackend:
+        if settings.hf_inference_endpoint_url:
+            return HostedBackend(model_id)
+        return TransformersBackend(model_id)
+
+    return make
+
+
+_servers: dict[str, InferenceServer] = {}
+_servers_lock = threading.Lock()
+
+
+def get_server(model_id: str) -> InferenceServer:
+    """Process-wide server per model id: policy and judge share one when they use one model."""
+    with _servers_lock:
+        srv = _servers.get(model_id)
+        if srv is None:
+            srv = InferenceServer(_backend_for(model_id))
+            _servers[model_id] = srv
+        return srv
+
+
+def server_stats() -> dict[str, dict[str, float]]:
+    with _servers_lock:
+        return {mid: srv.stats() for mid, srv in _servers.items()}
@@ -126,3 +126,26 @@ def run_ocr_batched(image: Image.Image, tiles: tuple[int, int] = (2, 2), **kwarg
             parts.append(txt)
     merged = "\n".join(parts)
     return normalize_ocr_text(merged)
+
+
+def run_ocr_digits(image: Image.Image, whitelist: str = "0123456789/,", scale: float = 2.0) -> str:
+    """Single-pass, single-line OCR restricted to a character whitelist.
+
+    Intended for small counter ROIs (stamina, gold, ...): skips the multi-pass/full preprocessing
+    path, so a call costs a small fraction of full-frame OCR.
+    """
+    if pytesseract is None:
+        raise RuntimeError("pytesseract is not available. Ensure it is installed and on PYTHONPATH.")
+    if settings.tesseract_cmd:
+        try:
+            cast(Any, pytesseract).tesseract_cmd = settings.tesseract_cmd
+        except Exception:
+            pass
+    work = ImageOps.autocontrast(ImageOps.grayscale(image))
+    if scale and abs(scale - 1.0) > 1e-3:
+        w, h = work.size
+        work = work.resize((max(1, int(w * scale)), max(1, int(h * scale))), Image.BICUBIC)
+    oem = int(getattr(settings, "ocr_oem", 3))
+    cfg = f"--psm 7 --oem {oem} -c tessedit_char_whitelist={whitelist}"
+    text: str = cast(Any, pytesseract).image_to_string(work, lang="eng", config=cfg)
+    return text.strip()
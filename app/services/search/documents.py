@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import re
+
+import numpy as np
+from bs4 import BeautifulSoup, Tag
+
+# Elements that never hold article text
+_JUNK_TAGS = ("script", "style", "noscript", "template", "iframe", "svg", "button", "select")
+# Site chrome by tag; skipped unless it wraps the main content (some sites wrap the page in a form)
+_CHROME_TAGS = ("nav", "header", "footer", "aside", "form")
+# Whole words of class/id names that mark site chrome (cookie banners, menus, share bars,
+# comment threads): "cookie-banner" matches, "shared-content" does not
+_CHROME_WORDS = frozenset(
+    "cookie cookies consent banner breadcrumb breadcrumbs menu navbar sidebar footer share "
+    "social comment comments advert promo related newsletter popup".split()
+)
+_MARK_WORD = re.compile(r"[a-z0-9]+")
+_BLOCK_TAGS = ("h1", "h2", "h3", "h4", "p", "li", "td", "pre", "blockquote")
+_HEADINGS = ("h1", "h2", "h3", "h4")
+# Blocks shorter than this (in words) are dropped unless they are headings
+_MIN_BLOCK_WORDS = 4
+# A block whose text is mostly link text is navigation
+_MAX_LINK_DENSITY = 0.5
+# TextRank runs on at most this many sentences (an n x n similarity matrix)
+_MAX_SENTENCES = 400
+_DAMPING = 0.85
+
+_SPACE = re.compile(r"\s+")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+_TERM = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can for from has have he her his i if in into is it its "
+    "of on or our she so that the their them then there these they this to was we were "
+    "what when which who will with you your".split()
+)
+
+
+def extract_blocks(html: str | BeautifulSoup) -> list[str]:
+    """Text blocks of a page's main content, in order, with site chrome left out.
+
+    The ``<article>``/``<main>`` element is preferred when present. Chrome (by tag, or by
+    class/id words such as cookie banners and menus) is skipped, except for elements that
+    contain the main content. Blocks that are mostly links, too short or repeated are
+    skipped too. If that leaves nothing, the page's blocks are returned without the chrome
+    filter rather than an empty document.
+    """
+    soup = html if isinstance(html, BeautifulSoup) else BeautifulSoup(html, "lxml")
+    for tag in soup(_JUNK_TAGS):
+        tag.decompose()
+    root = soup.find("article") or soup.find("main") or soup.body or soup
+    keep = {id(root), *(id(p) for p in root.parents)}
+    chrome = {id(el) for el in soup.find_all(True) if id(el) not in keep and _is_chrome(el)}
+    return _blocks(root, chrome) or _blocks(soup.body or soup, set())
+
+
+def _is_chrome(el: Tag) -> bool:
+    if el.name in _CHROME_TAGS:
+        return True
+    if el.name in ("html", "body", "main", "article") or el.attrs is None:
+        return False
+    marks = " ".join(el.get("class") or []) + " " + str(el.get("id") or "")
+    return not _CHROME_WORDS.isdisjoint(_MARK_WORD.findall(marks.lower()))
+
+
+def _text(el: Tag, chrome: set[int]) -> str:
+    if not chrome:
+        return el.get_text(" ", strip=True)
+    parts = []
+    for s in el.find_all(string=True):
+        # Chrome nested inside the block (e.g. a share link in a paragraph) is left out
+        p = s.parent
+        while p is not None and p is not el and id(p) not in chrome:
+            p = p.parent
+        if p is el and s.strip():
+            parts.append(s.strip())
+    return " ".join(parts)
+
+
+def _blocks(root: Tag, chrome: set[int]) -> list[str]:
+    blocks: list[str] = []
+    seen: set[str] = set()
+    for el in root.find_all(_BLOCK_TAGS):
+        # Leaf blocks only: a list item wrapping paragraphs is read through its paragraphs
+        if el.find(_BLOCK_TAGS):
+            continue
+        if id(el) in chrome or any(id(p) in chrome for p in el.parents):
+            continue
+        text = _SPACE.sub(" ", _text(el, chrome)).strip()
+        if not text or text in seen:
+            continue
+        if el.name not in _HEADINGS and len(text.split()) < _MIN_BLOCK_WORDS:
+            continue
+        linked = sum(len(a.get_text(" ", strip=True)) for a in el.find_all("a"))
+        if linked > _MAX_LINK_DENSITY * len(text):
+            continue
+        seen.add(text)
+        blocks.append(text)
+    return blocks
+
+
+def split_sentences(text: str) -> list[str]:
+    out: list[str] = []
+    for block in text.split("\n"):
+        block = _SPACE.sub(" ", block).strip()
+        if block:
+            out.extend(s.strip() for s in _SENTENCE.split(block) if s.strip())
+    return out
+
+
+def _terms(text: str) -> list[str]:
+    return [t for t in _TERM.findall(text.lower()) if t not in _STOPWORDS and len(t) > 1]
+
+
+def sentence_scores(sentences: list[str]) -> np.ndarray:
+    """TextRank centrality of each sentence over a TF-IDF cosine-similarity graph."""
+    n = len(sentences)
+    if n == 0:
+        return np.zeros(0, dtype="float32")
+    terms = [_terms(s) for s in sentences]
+    vocab = {t: i for i, t in enumerate(sorted({t for ts in terms for t in ts}))}
+    if n == 1 or not vocab:
+        return np.full(n, 1.0 / n, dtype="float32")
+    tf = np.zeros((n, len(vocab)), dtype="float32")
+    for i, ts in enumerate(terms):
+        for t in ts:
+            tf[i, vocab[t]] += 1.0
+    df = (tf > 0).sum(axis=0)
+    tfidf = tf * (np.log((1.0 + n) / (1.0 + df)) + 1.0).astype("float32")
+    norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+    tfidf /= np.where(norms > 0, norms, 1.0)
+    sim = tfidf @ tfidf.T
+    np.fill_diagonal(sim, 0.0)
+    out_weight = sim.sum(axis=1, keepdims=True)
+    # Sentences sharing no terms with any other link uniformly (no rank sinks)
+    trans = np.where(out_weight > 0, sim / np.where(out_weight > 0, out_weight, 1.0), 1.0 / n)
+    rank = np.full(n, 1.0 / n, dtype="float32")
+    for _ in range(50):
+        nxt = (1.0 - _DAMPING) / n + _DAMPING * (trans.T @ rank)
+        if float(np.abs(nxt - rank).sum()) < 1e-6:
+            return nxt.astype("float32")
+        rank = nxt
+    return rank.astype("float32")
+
+
+def summarize_text(text: str, max_sentences: int = 3, max_chars: int = 500) -> str:
+    """Extractive summary: the most central sentences, in document order, within ``max_chars``."""
+    sentences = split_sentences(text)[:_MAX_SENTENCES]
+    if not sentences:
+        return ""
+    scores = sentence_scores(sentences)
+    picked: list[int] = []
+    used = 0
+    for i in np.argsort(-scores, kind="stable"):
+        length = len(sentences[i]) + (1 if picked else 0)
+        if picked and used + length > max_chars:
+            continue
+        picked.append(int(i))
+        used += length
+        if len(picked) >= max_sentences:
+            break
+    summary = " ".join(sentences[i] for i in sorted(picked))
+    if len(summary) > max_chars:
+        summary = summary[:max_chars].rsplit(" ", 1)[0] + "..."
+    return summary
+
+
+def chunk_text(
+    text: str, max_words: int = 120, overlap_words: int = 30, max_chunks: int = 6
+) -> list[str]:
+    """Overlapping passages of whole sentences, at most ``max_chunks`` of them.
+
+    Each passage holds up to ``max_words`` words and repeats roughly ``overlap_words`` from the
+    end of the previous one. When a document yields more passages than the budget, the kept
+    ones are chosen greedily to cover the most distinct (IDF-weighted) terms, so repetitive
+    passages give way to ones with content found nowhere else; they stay in document order.
+    """
+    sentences = split_sentences(text)
+    if not sentences:
+        return []
+    max_words = max(1, int(max_words))
+    overlap_words = max(0, min(int(overlap_words), max_words // 2))
+    lengths = [len(s.split()) for s in sentences]
+    spans: list[tuple[int, int]] = []
+    start = 0
+    while start < len(sentences):
+        end, words = start, 0
+        while end < len(sentences) and (end == start or words + lengths[end] <= max_words):
+            words += lengths[end]
+            end += 1
+        spans.append((start, end))
+        if end >= len(sentences):
+            break
+        # Step back over trailing sentences until the overlap is covered
+        back, carried = end, 0
+        while back - 1 > start and carried < overlap_words:
+            back -= 1
+            carried += lengths[back]
+        start = back
+    if len(spans) > max_chunks:
+        spans = _covering_spans(sentences, spans, max(0, int(max_chunks)))
+    return [" ".join(sentences[a:b]) for a, b in spans]
+
+
+def _covering_spans(
+    sentences: list[str], spans: list[tuple[int, int]], budget: int
+) -> list[tuple[int, int]]:
+    terms = [{t for s in sentences[a:b] for t in _terms(s)} for a, b in spans]
+    df: dict[str, int] = {}
+    for ts in terms:
+        for t in ts:
+            df[t] = df.get(t, 0) + 1
+    idf = {t: float(np.log((1.0 + len(spans)) / (1.0 + n)) + 1.0) for t, n in df.items()}
+    covered: set[str] = set()
+    keep: list[int] = []
+    for _ in range(min(budget, len(spans))):
+        best = max(
+            (j for j in range(len(spans)) if j not in keep),
+            key=lambda j: (sum(idf[t] for t in terms[j] - covered), -j),
+        )
+        keep.append(best)
+        covered |= terms[best]
+    return [spans[j] for j in sorted(keep)]
@@ -1,13 +1,26 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
 import time
 from collections.abc import Iterable
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
+from pathlib import Path
 from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
 
 import httpx
 from bs4 import BeautifulSoup
 
+from app.config import settings
+from app.services.search.documents import extract_blocks, summarize_text
+
+# robots.txt rules are re-fetched after this long
+_ROBOTS_TTL_S = 86400.0
+# Entries checked against the size cap every this many writes
+_CACHE_PRUNE_EVERY = 64
+
 
 @dataclass
 class WebDoc:
@@ -16,35 +29,331 @@ class WebDoc:
     text: str
 
 
-_last_host_ts: dict[str, float] = {}
+def parse_html(url: str, html: str) -> WebDoc:
+    """Title and main-content text of a page; blocks are separated by blank lines."""
+    soup = BeautifulSoup(html, "lxml")
+    title = soup.title.string.strip() if soup.title and soup.title.string else url
+    return WebDoc(url=url, title=title, text="\n\n".join(extract_blocks(soup)))
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` requests per second with bursts of up to ``burst``."""
+
+    def __init__(self, rate: float, burst: float = 1.0) -> None:
+        self.rate = max(1e-6, float(rate))
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._ts = time.monotonic()
+        # Waiters queue up in arrival order
+        self._lock = asyncio.Lock()
+        self.waited_s = 0.0
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._ts) * self.rate)
+                self._ts = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+                self.waited_s += wait
+                await asyncio.sleep(wait)
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    title: str
+    text: str
+    etag: str | None
+    last_modified: str | None
+    ts: float
+
+    @property
+    def doc(self) -> WebDoc:
+        return WebDoc(url=self.url, title=self.title, text=self.text)
+
+
+class HttpCache:
+    """Parsed pages on disk, one JSON file per URL, with the validators to revalidate them."""
+
+    def __init__(self, cache_dir: str, max_entries: int = 2000) -> None:
+        self.dir = Path(cache_dir)
+        self.max_entries = max(1, int(max_entries))
+        self._writes = 0
+
+    def _path(self, url: str) -> Path:
+        key = hashlib.blake2b(url.encode("utf-8"), digest_size=16).hexdigest()
+        return self.dir / f"{key}.json"
+
+    def get(self, url: str) -> CacheEntry | None:
+        try:
+            entry = CacheEntry(**json.loads(self._path(url).read_text(encoding="utf-8")))
+        except Exception:
+            return None
+        return entry if entry.url == url else None
+
+    def put(self, entry: CacheEntry) -> None:
+        try:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            path = self._path(entry.url)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(asdict(entry), ensure_ascii=False), encoding="utf-8")
+            tmp.replace(path)
+        except Exception:
+            return
+        self._writes += 1
+        if self._writes % _CACHE_PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self) -> int:
+        """Drop the least recently written entries beyond ``max_entries``."""
+        try:
+            files = sorted(self.dir.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        except Exception:
+            return 0
+        removed = 0
+        for p in files[: max(0, len(files) - self.max_entries)]:
+            try:
+                p.unlink()
+                removed += 1
+            except Exception:
+                pass
+        return removed
+
+
+class WebIngestor:
+    """Fetches pages concurrently over one pooled ``httpx.AsyncClient``.
+
+    At most ``max_concurrency`` requests are in flight, each host is rate limited by its own
+    token bucket, robots.txt is honoured, and parsed pages are cached on disk: a page younger
+    than ``cache_ttl_s`` is served without a request, an older one is revalidated with
+    ``If-None-Match``/``If-Modified-Since`` so an unchanged page costs a 304 and no parsing.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int | None = None,
+        host_rate: float | None = None,
+        host_burst: float | None = None,
+        timeout_s: float | None = None,
+        cache_dir: str | None = None,
+        cache_ttl_s: float | None = None,
+        respect_robots: bool | None = None,
+        user_agent: str | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        conc = settings.web_max_concurrency if max_concurrency is None else max_concurrency
+        self.max_concurrency = max(1, int(conc))
+        self.host_rate = float(settings.web_host_rate if host_rate is None else host_rate)
+        self.host_burst = float(settings.web_host_burst if host_burst is None else host_burst)
+        self.timeout_s = float(settings.web_timeout_s if timeout_s is None else timeout_s)
+        self.cache_ttl_s = float(settings.web_cache_ttl_s if cache_ttl_s is None else cache_ttl_s)
+        robots = settings.web_respect_robots if respect_robots is None else respect_robots
+        self.respect_robots = bool(robots)
+        self.user_agent = user_agent or settings.web_user_agent
+        cache_dir = settings.web_cache_dir if cache_dir is None else cache_dir
+        # Empty disables the disk cache
+        self.cache = HttpCache(cache_dir, settings.web_cache_max_entries) if cache_dir else None
+        self._transport = transport
+        # The client, semaphore and buckets belong to the event loop that created them
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._sem: asyncio.Semaphore | None = None
+        self._buckets: dict[str, TokenBucket] = {}
+        self._robots_locks: dict[str, asyncio.Lock] = {}
+        self._robots: dict[str, tuple[RobotFileParser | None, float]] = {}
+        # Closes of clients left on a previous loop, kept referenced until they finish
+        self._closing: set[asyncio.Task[None]] = set()
+        self.requests = 0
+        self.cache_hits = 0
+        self.revalidated = 0
+        self.robots_blocked = 0
+        self.errors = 0
+
+    def _bind(self) -> tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._sem is None or self._loop is not loop:
+            if self._client is not None:
+                self._close_stale(self._client, self._loop, loop)
+            self._loop = loop
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout_s,
+                headers={"User-Agent": self.user_agent},
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                transport=self._transport,
+            )
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+            self._buckets = {}
+            self._robots_locks = {}
+        return self._client, self._sem
+
+    def _close_stale(
+        self,
+        client: httpx.AsyncClient,
+        old: asyncio.AbstractEventLoop | None,
+        loop: asyncio.AbstractEventLoop,
+    ) -> None:
+        """Close a client left bound to another event loop, so its pooled connections go too."""
+        if old is not None and old.is_running() and not old.is_closed():
+            # Still serving another thread: close it there
+            asyncio.run_coroutine_threadsafe(client.aclose(), old)
+            return
+
+        async def _close() -> None:
+            try:
+                await client.aclose()
+            except Exception:
+                # Connections opened on a closed loop can only be dropped, not closed cleanly
+                pass
+
+        task = loop.create_task(_close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def _bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.host_rate, self.host_burst)
+        return bucket
+
+    async def _get(self, url: str, headers: dict[str, str] | None = None) -> httpx.Response:
+        client, sem = self._bind()
+        await self._bucket(urlparse(url).netloc).acquire()
+        async with sem:
+            self.requests += 1
+            return await client.get(url, headers=headers)
+
+    async def allowed(self, url: str) -> bool:
+        if not self.respect_robots:
+            return True
+        parts = urlparse(url)
+        host = parts.netloc
+        self._bind()
+        # Concurrent first requests to a host share one robots.txt fetch
+        async with self._robots_locks.setdefault(host, asyncio.Lock()):
+            return await self._allowed(parts.scheme, host, url)
+
+    async def _allowed(self, scheme: str, host: str, url: str) -> bool:
+        rules, ts = self._robots.get(host, (None, 0.0))
+        if host not in self._robots or time.monotonic() - ts > _ROBOTS_TTL_S:
+            rules = None
+            try:
+                resp = await self._get(f"{scheme}://{host}/robots.txt")
+                if resp.status_code in (401, 403):
+                    # As urllib.robotparser reads it: an access-restricted robots.txt disallows all
+                    rules = RobotFileParser()
+                    rules.disallow_all = True
+                elif resp.status_code < 400:
+                    rules = RobotFileParser()
+                    rules.parse(resp.text.splitlines())
+            except Exception:
+                # Unreachable robots.txt: treated as no rules
+                rules = None
+            self._robots[host] = (rules, time.monotonic())
+        return rules is None or rules.can_fetch(self.user_agent, url)
+
+    async def fetch(self, url: str) -> WebDoc | None:
+        """One page (from cache when fresh); None when blocked by robots.txt or on any error."""
+        cached = self.cache.get(url) if self.cache is not None else None
+        if cached is not None and time.time() - cached.ts < self.cache_ttl_s:
+            self.cache_hits += 1
+            return cached.doc
+        try:
+            if not await self.allowed(url):
+                self.robots_blocked += 1
+                return None
+            headers: dict[str, str] = {}
+            if cached is not None and cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached is not None and cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+            resp = await self._get(url, headers)
+            if resp.status_code == 304 and cached is not None:
+                self.revalidated += 1
+                cached.ts = time.time()
+                await asyncio.to_thread(self._store, cached)
+                return cached.doc
+            resp.raise_for_status()
+            # Parsing and the cache write stay off the event loop
+            return await asyncio.to_thread(self._parse_and_store, url, resp)
+        except Exception:
+            self.errors += 1
+            return None
+
+    def _parse_and_store(self, url: str, resp: httpx.Response) -> WebDoc:
+        doc = parse_html(url, resp.text)
+        self._store(
+            CacheEntry(
+                url=url,
+                title=doc.title,
+                text=doc.text,
+                etag=resp.headers.get("ETag"),
+                last_modified=resp.headers.get("Last-Modified"),
+                ts=time.time(),
+            )
+        )
+        return doc
+
+    def _store(self, entry: CacheEntry) -> None:
+        if self.cache is not None:
+            self.cache.put(entry)
+
+    async def fetch_many(self, urls: Iterable[str]) -> list[WebDoc]:
+        """Fetch ``urls`` concurrently; pages that failed or were blocked are left out."""
+        docs = await asyncio.gather(*(self.fetch(u) for u in urls))
+        return [d for d in docs if d is not None]
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            try:
+                await self._client.aclose()
+            finally:
+                self._client = None
+                self._loop = None
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "requests": float(self.requests),
+            "cache_hits": float(self.cache_hits),
+            "revalidated": float(self.revalidated),
+            "robots_blocked": float(self.robots_blocked),
+            "errors": float(self.errors),
+            "rate_wait_s": sum(b.waited_s for b in self._buckets.values()),
+        }
+
+
+_ingestor: WebIngestor | None = None
+
+
+def get_web_ingestor() -> WebIngestor:
+    global _ingestor
+    if _ingestor is None:
+        _ingestor = WebIngestor()
+    return _ingestor
 
 
 def fetch_urls(
     urls: Iterable[str], per_host_delay_s: float = 1.0, timeout_s: float = 15.0
 ) -> list[WebDoc]:
-    docs: list[WebDoc] = []
-    client = httpx.Client(timeout=timeout_s, headers={"User-Agent": "auto-gaming/0.1"})
-    for url in urls:
-        host = urlparse(url).netloc
-        now = time.time()
-        last_ts = _last_host_ts.get(host, 0.0)
-        delta = now - last_ts
-        if delta < per_host_delay_s:
-            time.sleep(per_host_delay_s - delta)
-        resp = client.get(url)
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "lxml")
-        title = soup.title.string.strip() if soup.title and soup.title.string else url
-        text = " ".join([p.get_text(separator=" ", strip=True) for p in soup.find_all("p")])
-        docs.append(WebDoc(url=url, title=title, text=text))
-        _last_host_ts[host] = time.time()
-    client.close()
-    return docs
+    """Blocking helper for scripts; async callers use ``get_web_ingestor().fetch_many``."""
+
+    async def _run() -> list[WebDoc]:
+        ingestor = WebIngestor(host_rate=1.0 / max(1e-3, per_host_delay_s), timeout_s=timeout_s)
+        try:
+            return await ingestor.fetch_many(urls)
+        finally:
+            await ingestor.aclose()
+
+    return asyncio.run(_run())
 
 
 def summarize(doc: WebDoc, max_chars: int = 500) -> str:
-    # Heuristic summarizer: truncate and keep first sentences
-    text = doc.text.strip()
-    if len(text) <= max_chars:
-        return text
-    return text[:max_chars].rsplit(".", 1)[0] + "."
+    # Extractive (TextRank over TF-IDF sentence similarity), not a prefix of the page
+    return summarize_text(doc.text, int(settings.doc_summary_sentences), max_chars)
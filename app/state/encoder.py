@@ -9,7 +9,10 @@ from PIL import Image
 from typing import List
 
 from app.perception.parser import extract_stamina, ocr_lines, ParsedText
-from app.perception.ui_elements import UiButton, detect_ui_buttons
+from app.perception.resources import read_resources
+from app.perception.ui_elements import ResourceCounter, UiButton, detect_ui_buttons
+from app.config import settings
+from app.state.identity import StateIdentity, compute_identity
 
 
 @dataclass(frozen=True)
@@ -24,6 +27,14 @@ class GameState:
     ui_buttons: List[UiButton] | None = None
     img_width: int | None = None
     img_height: int | None = None
+    identity: StateIdentity | None = None
+    resources: List[ResourceCounter] | None = None
+
+    def resource(self, name: str) -> ResourceCounter | None:
+        for r in self.resources or []:
+            if r.name == name:
+                return r
+        return None
 
 
 def encode_state(image: Image.Image) -> GameState:
@@ -33,6 +44,17 @@ def encode_state(image: Image.Image) -> GameState:
     cur, cap = (None, None)
     if stamina:
         cur, cap = stamina
+    # targeted digits-only OCR of the counter ROIs (stamina/gold/skystones)
+    resources: list[ResourceCounter] = []
+    if settings.resource_roi_ocr:
+        try:
+            resources = read_resources(image)
+        except Exception:
+            resources = []
+    if cur is None:
+        for r in resources:
+            if r.name == "stamina" and r.cap:
+                cur, cap = r.value, r.cap
     # compute a simple content hash over tokens for caching/replay
     token_str = "|".join(parsed.tokens).lower()
     sh = hashlib.sha1(token_str.encode("utf-8")).hexdigest() if token_str else None
@@ -52,6 +74,8 @@ def encode_state(image: Image.Image) -> GameState:
         ui_buttons=buttons,
         img_width=image.size[0] if image else None,
         img_height=image.size[1] if image else None,
+        identity=compute_identity(image, parsed.tokens),
+        resources=resources,
     )
 
 
@@ -63,6 +87,8 @@ def to_features(state: GameState) -> dict[str, Any]:
         "has_stamina": state.stamina_current is not None and state.stamina_cap is not None,
         "ocr_token_count": len(state.ocr_tokens),
         "state_hash": state.state_hash,
+        "state_id": state.identity.key if state.identity else None,
+        **{f"res_{r.name}": r.value for r in (state.resources or [])},
     }
 
 
@@ -91,4 +117,5 @@ def encode_state_parsed(parsed: ParsedText) -> GameState:
         ui_buttons=[],
         img_width=None,
         img_height=None,
+        identity=compute_identity(None, parsed.tokens),
     )
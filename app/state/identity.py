@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from typing import Generic, TypeVar
+
+import numpy as np
+from PIL import Image
+
+# Canonical "same screen" identity: a 64-bit visual dHash combined with a 64-bit signature
+# (1-bit MinHash) over normalized OCR tokens. Near-duplicates are compared by Hamming distance
+# on the combined 128-bit value.
+
+HASH_BITS = 64
+_MASK = (1 << HASH_BITS) - 1
+# Tokens shorter than this (after normalization) are mostly OCR noise
+_MIN_TOKEN_LEN = 3
+_TOKEN_RE = re.compile(r"[a-z]+")
+
+
+@dataclass(frozen=True)
+class StateIdentity:
+    visual: int = 0
+    text: int = 0
+
+    @property
+    def bits(self) -> int:
+        return (self.visual << HASH_BITS) | self.text
+
+    @property
+    def key(self) -> str:
+        return f"{self.visual:016x}{self.text:016x}"
+
+    @classmethod
+    def from_key(cls, key: str) -> StateIdentity:
+        return cls(visual=int(key[:16], 16), text=int(key[16:32], 16))
+
+    def distance(self, other: StateIdentity) -> int:
+        return hamming(self.bits, other.bits)
+
+    def visual_distance(self, other: StateIdentity) -> int:
+        return hamming(self.visual, other.visual)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def visual_hash(image: Image.Image, size: int = 8) -> int:
+    """Difference hash (dHash) of a downscaled grayscale frame.
+
+    Robust to small color/brightness shifts and rescaling; flips only a few bits for tiny overlays.
+    """
+    px = np.asarray(image.convert("L").resize((size + 1, size), Image.BILINEAR))
+    value = 0
+    # Row-major: each bit says whether a pixel is brighter than its right neighbour
+    for bit in (px[:, :-1] > px[:, 1:]).ravel():
+        value = (value << 1) | int(bit)
+    return value & _MASK
+
+
+def normalize_tokens(tokens: Iterable[str]) -> list[str]:
+    # Letters only, lower-case; digits/punctuation are the main source of OCR jitter
+    out: list[str] = []
+    for tok in tokens:
+        for part in _TOKEN_RE.findall((tok or "").lower()):
+            if len(part) >= _MIN_TOKEN_LEN:
+                out.append(part)
+    return out
+
+
+def _token_hash(token: str) -> int:
+    # Stable across processes (unlike hash()), so identities can be persisted
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+# Universal hash family for MinHash permutations: h_i(x) = (a_i * x + b_i) mod p
+_PRIME = (1 << 61) - 1
+_PERMS: list[tuple[int, int]] = [
+    ((_token_hash(f"a{i}") % _PRIME) | 1, _token_hash(f"b{i}") % _PRIME) for i in range(HASH_BITS)
+]
+
+
+def token_minhash(tokens: Iterable[str]) -> int:
+    """1-bit MinHash over the normalized token set.
+
+    Each bit is the parity of one MinHash permutation, so the expected Hamming distance between
+    two screens is ``HASH_BITS * (1 - jaccard) / 2``: one garbled token out of ten (Jaccard
+    9/11) flips ~5.8 bits, within the default ``STATE_IDENTITY_TOLERANCE`` of 8.
+    """
+    hashes = [_token_hash(t) for t in set(normalize_tokens(tokens))]
+    if not hashes:
+        return 0
+    value = 0
+    for i, (a, b) in enumerate(_PERMS):
+        m = min((a * h + b) % _PRIME for h in hashes)
+        if m & 1:
+            value |= 1 << i
+    return value
+
+
+def compute_identity(image: Image.Image | None, tokens: Iterable[str] | None) -> StateIdentity:
+    visual = 0
+    if image is not None:
+        try:
+            visual = visual_hash(image)
+        except Exception:
+            visual = 0
+    return StateIdentity(visual=visual, text=token_minhash(tokens or []))
+
+
+def identity_of(state: object) -> StateIdentity:
+    """Return the state's identity, deriving a text-only one for states built without a frame."""
+    ident = getattr(state, "identity", None)
+    if isinstance(ident, StateIdentity):
+        return ident
+    tokens = getattr(state, "ocr_tokens", None)
+    if not tokens:
+        tokens = (getattr(state, "ocr_text", "") or "").split()
+    return compute_identity(None, tokens)
+
+
+def same_screen(
+    a: StateIdentity | None, b: StateIdentity | None, tolerance: int | None = None
+) -> bool:
+    if a is None or b is None:
+        return False
+    if tolerance is None:
+        tolerance = _default_tolerance()
+    return a.distance(b) <= tolerance
+
+
+def _default_tolerance() -> int:
+    try:
+        from app.config import settings
+
+        return max(0, int(settings.state_identity_tolerance))
+    except Exception:
+        return 8
+
+
+V = TypeVar("V")
+
+
+class NearDuplicateIndex(Generic[V]):
+    """Map identities to values with near-duplicate lookup by Hamming distance.
+
+    Uses pigeonhole banding: the 128-bit signature is split into ``tolerance + 1`` bands, so any
+    identity within ``tolerance`` bits matches at least one band exactly. Lookups touch only the
+    few keys sharing a band, i.e. O(1) expected instead of a scan over all entries.
+    """
+
+    def __init__(self, tolerance: int | None = None) -> None:
+        self.tolerance = _default_tolerance() if tolerance is None else max(0, int(tolerance))
+        total = 2 * HASH_BITS
+        n_bands = min(total, self.tolerance + 1)
+        width = total // n_bands
+        self._bands: list[tuple[int, int]] = []
+        start = 0
+        for i in range(n_bands):
+            w = width + (1 if i < total % n_bands else 0)
+            self._bands.append((start, (1 << w) - 1))
+            start += w
+        self._values: dict[int, V] = {}
+        self._buckets: list[dict[int, set[int]]] = [{} for _ in self._bands]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, ident: object) -> bool:
+        return isinstance(ident, StateIdentity) and ident.bits in self._values
+
+    def _band_keys(self, bits: int) -> Iterator[tuple[int, int]]:
+        for i, (shift, mask) in enumerate(self._bands):
+            yield i, (bits >> shift) & mask
+
+    def put(self, ident: StateIdentity, value: V) -> None:
+        bits = ident.bits
+        if bits not in self._values:
+            for i, band in self._band_keys(bits):
+                self._buckets[i].setdefault(band, set()).add(bits)
+        self._values[bits] = value
+
+    def remove(self, ident: StateIdentity) -> None:
+        bits = ident.bits
+        if bits not in self._values:
+            return
+        del self._values[bits]
+        for i, band in self._band_keys(bits):
+            bucket = self._buckets[i].get(band)
+            if bucket is not None:
+                bucket.discard(bits)
+                if not bucket:
+                    del self._buckets[i][band]
+
+    def nearest(
+        self, ident: StateIdentity, tolerance: int | None = None
+    ) -> tuple[StateIdentity, V, int] | None:
+        """Return (stored identity, value, distance) of the closest entry within tolerance."""
+        tol = self.tolerance if tolerance is None else min(self.tolerance, max(0, int(tolerance)))
+        bits = ident.bits
+        if bits in self._values:
+            return ident, self._values[bits], 0
+        best: tuple[int, int] | None = None
+        seen: set[int] = set()
+        for i, band in self._band_keys(bits):
+            for cand in self._buckets[i].get(band, ()):
+                if cand in seen:
+                    continue
+                seen.add(cand)
+                d = hamming(bits, cand)
+                if d <= tol and (best is None or d < best[1]):
+                    best = (cand, d)
+        if best is None:
+            return None
+        cand_bits, dist = best
+        found = StateIdentity(visual=cand_bits >> HASH_BITS, text=cand_bits & _MASK)
+        return found, self._values[cand_bits], dist
+
+    def get(self, ident: StateIdentity, tolerance: int | None = None) -> V | None:
+        hit = self.nearest(ident, tolerance)
+        return hit[1] if hit else None
+
+    def clear(self) -> None:
+        self._values.clear()
+        for b in self._buckets:
+            b.clear()
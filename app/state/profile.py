@@ -1,6 +1,11 @@
 from __future__ import annotations
 
+import copy
 import json
+import os
+import threading
+import time
+from collections.abc import Iterable
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
@@ -8,6 +13,8 @@ from typing import Any, Dict
 
 
 _PROFILE_PATH = Path("data/profile.json")
+# How often (at most) the file's mtime is checked for edits made by other processes
+_RELOAD_CHECK_S = 1.0
 
 
 @dataclass
@@ -17,66 +24,163 @@ class ModeStatus:
     locked: bool | None = None
 
 
-def _load() -> Dict[str, Any]:
-    try:
-        if _PROFILE_PATH.exists():
-            return json.loads(_PROFILE_PATH.read_text(encoding="utf-8"))
-    except Exception:
-        pass
-    return {"modes": {}}
-
-
-def _save(obj: Dict[str, Any]) -> None:
-    try:
-        _PROFILE_PATH.parent.mkdir(parents=True, exist_ok=True)
-        _PROFILE_PATH.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
-    except Exception:
-        pass
+class ProfileService:
+    """In-memory snapshot of ``profile.json`` with atomic write-through.
+
+    Reads never touch the disk except for a throttled mtime check, which reloads the snapshot
+    when another process (or an operator) edited the file.
+    """
+
+    def __init__(
+        self, path: Path | str | None = None, reload_check_s: float = _RELOAD_CHECK_S
+    ) -> None:
+        self.path = Path(path) if path is not None else _PROFILE_PATH
+        self.reload_check_s = float(reload_check_s)
+        self._lock = threading.RLock()
+        self._data: Dict[str, Any] | None = None
+        self._mtime_ns: int | None = None
+        self._last_check = 0.0
+
+    # --- snapshot management ---------------------------------------------
+    def _stat_mtime(self) -> int | None:
+        try:
+            return self.path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            if self.path.exists():
+                obj = json.loads(self.path.read_text(encoding="utf-8"))
+                if isinstance(obj, dict):
+                    obj.setdefault("modes", {})
+                    return obj
+        except Exception:
+            pass
+        return {"modes": {}}
+
+    def _snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        if self._data is None:
+            self._mtime_ns = self._stat_mtime()
+            self._data = self._read()
+            self._last_check = now
+        elif now - self._last_check >= self.reload_check_s:
+            self._last_check = now
+            mtime = self._stat_mtime()
+            if mtime != self._mtime_ns:
+                self._mtime_ns = mtime
+                self._data = self._read()
+        return self._data
+
+    def _write(self) -> None:
+        data = self._data if self._data is not None else {"modes": {}}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+            tmp.replace(self.path)
+            self._mtime_ns = self._stat_mtime()
+        except Exception:
+            pass
+
+    def reload(self) -> None:
+        with self._lock:
+            self._data = None
+            self._snapshot()
+
+    def data(self) -> Dict[str, Any]:
+        """Deep copy of the current profile."""
+        with self._lock:
+            return copy.deepcopy(self._snapshot())
+
+    # --- queries ---------------------------------------------------------
+    def _mode(self, mode: str) -> Dict[str, Any]:
+        return self._snapshot().get("modes", {}).get(mode, {})
+
+    def is_mode_sufficient(self, mode: str) -> bool:
+        with self._lock:
+            return bool(self._mode(mode).get("sufficient", False))
+
+    def is_mode_locked(self, mode: str) -> bool:
+        with self._lock:
+            return bool(self._mode(mode).get("locked", False))
+
+    def locked_modes(self, modes: Iterable[str]) -> set[str]:
+        """Batch lock check: the subset of ``modes`` currently marked locked."""
+        with self._lock:
+            known = self._snapshot().get("modes", {})
+            return {m for m in modes if bool(known.get(m, {}).get("locked", False))}
+
+    def statuses(self, modes: Iterable[str]) -> dict[str, ModeStatus]:
+        with self._lock:
+            out: dict[str, ModeStatus] = {}
+            for m in modes:
+                ms = self._mode(m)
+                out[m] = ModeStatus(
+                    last_done_iso=ms.get("last_done_iso"),
+                    sufficient=bool(ms.get("sufficient", False)),
+                    locked=bool(ms.get("locked", False)),
+                )
+            return out
+
+    # --- updates (write-through) -------------------------------------------
+    def mark_mode_done(self, mode: str, sufficient: bool = False) -> None:
+        with self._lock:
+            modes: Dict[str, Any] = self._snapshot().setdefault("modes", {})
+            prev = modes.get(mode, {})
+            modes[mode] = {
+                "last_done_iso": datetime.now(tz=timezone.utc).isoformat(),
+                "sufficient": bool(sufficient),
+                "locked": bool(prev.get("locked", False)),
+            }
+            self._write()
+
+    def reset_daily_if_new_day(self) -> None:
+        today = datetime.now(tz=timezone.utc).date().isoformat()
+        with self._lock:
+            data = self._snapshot()
+            if data.get("last_reset_day") == today:
+                return
+            # clear sufficiency flags for daily resets
+            for m in data.get("modes", {}).values():
+                m["sufficient"] = False
+            data["last_reset_day"] = today
+            self._write()
+
+    def set_mode_locked(self, mode: str, locked: bool = True) -> None:
+        with self._lock:
+            modes: Dict[str, Any] = self._snapshot().setdefault("modes", {})
+            ms = modes.get(mode, {})
+            if ms.get("locked") == bool(locked):
+                return
+            ms["locked"] = bool(locked)
+            modes[mode] = ms
+            self._write()
+
+
+profile = ProfileService()
 
 
 def is_mode_sufficient(mode: str) -> bool:
-    data = _load()
-    ms = data.get("modes", {}).get(mode, {})
-    return bool(ms.get("sufficient", False))
+    return profile.is_mode_sufficient(mode)
 
 
 def mark_mode_done(mode: str, sufficient: bool = False) -> None:
-    data = _load()
-    modes: Dict[str, Any] = data.setdefault("modes", {})
-    prev = modes.get(mode, {})
-    modes[mode] = {
-        "last_done_iso": datetime.now(tz=timezone.utc).isoformat(),
-        "sufficient": bool(sufficient),
-        "locked": bool(prev.get("locked", False)),
-    }
-    _save(data)
+    profile.mark_mode_done(mode, sufficient=sufficient)
 
 
 def reset_daily_if_new_day() -> None:
-    data = _load()
-    today = datetime.now(tz=timezone.utc).date().isoformat()
-    last = data.get("last_reset_day")
-    if last != today:
-        # clear sufficiency flags for daily resets
-        modes = data.get("modes", {})
-        for m in modes.values():
-            m["sufficient"] = False
-        data["last_reset_day"] = today
-        _save(data)
+    profile.reset_daily_if_new_day()
 
 
 def is_mode_locked(mode: str) -> bool:
-    data = _load()
-    ms = data.get("modes", {}).get(mode, {})
-    return bool(ms.get("locked", False))
+    return profile.is_mode_locked(mode)
 
 
 def set_mode_locked(mode: str, locked: bool = True) -> None:
-    data = _load()
-    modes: Dict[str, Any] = data.setdefault("modes", {})
-    ms = modes.get(mode, {})
-    ms["locked"] = bool(locked)
-    modes[mode] = ms
-    _save(data)
+    profile.set_mode_locked(mode, locked)
 
 
+def locked_modes(modes: Iterable[str]) -> set[str]:
+    return profile.locked_modes(modes)
@@ -1,10 +1,20 @@
 import asyncio
+from pathlib import Path
+
+import pytest
 
 from app.agents.orchestrator import orchestrate
+from app.memory import store as store_mod
+from app.state import profile as profile_mod
 from app.state.encoder import GameState
 
 
-def test_orchestrate_returns_candidate() -> None:
+def test_orchestrate_returns_candidate(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    # Keep the memory store and profile out of data/
+    monkeypatch.setattr(store_mod, "_store", None)
+    monkeypatch.setattr(store_mod.settings, "db_path", str(tmp_path / "app.sqlite3"))
+    service = profile_mod.ProfileService(tmp_path / "profile.json")
+    monkeypatch.setattr(profile_mod, "profile", service)
     state = GameState(timestamp_utc="t", stamina_current=50, stamina_cap=100, ocr_text="", ocr_lines=[], ocr_tokens=[])
 
     async def run() -> None:
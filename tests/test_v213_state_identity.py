@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from PIL import Image, ImageDraw
+
+from app.policy.cache import DecisionCache
+from app.state.identity import (
+    NearDuplicateIndex,
+    StateIdentity,
+    compute_identity,
+    same_screen,
+    visual_hash,
+)
+
+
+def _screen(shade: int, marker: tuple[int, int] | None = None) -> Image.Image:
+    img = Image.new("RGB", (160, 90), color=(shade, shade, shade))
+    d = ImageDraw.Draw(img)
+    d.rectangle((10, 10, 60, 40), fill=(250, 250, 250))
+    d.rectangle((90, 50, 150, 80), fill=(20, 20, 20))
+    if marker:
+        d.point(marker, fill=(255, 0, 0))
+    return img
+
+
+def test_identity_tolerates_ocr_jitter() -> None:
+    img = _screen(120)
+    tokens = ["Episode", "Side", "Story", "Battle", "Arena", "Summon", "Shop", "Sanctuary"]
+    a = compute_identity(img, tokens)
+    # digits/punctuation noise and one garbled token
+    b = compute_identity(_screen(120, marker=(5, 5)), tokens[:-1] + ["Sanctuarv", "12/120", "!!"])
+    # within the shipped default tolerance the caches and stuck detector use
+    assert same_screen(a, b)
+    other = compute_identity(None, ["Hunt", "Wyvern", "Banshee", "Golem", "Azimanak"])
+    assert not same_screen(a, other)
+
+
+def test_visual_hash_ignores_brightness_shift() -> None:
+    assert visual_hash(_screen(120)) == visual_hash(_screen(124))
+
+
+def test_near_duplicate_index_lookup_and_remove() -> None:
+    idx: NearDuplicateIndex[str] = NearDuplicateIndex(tolerance=4)
+    base = StateIdentity(visual=0xFFFF0000FFFF0000, text=0x0123456789ABCDEF)
+    idx.put(base, "lobby")
+    near = StateIdentity(visual=base.visual ^ 0b1011, text=base.text)
+    far = StateIdentity(visual=base.visual ^ 0xFF, text=base.text)
+    assert idx.get(near) == "lobby"
+    assert idx.get(far) is None
+    assert StateIdentity.from_key(base.key) == base
+    idx.remove(base)
+    assert idx.get(near) is None and len(idx) == 0
+
+
+def test_decision_cache_serves_near_duplicate_screens() -> None:
+    c = DecisionCache(capacity=2, ttl_s=10.0, tolerance=4)
+    a = StateIdentity(visual=1, text=2)
+    c.set(a, 0.7, {"type": "tap"}, "policy-lite")
+    hit = c.get(StateIdentity(visual=1 ^ 0b100, text=2))
+    assert hit is not None and hit[2] == "policy-lite"
+    c.set(StateIdentity(visual=0xFFFF << 40, text=0xFFFF), 0.1, {"type": "wait"}, "p2")
+    c.set(StateIdentity(visual=0xFFFF << 20, text=0xFFFF << 30), 0.1, {"type": "wait"}, "p3")
+    # evicted entries no longer match near-duplicates
+    assert c.get(StateIdentity(visual=1 ^ 0b100, text=2)) is None
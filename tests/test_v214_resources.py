@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import time
+
+from PIL import Image
+
+from app.metrics.registry import compute_metrics
+from app.perception.resources import ResourceTracker, parse_counter, read_resources, roi_boxes
+from app.perception.ui_elements import ResourceCounter
+from app.state.encoder import GameState
+
+
+def _state(resources: list[ResourceCounter] | None = None) -> GameState:
+    return GameState(
+        timestamp_utc="t",
+        stamina_current=None,
+        stamina_cap=None,
+        ocr_text="Lobby",
+        ocr_lines=["Lobby"],
+        ocr_tokens=["Lobby"],
+        resources=resources,
+    )
+
+
+def test_parse_counter_digits_and_caps() -> None:
+    assert parse_counter("stamina", "54/120") == ResourceCounter("stamina", 54, 120)
+    assert parse_counter("gold", "1,234,567") == ResourceCounter("gold", 1234567)
+    assert parse_counter("stamina", "") is None
+    # absurd values are rejected as OCR garbage
+    assert parse_counter("stamina", "541201/120") is None
+
+
+def test_read_resources_uses_small_rois() -> None:
+    img = Image.new("RGB", (882, 496))
+    seen: list[tuple[int, int]] = []
+
+    def fake_ocr(crop: Image.Image) -> str:
+        seen.append(crop.size)
+        return {0: "88/120", 1: "250,000", 2: "1,337"}[len(seen) - 1]
+
+    counters = read_resources(img, ocr=fake_ocr)
+    assert [c.name for c in counters] == ["stamina", "gold", "skystones"]
+    assert counters[0].cap == 120 and counters[2].value == 1337
+    # each ROI is a tiny fraction of the frame
+    assert all(w * h < 0.01 * 882 * 496 for w, h in seen)
+    assert len(roi_boxes(882, 496)) == 3
+
+
+def test_metrics_use_resource_series() -> None:
+    hist = ResourceTracker()
+    t0 = time.monotonic()
+    hist.record([ResourceCounter("stamina", 100, 120), ResourceCounter("gold", 10_000)], ts=t0 - 2)
+    hist.record([ResourceCounter("stamina", 90, 120), ResourceCounter("gold", 15_000)], ts=t0 - 1)
+    assert hist.spent("stamina", 60.0, now=t0) == 10
+    assert hist.gained("gold", 60.0, now=t0) == 5_000
+    assert hist.spent("stamina", 60.0, now=t0 + 3600) == 0
+    m = compute_metrics(_state([ResourceCounter("stamina", 90, 120)]), history=hist)
+    assert m.resource_safety == 1.0
+    assert 0.0 < m.farm_efficiency <= 1.0
+    capped = compute_metrics(_state([ResourceCounter("stamina", 120, 120)]), history=ResourceTracker())
+    assert capped.resource_safety == 0.5 and capped.farm_efficiency == 0.0
+
+
+def test_single_sample_ocr_dip_is_not_counted() -> None:
+    hist = ResourceTracker()
+    for i, gold in enumerate((1_000, 100, 1_000, 1_500, 1_500)):
+        hist.record([ResourceCounter("gold", gold)], ts=float(i))
+    assert hist.gained("gold", 60.0, now=5.0) == 500
+    assert hist.spent("gold", 60.0, now=5.0) == 0
+    # a real drop that holds is still spending
+    hist.record([ResourceCounter("gold", 900)], ts=5.0)
+    hist.record([ResourceCounter("gold", 900)], ts=6.0)
+    assert hist.spent("gold", 60.0, now=7.0) == 600
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from app.actions.types import BackAction, TapAction, WaitAction
+from app.navigation.graph import NavigationGraph, action_signature
+from app.state.identity import StateIdentity
+
+LOBBY = StateIdentity(visual=0x00000000FFFFFFFF, text=0x1111111111111111)
+BATTLE = StateIdentity(visual=0xFFFFFFFF00000000, text=0x2222222222222222)
+HUNT = StateIdentity(visual=0x0F0F0F0F0F0F0F0F, text=0x4444444444444444)
+SHOP = StateIdentity(visual=0xF0F0F0F0F0F0F0F0, text=0x8888888888888888)
+
+
+def test_action_signature_buckets_jittered_taps() -> None:
+    assert action_signature(TapAction(x=101, y=201)) == action_signature(TapAction(x=104, y=203))
+    assert action_signature(WaitAction(seconds=1.0)) is None
+    assert action_signature(BackAction()) == "back"
+
+
+def test_plan_prefers_reliable_route_and_persists(tmp_path: Path) -> None:
+    path = tmp_path / "nav.json"
+    g = NavigationGraph(path=path, tolerance=4)
+    battle_tap = TapAction(x=600, y=450)
+    hunt_tap = TapAction(x=300, y=200)
+    shop_tap = TapAction(x=50, y=450)
+    for _ in range(3):
+        g.record_transition(LOBBY, battle_tap, BATTLE, latency_s=0.8, label="battle")
+        g.record_transition(BATTLE, hunt_tap, HUNT, latency_s=0.9, label="hunt")
+    # Shortcut lobby -> shop -> hunt exists but the shop tap usually does nothing
+    g.record_transition(LOBBY, shop_tap, SHOP, latency_s=0.5, label="shop")
+    for _ in range(9):
+        g.record_transition(LOBBY, shop_tap, LOBBY, latency_s=0.5)
+    g.record_transition(SHOP, hunt_tap, HUNT, latency_s=0.5, label="hunt")
+
+    near_lobby = StateIdentity(visual=LOBBY.visual ^ 0b101, text=LOBBY.text)
+    plan = g.plan(near_lobby, "hunt")
+    assert plan is not None and [h.action for h in plan] == [battle_tap, hunt_tap]
+    assert plan[0].success_rate == 1.0
+    assert g.plan(HUNT, "hunt") == []
+    assert g.plan(HUNT, "battle") is None
+
+    g.save()
+    reloaded = NavigationGraph(path=path, tolerance=4)
+    assert reloaded.summary() == g.summary()
+    top = reloaded.top_nodes(2)
+    assert len(top) == 2 and top[0]["visits"] >= top[1]["visits"]
+    again = reloaded.plan(LOBBY, "hunt")
+    assert again is not None and [h.action for h in again] == [battle_tap, hunt_tap]
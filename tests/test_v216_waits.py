@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterator
+
+from PIL import Image, ImageDraw
+
+from app.actions.waits import (
+    async_wait_for_settle,
+    frame_delta,
+    wait_for_screen,
+    wait_for_settle,
+    wait_for_transition,
+)
+from app.state.identity import StateIdentity, visual_hash
+
+
+def _frame(offset: int) -> Image.Image:
+    img = Image.new("RGB", (320, 180), color=(30, 30, 30))
+    ImageDraw.Draw(img).rectangle((offset, 40, offset + 80, 120), fill=(240, 240, 240))
+    return img
+
+
+def _feed(frames: list[Image.Image]) -> Iterator[Image.Image]:
+    # repeat the last frame forever once the scripted sequence is exhausted
+    yield from frames
+    while True:
+        yield frames[-1]
+
+
+def test_settle_returns_once_animation_stops() -> None:
+    frames = _feed([_frame(0), _frame(40), _frame(80), _frame(120)])
+    res = wait_for_settle(timeout_s=5.0, poll_s=0.0, capture=lambda: next(frames))
+    assert res.ok and res.frames == 6
+    assert frame_delta(res.image, _frame(120)) == 0.0
+
+
+def test_transition_reports_no_op_actions_quickly() -> None:
+    still = _frame(10)
+    res = wait_for_transition(still, change_timeout_s=0.2, poll_s=0.01, capture=lambda: still)
+    assert not res.ok and res.elapsed_s < 1.0
+    frames = _feed([still, _frame(150), _frame(200)])
+    moved = wait_for_transition(still, poll_s=0.0, capture=lambda: next(frames))
+    assert moved.ok and frame_delta(moved.image, _frame(200)) == 0.0
+
+
+def test_wait_for_screen_matches_expected_identity() -> None:
+    target = StateIdentity(visual=visual_hash(_frame(200)), text=0)
+    frames = _feed([_frame(0), _frame(100), _frame(200)])
+    res = wait_for_screen(target, timeout_s=5.0, poll_s=0.0, capture=lambda: next(frames))
+    assert res.ok and res.frames == 3
+
+
+def test_async_settle_times_out_on_constant_motion() -> None:
+    offsets = iter(range(0, 10_000, 37))
+
+    def moving() -> Image.Image:
+        return _frame(next(offsets) % 240)
+
+    res = asyncio.run(async_wait_for_settle(timeout_s=0.2, poll_s=0.01, capture=moving))
+    assert not res.ok and res.frames >= 2
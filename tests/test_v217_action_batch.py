@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from app.actions.batch import compile_batch, parse_timings, run_batch_adb, run_batch_sequential
+from app.actions.types import Action, ActionBatch, BackAction, SwipeAction, TapAction, WaitAction
+
+BATCH = ActionBatch((
+    TapAction(x=10, y=20),
+    WaitAction(seconds=0.25),
+    SwipeAction(x1=1, y1=2, x2=3, y2=4, duration_ms=150),
+    BackAction(),
+))
+
+
+def test_compile_batch_single_script() -> None:
+    script = compile_batch(BATCH)
+    assert "input tap 10 20" in script
+    assert "sleep 0.250" in script
+    assert "input swipe 1 2 3 4 150" in script
+    assert "input keyevent 4" in script
+    # a timing mark before the first step and after every step, chained so a failure stops it
+    assert script.count("t 0 && ") == 1
+    assert script.count(" && t ") == len(BATCH)
+
+
+def test_run_batch_adb_one_round_trip_with_step_timings() -> None:
+    calls: list[list[str]] = []
+
+    def fake_adb(args: list[str]) -> bytes:
+        calls.append(args)
+        return b"@0 100.00\n@1 100.10\n@2 100.36\n@3 100.60\n@4 100.65\n"
+
+    res = run_batch_adb(BATCH, exec_fn=fake_adb)
+    assert len(calls) == 1 and calls[0][0] == "shell"
+    assert res.ok and res.round_trips == 1
+    assert [round(s, 2) for s in res.step_s] == [0.10, 0.26, 0.24, 0.05]
+    # missing marks (e.g. a step aborted the script) yield no per-step timings
+    assert parse_timings("@0 1.0\n@1 1.5\n", 4) == []
+
+
+def test_sequential_fallback_counts_round_trips() -> None:
+    seen: list[Action] = []
+    res = run_batch_sequential(BATCH, seen.append)
+    assert seen == list(BATCH.steps)
+    assert len(res.step_s) == 4 and res.round_trips == 3
+
+
+def test_failed_script_reports_how_far_it_got() -> None:
+    class _Failed(RuntimeError):
+        stdout = b"@0 100.00\n@1 100.10\n"
+
+    def fake_adb(args: list[str]) -> bytes:
+        raise _Failed("device went away")
+
+    res = run_batch_adb(BATCH, exec_fn=fake_adb)
+    assert not res.ok and res.started and res.completed == 1
+    assert res.error == "device went away" and res.step_s == []
+
+
+def test_script_that_never_started_can_be_retried() -> None:
+    def fake_adb(args: list[str]) -> bytes:
+        raise FileNotFoundError("adb")
+
+    res = run_batch_adb(BATCH, exec_fn=fake_adb)
+    assert not res.ok and not res.started and res.completed == 0
+
+
+def test_sequential_stops_at_the_first_failing_step() -> None:
+    seen: list[Action] = []
+
+    def execute(action: Action) -> None:
+        if isinstance(action, SwipeAction):
+            raise RuntimeError("swipe failed")
+        seen.append(action)
+
+    res = run_batch_sequential(BATCH, execute)
+    assert not res.ok and res.completed == 2 and res.error == "swipe failed"
+    assert seen == list(BATCH.steps[:2])
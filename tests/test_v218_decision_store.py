@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from app.actions.types import BackAction, TapAction
+from app.policy.cache import DecisionCache, DecisionStore, TieredDecisionCache
+from app.state.identity import StateIdentity
+
+LOBBY = StateIdentity(visual=0x00000000FFFFFFFF, text=0x1111111111111111)
+JITTERED = StateIdentity(visual=LOBBY.visual ^ 0b11, text=LOBBY.text ^ 0b1)
+
+
+def _tiered(db: Path) -> TieredDecisionCache:
+    return TieredDecisionCache(
+        hot=DecisionCache(tolerance=4),
+        store=DecisionStore(db_path=str(db), tolerance=4),
+        min_success=0.35,
+        max_age_s=3600.0,
+    )
+
+
+def test_decisions_survive_restart_and_match_near_duplicates(tmp_path: Path) -> None:
+    db = tmp_path / "decisions.sqlite3"
+    first = _tiered(db)
+    first.note_decision_latency(40.0)
+    first.set(LOBBY, 0.8, TapAction(x=100, y=200), "policy-lite")
+    first.flush()
+    # new session: hot tier is cold, the SQLite tier answers a jittered lookup
+    second = _tiered(db)
+    second.note_decision_latency(40.0)
+    hit = second.get(JITTERED)
+    assert hit is not None and hit[1] == TapAction(x=100, y=200) and hit[2] == "policy-lite"
+    stats = second.stats()
+    assert stats["store_hits"] == 1 and stats["latency_saved_ms"] == 40.0
+    assert second.get(LOBBY) is not None and second.stats()["hot_hits"] == 1
+
+
+def test_failing_decisions_stop_being_served(tmp_path: Path) -> None:
+    cache = _tiered(tmp_path / "decisions.sqlite3")
+    cache.set(LOBBY, 0.6, BackAction(), "policy-lite")
+    for _ in range(3):
+        cache.record_outcome(LOBBY, success=False)
+    assert cache.get(LOBBY) is None
+    assert cache.stats()["rejected"] == 1
+    # a new decision for the screen resets its outcome record
+    cache.set(LOBBY, 0.7, TapAction(x=5, y=5), "policy-lite")
+    cache.record_outcome(LOBBY, success=True)
+    cache.hot.drop(LOBBY)
+    assert cache.get(LOBBY) is not None
+
+
+def test_store_hits_are_counted_in_memory_and_flushed_in_batches(tmp_path: Path) -> None:
+    db = tmp_path / "decisions.sqlite3"
+    store = DecisionStore(db_path=str(db), tolerance=4)
+    store.put(LOBBY, 0.8, TapAction(x=1, y=2), "policy-lite")
+    store.flush()
+    assert [store.get(JITTERED).hits for _ in range(3)] == [1, 2, 3]
+    # nothing written yet: a second connection still sees zero hits
+    assert DecisionStore(db_path=str(db)).get(LOBBY).hits == 1
+    store.flush()
+    assert DecisionStore(db_path=str(db)).get(LOBBY).hits == 4
+
+
+def test_re_putting_a_decision_keeps_its_age_and_outcomes(tmp_path: Path) -> None:
+    db = tmp_path / "decisions.sqlite3"
+    store = DecisionStore(db_path=str(db), tolerance=4)
+    store.put(LOBBY, 0.8, TapAction(x=1, y=2), "policy-lite")
+    store.record_outcome(LOBBY, success=True)
+    # writes are batched: nothing is committed per decision
+    assert DecisionStore(db_path=str(db)).get(LOBBY) is None
+    first = store.get(LOBBY)
+    store.put(JITTERED, 0.9, TapAction(x=1, y=2), "policy-lite")
+    again = store.get(LOBBY)
+    assert again.updated_ts == first.updated_ts and again.successes == 1
+    time.sleep(0.01)
+    store.put(LOBBY, 0.9, BackAction(), "policy-lite")
+    changed = store.get(LOBBY)
+    assert changed.updated_ts > first.updated_ts and changed.successes == 0
+
+
+def test_expired_decisions_are_dropped(tmp_path: Path) -> None:
+    cache = _tiered(tmp_path / "decisions.sqlite3")
+    cache.max_age_s = 0.0
+    cache.set(LOBBY, 0.6, BackAction(), "policy-lite")
+    cache.hot.drop(LOBBY)
+    assert cache.get(LOBBY) is None and cache.stats()["rejected"] == 1
+    assert cache.store.get(LOBBY) is None
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+from app.agents import orchestrator
+from app.agents.orchestrator import base_proposal, orchestrate
+from app.memory import store as store_mod
+from app.state.encoder import GameState
+
+
+def test_base_proposal_computed_once_per_state(monkeypatch, tmp_path: Path) -> None:
+    calls: list[GameState] = []
+
+    def fake_propose(state: GameState, ctx: object = None) -> tuple[float, object]:
+        calls.append(state)
+        return 0.5, object()
+
+    monkeypatch.setattr(orchestrator, "propose_action", fake_propose)
+    monkeypatch.setattr(orchestrator.settings, "max_agents", 4)
+    monkeypatch.setattr(orchestrator.settings, "hf_model_id_policy", None)
+    monkeypatch.setattr(orchestrator.settings, "hf_model_id_judge", None)
+    monkeypatch.setattr(store_mod, "_store", None)
+    monkeypatch.setattr(orchestrator.settings, "db_path", str(tmp_path / "app.sqlite3"))
+    state = GameState(
+        timestamp_utc="t", stamina_current=None, stamina_cap=None,
+        ocr_text="", ocr_lines=[], ocr_tokens=[],
+    )
+    before = base_proposal.computed
+    cand = asyncio.run(orchestrate(state))
+    assert len(cand) == 3
+    # four agents, one heuristic evaluation
+    assert calls == [state] and base_proposal.computed == before + 1
+    assert orchestrator.get_agent_executor()._max_workers >= 4
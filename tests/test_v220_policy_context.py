@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.policy.heuristic import PolicyContext, propose_action
+from app.state import profile as profile_mod
+from app.state.encoder import GameState
+
+
+@pytest.fixture(autouse=True)
+def _tmp_profile(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    service = profile_mod.ProfileService(tmp_path / "profile.json")
+    monkeypatch.setattr(profile_mod, "profile", service)
+
+
+def test_policy_contexts_are_isolated() -> None:
+    state = GameState(
+        timestamp_utc="t", stamina_current=None, stamina_cap=None,
+        ocr_text="Static Screen", ocr_lines=["Static Screen"], ocr_tokens=["Static", "Screen"],
+    )
+    busy, fresh = PolicyContext(), PolicyContext()
+    for _ in range(3):
+        propose_action(state, busy)
+    _, action = propose_action(state, busy)
+    # the repeat backoff of one session does not leak into another
+    assert busy.repeat_count >= 3 and action.__class__.__name__ in ("WaitAction", "BackAction")
+    propose_action(state, fresh)
+    assert fresh.repeat_count == 0
+
+
+def test_base_proposal_memo_dies_with_its_context() -> None:
+    import gc
+    import weakref
+
+    from app.agents.orchestrator import base_proposal
+
+    state = GameState(
+        timestamp_utc="t", stamina_current=None, stamina_cap=None,
+        ocr_text="Static Screen", ocr_lines=["Static Screen"], ocr_tokens=["Static", "Screen"],
+    )
+    ctx = PolicyContext()
+    first = base_proposal.get(state, ctx)
+    assert base_proposal.get(state, ctx) is first
+    # a fork starts without the parent's memo, and nothing else keeps a discarded one alive
+    fork = ctx.fork()
+    assert fork.proposal is None
+    base_proposal.get(state, fork)
+    ref = weakref.ref(fork)
+    del fork
+    gc.collect()
+    assert ref() is None
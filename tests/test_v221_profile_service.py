@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+from app.state.profile import ProfileService
+
+
+def test_queries_served_from_memory_with_write_through(tmp_path: Path) -> None:
+    path = tmp_path / "profile.json"
+    svc = ProfileService(path=path, reload_check_s=3600.0)
+    reads = 0
+    real_read = svc._read
+
+    def counting_read() -> dict:
+        nonlocal reads
+        reads += 1
+        return real_read()
+
+    svc._read = counting_read  # type: ignore[method-assign]
+    svc.set_mode_locked("arena", True)
+    svc.mark_mode_done("hunt", sufficient=True)
+    for _ in range(50):
+        svc.reset_daily_if_new_day()
+        assert svc.is_mode_locked("arena") and not svc.is_mode_locked("hunt")
+    assert svc.locked_modes(["arena", "hunt", "shop"]) == {"arena"}
+    assert reads == 1
+    # every change was written through atomically
+    on_disk = json.loads(path.read_text(encoding="utf-8"))
+    assert on_disk["modes"]["arena"]["locked"] is True
+    assert on_disk["modes"]["hunt"]["sufficient"] is False  # cleared by the daily reset
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_external_edits_are_picked_up(tmp_path: Path) -> None:
+    path = tmp_path / "profile.json"
+    svc = ProfileService(path=path, reload_check_s=0.0)
+    assert not svc.is_mode_locked("summon")
+    path.write_text(json.dumps({"modes": {"summon": {"locked": True}}}), encoding="utf-8")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000))
+    assert svc.is_mode_locked("summon")
+    assert svc.statuses(["summon"])["summon"].locked is True
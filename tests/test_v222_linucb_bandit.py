@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import random
+from pathlib import Path
+
+import numpy as np
+
+from app.config import settings
+from app.policy.bandit import ContextualBandit, replay_regret, synthetic_events
+
+LABELS = ["episode", "battle", "hunt", "arena", "shop"]
+
+
+def test_linucb_beats_context_free_baseline(tmp_path: Path, monkeypatch) -> None:
+    events = synthetic_events(LABELS, 1500, seed=3)
+    monkeypatch.setattr(settings, "rl_enabled", True)
+    monkeypatch.setattr(settings, "rl_method", "linucb")
+    random.seed(0)
+    lin = replay_regret(ContextualBandit(LABELS, persist_path=str(tmp_path / "lin.json")), events)
+    monkeypatch.setattr(settings, "rl_method", "bandit")
+    random.seed(0)
+    eps = replay_regret(ContextualBandit(LABELS, persist_path=str(tmp_path / "eps.json")), events)
+    assert lin["events"] == 1500
+    assert lin["cumulative_regret"] < 0.6 * eps["cumulative_regret"]
+
+
+def test_updates_are_buffered_and_persisted(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "rl_enabled", True)
+    monkeypatch.setattr(settings, "rl_method", "linucb")
+    path = tmp_path / "policy.json"
+    b = ContextualBandit(LABELS, persist_path=str(path), flush_every=4, flush_interval_s=3600.0)
+    x = np.zeros(b.dim)
+    x[0] = 1.0
+    for _ in range(3):
+        b.update("hunt", 1.0, context=x)
+    assert not path.exists()
+    b.update("hunt", 1.0, context=x)
+    assert path.exists()
+    reloaded = ContextualBandit(LABELS, persist_path=str(path))
+    scores = reloaded.scores(LABELS, x, alpha=0.0)
+    assert max(scores, key=scores.get) == "hunt"
+    assert reloaded.arms["hunt"].count == 4
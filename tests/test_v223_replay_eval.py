@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from app.actions.types import BackAction, TapAction, action_to_dict
+from app.analytics import replay as replay_mod
+from app.analytics.replay import (
+    TrajectoryRecorder,
+    TrajectoryStep,
+    evaluate,
+    evaluate_file,
+    load_trajectory,
+    replay,
+    step_from_decision,
+)
+from app.perception.ui_elements import UiButton
+from app.state import profile as profile_mod
+from app.state.encoder import GameState
+from app.state.identity import StateIdentity
+
+
+def _state(text: str) -> GameState:
+    return GameState(
+        timestamp_utc="t",
+        stamina_current=40,
+        stamina_cap=120,
+        ocr_text=text,
+        ocr_lines=[text],
+        ocr_tokens=text.split(),
+        ui_buttons=[UiButton("hunt", 10, 20, 30, 40)],
+        img_width=882,
+        img_height=496,
+        identity=StateIdentity(visual=5, text=7),
+    )
+
+
+def test_trajectory_roundtrip(tmp_path: Path) -> None:
+    rec = TrajectoryRecorder(tmp_path / "s.jsonl")
+    frame = rec.save_frame(Image.new("RGB", (882, 496), "white"))
+    step = step_from_decision(
+        _state("Lobby Hunt"), TapAction(x=5, y=6), "policy-lite", 0.5, True, frame_path=frame
+    )
+    rec.record(step)
+    (loaded,) = list(load_trajectory(rec.path))
+    assert loaded == step
+    assert Image.open(loaded.frame_path).size == (882, 496)
+
+
+def test_replay_agreement_and_estimated_reward() -> None:
+    tap = TapAction(x=100, y=100)
+    steps = [
+        TrajectoryStep(_state("a"), action_to_dict(tap), reward=1.0),
+        TrajectoryStep(_state("b"), action_to_dict(TapAction(x=103, y=98)), reward=0.5),
+        TrajectoryStep(_state("c"), action_to_dict(BackAction()), reward=-1.0),
+    ]
+    rep = replay(steps, lambda s: tap, name="always-tap")
+    # jittered taps on the same cell count as agreement
+    assert rep.steps == 3 and rep.agreed == 2
+    assert rep.estimated_reward == 0.75
+    assert rep.decisions_per_s > 0
+
+
+def test_evaluate_parallel_matches_sequential(tmp_path: Path) -> None:
+    paths = []
+    for i in range(2):
+        rec = TrajectoryRecorder(tmp_path / f"s{i}.jsonl")
+        for text in ("Static Screen", "Static Screen", "Static Screen", "Static Screen"):
+            rec.record(step_from_decision(_state(text), BackAction(), "policy-lite", 1.0, False))
+        paths.append(rec.path)
+    seq = evaluate(paths, "heuristic", workers=1)
+    par = evaluate(paths, "heuristic", workers=2)
+    assert seq.steps == par.steps == 8
+    assert seq.agreed == par.agreed
+    assert sorted(par.trajectories) == sorted(str(p) for p in paths)
+
+
+def test_evaluate_isolates_and_restores_the_profile(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    rec = TrajectoryRecorder(tmp_path / "s.jsonl")
+    rec.record(step_from_decision(_state("Static Screen"), BackAction(), "policy-lite", 1.0, False))
+    live = profile_mod.profile
+    seen: list[Path] = []
+    real = replay_mod.replay
+
+    def _spy(*args: object, **kwargs: object) -> object:
+        seen.append(profile_mod.profile.path)
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(replay_mod, "replay", _spy)
+    evaluate_file(str(rec.path), "heuristic")
+    assert profile_mod.profile is live
+    # the replay ran against a throwaway profile whose directory is gone
+    assert seen and seen[0] != live.path and not seen[0].parent.exists()
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import string
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from app.services.hf import server as server_mod
+from app.services.hf.policy import HFPolicy
+from app.services.hf.server import Generation, InferenceServer, TransformersBackend, trim_json
+from app.state.encoder import GameState
+
+
+def _tiny_model(path: Path) -> Path:
+    """Randomly initialised 2-layer GPT-2 with a character tokenizer: stands in for a real model."""
+    import torch
+    from tokenizers import Regex, Tokenizer, decoders, models, pre_tokenizers
+    from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+    vocab = {"<pad>": 0, "<eos>": 1, "<unk>": 2}
+    for ch in sorted(set(string.printable)):
+        vocab.setdefault(ch, len(vocab))
+    tk = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    tk.pre_tokenizer = pre_tokenizers.Split(Regex("."), behavior="isolated")
+    tk.decoder = decoders.Fuse()
+    tok = PreTrainedTokenizerFast(
+        tokenizer_object=tk, pad_token="<pad>", eos_token="<eos>", unk_token="<unk>"
+    )
+    torch.manual_seed(0)
+    cfg = GPT2Config(
+        vocab_size=len(vocab), n_positions=2048, n_embd=32, n_layer=2, n_head=2,
+        bos_token_id=1, eos_token_id=1, pad_token_id=0,
+    )
+    GPT2LMHeadModel(cfg).save_pretrained(path)
+    tok.save_pretrained(path)
+    return path
+
+
+def test_trim_json_stops_at_closing_brace() -> None:
+    assert trim_json('x {"a": {"b": 1}} trailing}') == 'x {"a": {"b": 1}}'
+    assert trim_json("no json") == "no json"
+
+
+def test_batched_prefix_cached_decoding_matches_plain_greedy(tmp_path: Path) -> None:
+    pytest.importorskip("transformers")
+    import torch
+
+    backend = TransformersBackend(str(_tiny_model(tmp_path / "tiny")))
+    prefix = "Fixed instruction block. "
+    prompts = ["ocr: Hunt", "ocr: a much longer screen text"]
+    far = time.monotonic() + 60.0
+    first = backend.generate(prefix, prompts, max_new_tokens=10, deadline=far)
+    again = backend.generate(prefix, prompts[::-1], max_new_tokens=10, deadline=far)
+    assert backend.prefix_misses == 1 and backend.prefix_hits == 1
+    assert again == first[::-1]
+    for prompt, gen in zip(prompts, first):
+        got = gen.text
+        ids = torch.tensor([backend._encode(prefix + prompt)])
+        ref = backend.model.generate(
+            ids, attention_mask=torch.ones_like(ids), max_new_tokens=10, do_sample=False
+        )
+        text = backend.tokenizer.decode(ref[0, ids.shape[1] :], skip_special_tokens=True)
+        assert got == trim_json(text)
+
+
+class _Recording:
+    def __init__(self, delay_s: float = 0.0) -> None:
+        self.calls: list[tuple[str, list[str]]] = []
+        self.delay_s = delay_s
+
+    def generate(
+        self,
+        prefix: str,
+        prompts: list[str],
+        max_new_tokens: int,
+        deadline: float,
+        grammar: object = None,
+    ) -> list[Generation]:
+        time.sleep(self.delay_s)
+        self.calls.append((prefix, list(prompts)))
+        return [
+            Generation(f'{{"type": "tap", "x": {len(p)}, "y": 1}}', tokens=9, forward_passes=3)
+            for p in prompts
+        ]
+
+
+def test_server_batches_concurrent_requests() -> None:
+    backend = _Recording()
+    srv = InferenceServer(lambda: backend, max_batch=8, batch_window_s=0.2)
+    futures = [srv.submit("P", "x" * i, timeout_s=5.0) for i in range(1, 5)]
+    assert [f.result(timeout=5.0) for f in futures][2] == '{"type": "tap", "x": 3, "y": 1}'
+    assert len(backend.calls) == 1 and backend.calls[0][1] == ["x", "xx", "xxx", "xxxx"]
+    stats = srv.stats()
+    assert stats["mean_batch"] == 4.0
+    # one batched call of 3 passes served four requests
+    assert stats["forward_passes"] == 3.0 and stats["passes_per_request"] == 0.75
+    srv.close()
+
+
+def test_server_drops_requests_past_their_deadline() -> None:
+    backend = _Recording(delay_s=0.3)
+    srv = InferenceServer(lambda: backend, max_batch=1, batch_window_s=0.0)
+    slow = srv.submit("P", "first", timeout_s=5.0)
+    with pytest.raises(TimeoutError):
+        srv.generate("P", "second", timeout_s=0.05)
+    assert slow.result(timeout=5.0)
+    time.sleep(0.1)
+    # the expired request never reached the model
+    assert [c[1] for c in backend.calls] == [["first"]]
+    srv.close()
+
+
+def test_policy_and_judge_share_one_server(monkeypatch: pytest.MonkeyPatch) -> None:
+    from app.config import settings
+    from app.services.hf.judge import HFJudge
+
+    backend = _Recording()
+    monkeypatch.setattr(settings, "hf_model_id_policy", "tiny")
+    monkeypatch.setattr(settings, "hf_model_id_judge", "tiny")
+    monkeypatch.setattr(settings, "hf_cache_enabled", False)
+    monkeypatch.setitem(server_mod._servers, "tiny", InferenceServer(lambda: backend))
+    state = GameState(
+        timestamp_utc="t", stamina_current=None, stamina_cap=None,
+        ocr_text="Arena", ocr_lines=["Arena"], ocr_tokens=["Arena"],
+    )
+    policy, judge = HFPolicy(), HFJudge()
+    results: list[object] = []
+    threads = [threading.Thread(target=lambda: results.append(policy.propose(state)))
+               for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(results) == 3
+    judge._ensure_backend()
+    assert judge._server is policy._server
+    # the shared instruction block travels as the prefix, OCR as the per-request suffix
+    assert backend.calls[0][0] == policy._prompt_prefix()
+    assert all("Arena" in p for _, prompts in backend.calls for p in prompts)
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from app.services.hf.grammar import ActionGrammar, TokenTrie
+from app.services.hf.policy import HFPolicy
+from app.services.hf.server import TransformersBackend
+from tests.test_v224_hf_server import _tiny_model
+
+
+def test_action_grammar_bounds_and_forced_text() -> None:
+    start = ActionGrammar(1280, 720).compile().start()
+    assert start.forced() == '{"type":"'
+    tap = start.advance_text('{"type":"tap","x":128')
+    assert tap is not None and tap.next_chars() == {",", "0"}
+    assert start.advance_text('{"type":"tap","x":1281') is None
+    assert start.advance_text('{"type":"tap","x":01') is None
+    assert start.advance_text('{"type":"wait","seconds":2.1') is None
+    done = start.advance_text('{"type":"swipe","x1":0,"y1":1,"x2":2,"y2":3,"duration_ms":50}')
+    assert done is not None and done.done
+
+
+def test_token_trie_only_offers_grammar_tokens() -> None:
+    trie = TokenTrie.from_vocab({0: "{", 1: '{"', 2: "x", 3: "12", 4: "1", 5: "99999", 6: ","})
+    start = ActionGrammar(100, 100).compile().start()
+    assert set(trie.allowed(start)) == {0, 1}
+    x = start.advance_text('{"type":"tap","x":')
+    assert x is not None
+    assert set(trie.allowed(x)) == {3, 4}
+    ids, st = trie.tokenize_forced(start, start.forced())
+    assert ids[0] == 1 and st.forced() == start.forced()[2:]
+
+
+def test_constrained_generation_always_parses(tmp_path: Path) -> None:
+    pytest.importorskip("transformers")
+    backend = TransformersBackend(str(_tiny_model(tmp_path / "tiny")))
+    grammar = ActionGrammar(1280, 720)
+    prompts = [f"ocr: screen {i}" for i in range(6)]
+    far = time.monotonic() + 60.0
+    free = backend.generate("Act. ", prompts, max_new_tokens=96, deadline=far)
+    gens = backend.generate("Act. ", prompts, max_new_tokens=96, deadline=far, grammar=grammar)
+    policy = HFPolicy()
+    for gen in gens:
+        obj = json.loads(gen.text)
+        assert obj["type"] in {"tap", "swipe", "wait", "back"}
+        _, action = policy._parse_action(gen.text)
+        if obj["type"] == "tap":
+            assert 0 <= action.x <= 1280 and 0 <= action.y <= 720  # type: ignore[union-attr]
+        # keys and punctuation are appended without decoding them token by token
+        assert gen.forward_passes < gen.tokens
+    # the random model never produces valid JSON on its own
+    assert not any(g.text.startswith('{"type"') for g in free)
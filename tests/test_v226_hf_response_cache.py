@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.actions.types import BackAction, TapAction
+from app.services.hf import cache as cache_mod
+from app.services.hf import server as server_mod
+from app.services.hf.cache import ResponseCache, candidates_signature, response_scope
+from app.services.hf.judge import HFJudge
+from app.services.hf.policy import HFPolicy
+from app.services.hf.server import Generation, InferenceServer
+from app.state.encoder import GameState
+from app.state.identity import StateIdentity
+
+
+class _Counting:
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.calls = 0
+
+    def generate(
+        self,
+        prefix: str,
+        prompts: list[str],
+        max_new_tokens: int,
+        deadline: float,
+        grammar: object = None,
+    ) -> list[Generation]:
+        self.calls += len(prompts)
+        return [Generation(self.text, tokens=5) for _ in prompts]
+
+
+def _state(text: str, visual: int = 0xABCD) -> GameState:
+    return GameState(
+        timestamp_utc="t", stamina_current=None, stamina_cap=None,
+        ocr_text=text, ocr_lines=[text], ocr_tokens=text.split(),
+        identity=StateIdentity(visual=visual, text=0x1234),
+    )
+
+
+def test_lru_ttl_and_near_duplicate_lookup() -> None:
+    c = ResponseCache(max_entries=2, ttl_s=60.0)
+    a = StateIdentity(0x0F0F_0F0F_0F0F_0F0F, 0x1111_1111_1111_1111)
+    b = StateIdentity(0xF0F0_F0F0_F0F0_F0F0, 0x2222_2222_2222_2222)
+    d = StateIdentity(0x3333_3333_3333_3333, 0xCCCC_CCCC_CCCC_CCCC)
+    c.put("s", a, "A", cost_s=0.5)
+    c.put("s", b, "B")
+    # one flipped bit is the same screen
+    assert c.get("s", StateIdentity(a.visual ^ 1, a.text)) == "A"
+    assert c.get("other", a) is None
+    c.put("s", d, "D")  # evicts B, the least recently used
+    assert c.get("s", b) is None and c.get("s", d) == "D"
+    st = c.stats()
+    assert st["hits"] == 2 and st["misses"] == 2 and st["model_time_saved_s"] == 0.5
+    expired = ResponseCache(ttl_s=0.01)
+    expired.put("s", a, "A")
+    expired._entries[("s", a.key)].created_ts -= 1.0
+    assert expired.get("s", a) is None and len(expired) == 0
+
+
+def test_persists_across_instances(tmp_path: Path) -> None:
+    path = tmp_path / "cache.json"
+    c = ResponseCache(path=path)
+    c.put("s", StateIdentity(5, 5), "cached")
+    c.save()
+    assert ResponseCache(path=path).get("s", StateIdentity(5, 5)) == "cached"
+
+
+def test_candidate_signature_ignores_scores_and_jitter() -> None:
+    one = [(0.9, TapAction(x=100, y=100), "policy-lite"), (0.1, BackAction(), "explore")]
+    two = [(0.2, TapAction(x=103, y=98), "policy-lite"), (0.7, BackAction(), "explore")]
+    assert candidates_signature(one) == candidates_signature(two)
+    assert candidates_signature(one) != candidates_signature(one[::-1])
+    assert response_scope("m", "v1", "x") != response_scope("m", "v2", "x")
+
+
+def test_repeated_screen_never_hits_the_model_twice(monkeypatch: pytest.MonkeyPatch) -> None:
+    from app.config import settings
+
+    policy_backend = _Counting('{"type":"tap","x":10,"y":20}')
+    judge_backend = _Counting('{"index": 1, "reason": "safer"}')
+    monkeypatch.setattr(settings, "hf_model_id_policy", "cache-policy")
+    monkeypatch.setattr(settings, "hf_model_id_judge", "cache-judge")
+    monkeypatch.setattr(settings, "hf_cache_enabled", True)
+    monkeypatch.setattr(cache_mod, "_cache", ResponseCache(path=None))
+    servers = server_mod._servers
+    monkeypatch.setitem(servers, "cache-policy", InferenceServer(lambda: policy_backend))
+    monkeypatch.setitem(servers, "cache-judge", InferenceServer(lambda: judge_backend))
+
+    policy, judge = HFPolicy(), HFJudge()
+    for _ in range(3):
+        assert policy.propose(_state("Lobby Arena")).action == TapAction(x=10, y=20)
+    assert policy_backend.calls == 1
+    policy.propose(_state("Shop", visual=0xFFFF_0000_FFFF_0000))
+    assert policy_backend.calls == 2
+
+    cands = [(0.5, TapAction(x=10, y=20), "hf-policy"), (0.4, BackAction(), "explore")]
+    assert judge.select(_state("Lobby Arena"), cands) == (1, "safer")
+    assert judge.select(_state("Lobby Arena"), cands) == (1, "safer")
+    assert judge_backend.calls == 1
+    # a different candidate set is a different question
+    judge.select(_state("Lobby Arena"), cands[::-1])
+    assert judge_backend.calls == 2
+    assert cache_mod.get_response_cache().stats()["hits"] == 3
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from app.actions.types import BackAction, TapAction
+from app.agents.speculation import Speculator
+from app.navigation.graph import NavigationGraph
+from app.policy.heuristic import PolicyContext
+from app.state.encoder import GameState
+from app.state.identity import StateIdentity
+
+LOBBY = StateIdentity(visual=0x00000000FFFFFFFF, text=0x1111111111111111)
+BATTLE = StateIdentity(visual=0xFFFFFFFF00000000, text=0x2222222222222222)
+SHOP = StateIdentity(visual=0xF0F0F0F0F0F0F0F0, text=0x8888888888888888)
+TAP = TapAction(x=600, y=450)
+
+
+def _state(ident: StateIdentity, text: str) -> GameState:
+    return GameState(
+        timestamp_utc="t", stamina_current=None, stamina_cap=None,
+        ocr_text=text, ocr_lines=[text], ocr_tokens=text.split(), identity=ident,
+    )
+
+
+def _graph(tmp_path: Path) -> NavigationGraph:
+    g = NavigationGraph(path=tmp_path / "nav.json", tolerance=4)
+    for _ in range(3):
+        g.record_transition(LOBBY, TAP, BATTLE, latency_s=0.5)
+    g.record_transition(LOBBY, TAP, SHOP, latency_s=0.5)
+    return g
+
+
+def test_likely_next_ranks_destinations(tmp_path: Path) -> None:
+    g = _graph(tmp_path)
+    nxt = g.likely_next(LOBBY, TapAction(x=603, y=452), k=2)
+    assert [k for k, _ in nxt] == [BATTLE.key, SHOP.key]
+    assert nxt[0][1] == 0.75
+    assert g.likely_next(LOBBY, TAP, k=2, min_prob=0.5) == [(BATTLE.key, 0.75)]
+
+
+def test_speculated_decision_served_on_predicted_screen(tmp_path: Path) -> None:
+    g = _graph(tmp_path)
+    seen: list[str] = []
+
+    async def decide(state: GameState, ctx: PolicyContext) -> tuple[float, object, str]:
+        assert ctx.speculative
+        seen.append(state.ocr_text)
+        ctx.repeat_count += 1
+        await asyncio.sleep(0.01)
+        return 0.9, BackAction(), f"spec:{state.ocr_text}"
+
+    async def run() -> None:
+        spec = Speculator(tolerance=4)
+        for ident, text in ((BATTLE, "Battle"), (SHOP, "Shop")):
+            spec.observe(_state(ident, text))
+        ctx = PolicyContext()
+        assert spec.start(LOBBY, TAP, ctx, decide, k=2, graph=g) == 2
+        await asyncio.sleep(0.05)
+        near_battle = StateIdentity(visual=BATTLE.visual ^ 0b11, text=BATTLE.text)
+        got = await spec.take(near_battle)
+        assert got is not None
+        (score, action, who), fork = got
+        assert who == "spec:Battle" and action == BackAction()
+        # speculation ran on a fork: the live context is untouched until the fork is adopted
+        assert fork.repeat_count == 1 and ctx.repeat_count == 0
+        assert not fork.speculative
+        assert sorted(seen) == ["Battle", "Shop"]
+
+        # Unpredicted screen: nothing served, in-flight work cancelled
+        spec.start(LOBBY, TAP, ctx, decide, k=1, graph=g, skip=lambda i: False)
+        assert await spec.take(LOBBY) is None
+        # Screens already answered by the decision cache are not speculated on
+        assert spec.start(LOBBY, TAP, ctx, decide, k=2, graph=g, skip=lambda i: True) == 0
+        st = spec.stats()
+        assert st["hits"] == 1 and st["misses"] == 1 and st["saved_ms"] > 0
+
+    asyncio.run(run())
+
+
+def test_speculative_orchestrate_has_no_side_effects(monkeypatch: pytest.MonkeyPatch) -> None:
+    from app.agents import orchestrator
+    from app.policy import heuristic
+
+    effects: list[str] = []
+
+    class _Store:
+        def search(self, query: str, k: int, namespaces: object = None) -> list[object]:
+            return []
+
+    class _Worker:
+        def enqueue(self, topic: str, urls: list[str], source: str = "") -> bool:
+            effects.append(f"enqueue:{topic}")
+            return True
+
+    async def publish_step(name: str, data: object) -> None:
+        effects.append(name)
+
+    monkeypatch.setattr(orchestrator, "get_memory_store", lambda: _Store())
+    monkeypatch.setattr(orchestrator, "get_knowledge_worker", lambda: _Worker())
+    monkeypatch.setattr(orchestrator.bus, "publish_step", publish_step)
+    monkeypatch.setattr(heuristic, "set_mode_locked", lambda *a: effects.append("profile"))
+    monkeypatch.setattr(heuristic, "reset_daily_if_new_day", lambda: effects.append("profile"))
+    state = _state(BATTLE, "Rookie Arena unlock after chapter 2")
+
+    live = PolicyContext()
+    asyncio.run(orchestrator.orchestrate(state, live.fork(speculative=True)))
+    assert effects == []
+    asyncio.run(orchestrator.orchestrate(state, live))
+    assert "profile" in effects and "memory:search" in effects and "knowledge:queued" in effects
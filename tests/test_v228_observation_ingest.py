@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.memory.observations import ObservationIngestor, content_hash
+
+
+def _bag_of_words(texts: list[str]) -> np.ndarray:
+    vocab = ["battle", "arena", "shop", "energy", "start", "ready", "gold", "hunt"]
+    out = np.zeros((len(texts), len(vocab)), dtype="float32")
+    for i, t in enumerate(texts):
+        for j, w in enumerate(vocab):
+            out[i, j] = t.lower().count(w)
+    return out / np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-6)
+
+
+def _rows(db: Path) -> list[tuple]:
+    with sqlite3.connect(db) as conn:
+        return conn.execute(
+            "SELECT kind, title, hits FROM observations ORDER BY id"
+        ).fetchall()
+
+
+def _ingestor(db: Path, **kw) -> ObservationIngestor:
+    kw.setdefault("near_dup", 0.0)
+    return ObservationIngestor(db_path=str(db), flush_s=60.0, **kw)
+
+
+def test_content_hash_masks_digits() -> None:
+    assert content_hash("ocr", "Energy 12/80  Ready") == content_hash("ocr", "energy 7/80 ready")
+    assert content_hash("ocr", "Battle") != content_hash("ui", "Battle")
+
+
+def test_repeats_coalesce_into_one_row(tmp_path: Path) -> None:
+    db = tmp_path / "mem.sqlite3"
+    ing = _ingestor(db)
+    for i in range(50):
+        ing.submit("ocr", "obs:ocr", f"Lobby energy {i}/80")
+    ing.submit("ui", "ui:button:Battle", "Battle at x=10,y=20,w=5,h=5")
+    assert ing.flush() == 2
+    for i in range(10):
+        ing.submit("ocr", "obs:ocr", f"Lobby energy {i}/80")
+    ing.close()
+    rows = _rows(db)
+    assert rows == [("ocr", "obs:ocr", 60), ("ui", "ui:button:Battle", 1)]
+    st = ing.stats()
+    assert st["submitted"] == 61 and st["written"] == 3 and st["pending"] == 0
+
+
+def test_near_duplicates_fold_into_stored_row(tmp_path: Path) -> None:
+    db = tmp_path / "mem.sqlite3"
+    ing = _ingestor(db, near_dup=0.95, embed=_bag_of_words)
+    ing.submit("ocr", "obs:ocr", "Battle start ready")
+    ing.flush()
+    # different text (new hash) but the same embedding
+    ing.submit("ocr", "obs:ocr", "battle -- START! ready?")
+    ing.submit("ocr", "obs:ocr", "Arena shop gold")
+    ing.flush()
+    # later exact repeat of the folded text goes straight to the canonical row
+    ing.submit("ocr", "obs:ocr", "battle -- START! ready?")
+    ing.close()
+    assert [h for _, _, h in _rows(db)] == [3, 1]
+    assert ing.stats()["near_duplicates"] == 1
+
+
+def test_row_cap_and_retention(tmp_path: Path) -> None:
+    db = tmp_path / "mem.sqlite3"
+    ing = _ingestor(db, max_rows=5, retention_days=7)
+    with sqlite3.connect(db) as conn:
+        conn.execute(
+            "INSERT INTO observations (day, kind, title, summary, content_hash, first_ts,"
+            " last_ts) VALUES ('2000-01-01', 'ocr', 'old', 'old', 'h', 0, 0)"
+        )
+    for word in ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]:
+        ing.submit("ui", f"ui:button:{word}", word)
+        time.sleep(0.001)
+    ing.close()
+    titles = [t for _, t, _ in _rows(db)]
+    assert len(titles) == 5 and "old" not in titles
+    assert ing.stats()["pruned"] == 4
+
+
+def test_background_flusher_writes_full_batches(tmp_path: Path) -> None:
+    db = tmp_path / "mem.sqlite3"
+    ing = _ingestor(db, batch_size=3)
+    for word in ["alpha", "beta", "gamma"]:
+        ing.submit("ui", word, word)
+    deadline = time.time() + 5.0
+    while ing.stats()["written"] < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(_rows(db)) == 3
+    ing.close()
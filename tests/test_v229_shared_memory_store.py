@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.memory import store as store_mod
+from app.memory.store import Fact, MemoryStore, get_memory_store
+
+WORDS = ["arena", "battle", "shop", "summon", "hunt", "energy", "gold", "guide"]
+
+
+class _FakeEmbedder:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def encode(self, texts: list[str], normalize_embeddings: bool = True) -> np.ndarray:
+        with self._lock:
+            self.calls += 1
+            self.texts += len(texts)
+        out = np.zeros((len(texts), 384), dtype="float32")
+        for i, t in enumerate(texts):
+            for j, w in enumerate(WORDS):
+                out[i, j] = t.lower().count(w)
+            out[i, 383] = 0.01
+        return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+
+@pytest.fixture()
+def embedder(monkeypatch: pytest.MonkeyPatch) -> _FakeEmbedder:
+    fake = _FakeEmbedder()
+    monkeypatch.setattr(store_mod, "_embedder", fake)
+    return fake
+
+
+def _facts(*words: str) -> list[Fact]:
+    return [Fact(id=None, title=w, source_url="local:test", summary=f"{w} tips") for w in words]
+
+
+def test_get_memory_store_is_process_wide(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setattr(store_mod, "_store", None)
+    monkeypatch.setattr(store_mod.settings, "db_path", str(tmp_path / "app.sqlite3"))
+    assert get_memory_store() is get_memory_store()
+
+
+def test_concurrent_first_searches_build_index_once(
+    embedder: _FakeEmbedder, tmp_path: Path
+) -> None:
+    ms = MemoryStore(db_path=str(tmp_path / "app.sqlite3"))
+    ms.add_facts(_facts("arena", "battle", "shop"))
+    embedder.calls = embedder.texts = 0
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: ms.search(f"arena {i}", 1, mode="vector"), range(16)))
+    assert all(r[0].title == "arena" for r in results)
+    # facts were embedded when added; the searches only embed their query
+    assert embedder.texts == 16
+
+
+def test_writes_during_reads_stay_consistent(embedder: _FakeEmbedder, tmp_path: Path) -> None:
+    ms = MemoryStore(db_path=str(tmp_path / "app.sqlite3"))
+    ms.warm()
+    errors: list[BaseException] = []
+
+    def writer() -> None:
+        for w in WORDS:
+            ms.add_facts(_facts(w))
+
+    def reader() -> None:
+        try:
+            for _ in range(50):
+                for f in ms.search("battle", 3):
+                    assert f.title in WORDS
+        except BaseException as e:  # pragma: no cover - surfaced below
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert [f.title for f in ms.search("guide", 1)] == ["guide"]
+    assert ms.search("summon", 1)[0].title == "summon"
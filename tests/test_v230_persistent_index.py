@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from app.memory import store as store_mod
+from app.memory.store import Fact, MemoryStore
+from tests.test_v229_shared_memory_store import _FakeEmbedder, _facts
+
+
+@pytest.fixture()
+def embedder(monkeypatch: pytest.MonkeyPatch) -> _FakeEmbedder:
+    fake = _FakeEmbedder()
+    monkeypatch.setattr(store_mod, "_embedder", fake)
+    return fake
+
+
+def test_restart_loads_snapshot_without_reembedding(
+    embedder: _FakeEmbedder, tmp_path: Path
+) -> None:
+    db = str(tmp_path / "app.sqlite3")
+    ms = MemoryStore(db_path=db)
+    ms.add_facts(_facts("arena", "battle", "shop"))
+    ms.warm()
+    ms.close()
+    assert (tmp_path / "app.web.faiss").exists()
+
+    # rows added by another process after the snapshot
+    MemoryStore(db_path=db).add_facts(_facts("summon"))
+    embedder.texts = 0
+    ms2 = MemoryStore(db_path=db)
+    ms2.warm()
+    assert embedder.texts == 0
+    assert ms2.search("summon", 1)[0].title == "summon"
+    assert ms2.search("battle", 1)[0].title == "battle"
+    # catch-up was snapshotted: a third start covers all four rows from disk
+    snap = MemoryStore(db_path=db)._load_snapshot()
+    assert snap is not None and sorted(snap.ids().tolist()) == [1, 2, 3, 4]
+
+
+def test_rows_without_embeddings_are_backfilled_once(
+    embedder: _FakeEmbedder, tmp_path: Path
+) -> None:
+    db = str(tmp_path / "app.sqlite3")
+    MemoryStore(db_path=db)
+    with sqlite3.connect(db) as conn:
+        conn.executemany(
+            "INSERT INTO facts (title, source_url, summary) VALUES (?, ?, ?)",
+            [("hunt", "legacy", "hunt tips"), ("gold", "legacy", "gold tips")],
+        )
+    embedder.texts = 0
+    ms = MemoryStore(db_path=db)
+    assert ms.search("gold", 1, mode="vector")[0].title == "gold"
+    assert embedder.texts == 2 + 1
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM facts WHERE embedding IS NULL").fetchone()[0] == 0
+
+
+def test_stale_snapshot_is_rebuilt_from_stored_vectors(
+    embedder: _FakeEmbedder, tmp_path: Path
+) -> None:
+    db = str(tmp_path / "app.sqlite3")
+    ms = MemoryStore(db_path=db)
+    ms.add_facts(_facts("arena", "battle"))
+    ms.warm()
+    ms.close()
+    with sqlite3.connect(db) as conn:
+        conn.execute("DELETE FROM facts WHERE title = 'arena'")
+    embedder.texts = 0
+    ms2 = MemoryStore(db_path=db)
+    assert [f.title for f in ms2.search("arena", 2)] == ["battle"]
+    assert embedder.texts == 1
+
+
+def test_model_change_drops_stored_vectors(
+    embedder: _FakeEmbedder, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    db = str(tmp_path / "app.sqlite3")
+    ms = MemoryStore(db_path=db)
+    ms.add_facts([Fact(id=None, title="guide", source_url="x", summary="guide tips")])
+    ms.warm()
+    ms.close()
+    monkeypatch.setattr(store_mod.settings, "embedding_model_id", "other/model")
+    MemoryStore(db_path=db)
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("SELECT embedding FROM facts").fetchone()[0] is None
+    assert not (tmp_path / "app.web.faiss").exists()
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.memory import store as store_mod
+from app.memory.index import VectorIndex, benchmark, synthetic_corpus
+from app.memory.store import MemoryStore
+from tests.test_v229_shared_memory_store import _FakeEmbedder, _facts
+
+DIM = 32
+
+
+def _corpus(n: int) -> tuple[np.ndarray, np.ndarray]:
+    return np.arange(100, 100 + n, dtype="int64"), synthetic_corpus(n, DIM, clusters=16)
+
+
+def test_results_are_keyed_by_id_and_survive_deletes() -> None:
+    ids, vecs = _corpus(50)
+    idx = VectorIndex(DIM, kind="flat")
+    idx.add(ids, vecs)
+    _, got = idx.search(vecs[7], 1)
+    assert got[0, 0] == 107
+    assert idx.remove([107, 999]) == 1
+    _, got = idx.search(vecs[7], 3)
+    assert 107 not in got[0] and len(idx) == 49
+    # neighbours keep their ids after the delete shifted internal positions
+    _, got = idx.search(vecs[30], 1)
+    assert got[0, 0] == 130
+
+
+def test_auto_promotes_flat_to_hnsw_past_threshold() -> None:
+    ids, vecs = _corpus(120)
+    idx = VectorIndex(DIM, kind="auto", promote_at=100, ivf_at=10**9)
+    idx.add(ids[:99], vecs[:99])
+    assert idx.kind == "flat" and idx.promotion() is None
+    idx.add(ids[99:], vecs[99:])
+    # add never rebuilds; the owner of the vectors does
+    assert idx.kind == "flat" and idx.promotion() == "hnsw"
+    idx.load(ids, vecs, idx.promotion())
+    assert idx.kind == "hnsw" and idx.promotions == 1 and len(idx) == 120
+    _, got = idx.search(vecs[5], 1)
+    assert got[0, 0] == 105
+    # shrinking below the threshold never demotes
+    idx.remove(ids[:30])
+    assert idx.promotion() is None and idx.kind == "hnsw"
+
+
+def test_ivfpq_below_threshold_keeps_taking_adds() -> None:
+    ids, vecs = _corpus(10_000)
+    idx = VectorIndex(DIM, kind="auto", promote_at=100, ivf_at=10_000)
+    idx.load(ids, vecs)
+    assert idx.kind == "ivfpq"
+    idx.remove(ids[:3])
+    idx.add(ids[:1], vecs[:1])
+    assert idx.kind == "ivfpq" and len(idx) == 9_998 and idx.promotion() is None
+    _, got = idx.search(vecs[0], 1, exact=lambda i: vecs[i - 100])
+    assert got[0, 0] == 100
+
+
+def test_hnsw_deletes_are_tombstoned_then_compacted() -> None:
+    ids, vecs = _corpus(100)
+    idx = VectorIndex(DIM, kind="hnsw")
+    idx.add(ids, vecs)
+    idx.remove([110, 111])
+    _, got = idx.search(vecs[10], 5)
+    assert 110 not in got[0] and (got[0] >= 0).all()
+    assert len(idx) == 98
+    idx.remove(list(range(120, 145)))
+    # past a fifth of the index the tombstones are compacted away
+    assert not idx._tombstones and idx._index.ntotal == 73
+    # re-adding a deleted id brings it back exactly once
+    idx.add([110], vecs[10:11])
+    _, got = idx.search(vecs[10], 3)
+    assert list(got[0]).count(110) == 1
+
+
+def test_serialize_round_trip_keeps_ids() -> None:
+    ids, vecs = _corpus(64)
+    idx = VectorIndex(DIM, kind="hnsw")
+    idx.add(ids, vecs)
+    idx.remove([100])
+    back = VectorIndex.deserialize(idx.serialize())
+    assert back.kind == "hnsw" and sorted(back.ids().tolist()) == list(range(101, 164))
+
+
+def test_store_delete_and_snapshot_drop_stale_ids(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setattr(store_mod, "_embedder", _FakeEmbedder())
+    db = str(tmp_path / "app.sqlite3")
+    ms = MemoryStore(db_path=db)
+    ids = ms.add_facts(_facts("arena", "battle", "shop"))
+    ms.warm()
+    ms.close()
+    assert ms.delete_facts([ids[0]]) == 1
+    assert "arena" not in [f.title for f in ms.search("arena", 3)]
+    # a stale snapshot (still holding the deleted id) is reconciled on load
+    ms2 = MemoryStore(db_path=db)
+    ms2.warm()
+    assert "arena" not in [f.title for f in ms2.search("arena", 3)]
+    assert ms2.index_stats()["size"] == 2.0
+
+
+def test_store_promotes_in_the_background_from_stored_embeddings(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    embedder = _FakeEmbedder()
+    monkeypatch.setattr(store_mod, "_embedder", embedder)
+    monkeypatch.setattr(store_mod.settings, "memory_index_promote_at", 4)
+    ms = MemoryStore(db_path=str(tmp_path / "app.sqlite3"))
+    ms.add_facts(_facts("arena", "battle", "shop"))
+    ms.warm()
+    assert ms.index_stats()["web_kind"] == "flat"
+    encoded = ms.encoded
+    ms.add_facts(_facts("summon", "hunt"))
+    assert ms.join_promotions()
+    stats = ms.index_stats()
+    assert stats["web_kind"] == "hnsw" and stats["promotions"] == 1.0 and stats["size"] == 5.0
+    # rebuilt from the embeddings stored with the rows, not re-encoded
+    assert ms.encoded == encoded + 2
+    assert ms.search("hunt", 1, mode="vector")[0].title == "hunt"
+
+
+def test_pinned_ivfpq_starts_as_hnsw_until_it_can_train(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    ids, vecs = _corpus(10_000)
+    idx = VectorIndex(DIM, kind="ivfpq")
+    assert idx.kind == "hnsw"
+    idx.add(ids[:50], vecs[:50])
+    assert idx.promotion() is None
+    idx.load(ids, vecs, "hnsw")
+    assert idx.promotion() == "ivfpq"
+    # a new namespace in a warmed, empty store takes adds and serves them
+    monkeypatch.setattr(store_mod, "_embedder", _FakeEmbedder())
+    monkeypatch.setattr(store_mod.settings, "memory_index_kind", "ivfpq")
+    ms = MemoryStore(db_path=str(tmp_path / "app.sqlite3"))
+    ms.warm()
+    ms.add_facts(_facts("arena", "battle"))
+    assert ms.index_stats()["web_kind"] == "hnsw"
+    assert ms.search("battle", 1, mode="vector")[0].title == "battle"
+
+
+def test_failed_incremental_add_rebuilds_from_rows(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setattr(store_mod, "_embedder", _FakeEmbedder())
+    ms = MemoryStore(db_path=str(tmp_path / "app.sqlite3"))
+    ms.add_facts(_facts("arena"))
+    ms.warm()
+
+    def _fail(self: VectorIndex, ids: object, vecs: object) -> None:
+        raise RuntimeError("add failed")
+
+    with monkeypatch.context() as m:
+        m.setattr(VectorIndex, "add", _fail)
+        ms.add_facts(_facts("battle"))
+    assert ms.search("battle", 1, mode="vector")[0].title == "battle"
+    assert ms.index_stats()["size"] == 2.0
+
+
+def test_benchmark_reports_recall_and_latency() -> None:
+    out = benchmark([500], kinds=("flat", "hnsw"), dim=DIM, queries=20, k=5)
+    by_kind = {r.kind: r for r in out}
+    assert by_kind["flat"].recall_at_k == 1.0
+    assert by_kind["hnsw"].recall_at_k > 0.9
+    assert all(r.p95_ms >= r.p50_ms >= 0 for r in out)
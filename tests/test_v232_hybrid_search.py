@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from app.memory import store as store_mod
+from app.memory.store import Fact, MemoryStore
+from tests.test_v229_shared_memory_store import _FakeEmbedder
+
+
+@pytest.fixture()
+def embedder(monkeypatch: pytest.MonkeyPatch) -> _FakeEmbedder:
+    fake = _FakeEmbedder()
+    monkeypatch.setattr(store_mod, "_embedder", fake)
+    return fake
+
+
+def _store(tmp_path: Path) -> MemoryStore:
+    ms = MemoryStore(db_path=str(tmp_path / "app.sqlite3"))
+    ms.add_facts(
+        [
+            Fact(None, "Arena guide", "web", "Climb the arena ladder with a defensive team"),
+            Fact(None, "Shop refresh", "web", "Refresh the secret shop for covenant bookmarks"),
+            Fact(None, "Summon rates", "web", "Summon rates and pity in the covenant banner"),
+            Fact(None, "Hunt basics", "web", "Wyvern hunt teams and energy costs"),
+        ]
+    )
+    return ms
+
+
+def test_lexical_search_uses_bm25_without_embedder(
+    embedder: _FakeEmbedder, tmp_path: Path
+) -> None:
+    ms = _store(tmp_path)
+    embedder.calls = 0
+    titles = [f.title for f in ms.search("Arena Shop Summon", 3)]
+    assert set(titles) == {"Arena guide", "Shop refresh", "Summon rates"}
+    assert embedder.calls == 0 and ms.searches["lexical"] == 1
+    # title matches outrank body-only matches
+    assert ms.search("covenant shop", 1, mode="lexical")[0].title == "Shop refresh"
+
+
+def test_hybrid_fuses_vector_results_when_lexical_is_thin(
+    embedder: _FakeEmbedder, tmp_path: Path
+) -> None:
+    ms = _store(tmp_path)
+    embedder.calls = 0
+    # "battle" is in no fact text, only the vector side can rank "energy"/"hunt" facts
+    titles = [f.title for f in ms.search("battle energy", 2)]
+    assert titles[0] == "Hunt basics"
+    assert embedder.calls == 1 and ms.searches["hybrid"] == 1
+
+
+def test_fts_mirror_tracks_inserts_updates_and_deletes(
+    embedder: _FakeEmbedder, tmp_path: Path
+) -> None:
+    ms = _store(tmp_path)
+    with sqlite3.connect(ms.db_path) as conn:
+        conn.execute("UPDATE facts SET title = 'Sanctuary' WHERE title = 'Hunt basics'")
+    assert [f.title for f in ms.search("sanctuary", 1, mode="lexical")] == ["Sanctuary"]
+    ms.delete_facts([ms.search("sanctuary", 1, mode="lexical")[0].id or 0])
+    assert ms.search("sanctuary", 1, mode="lexical") == []
+    # queries containing FTS syntax are treated as plain words
+    assert ms.search('arena" OR NEAR(', 1, mode="lexical")[0].title == "Arena guide"
+
+
+def test_existing_facts_are_indexed_when_mirror_is_created(tmp_path: Path) -> None:
+    db = tmp_path / "app.sqlite3"
+    with sqlite3.connect(db) as conn:
+        conn.execute(
+            "CREATE TABLE facts (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL,"
+            " source_url TEXT NOT NULL, summary TEXT NOT NULL)"
+        )
+        conn.execute("INSERT INTO facts (title, source_url, summary) VALUES ('Labyrinth', 'x', 'y')")
+    ms = MemoryStore(db_path=str(db))
+    assert [f.title for f in ms.search("labyrinth", 1, mode="lexical")] == ["Labyrinth"]
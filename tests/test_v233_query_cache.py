@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.memory import store as store_mod
+from app.memory.store import Fact, MemoryStore
+from tests.test_v229_shared_memory_store import _FakeEmbedder
+
+
+@pytest.fixture()
+def ms(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> MemoryStore:
+    monkeypatch.setattr(store_mod, "_embedder", _FakeEmbedder())
+    store = MemoryStore(db_path=str(tmp_path / "app.sqlite3"))
+    store.add_facts(
+        [
+            Fact(None, w, "web", f"{w} tips")
+            for w in ["arena", "battle", "shop", "summon", "hunt", "energy", "gold", "guide"]
+        ]
+    )
+    store.warm()
+    return store
+
+
+def test_repeated_queries_reuse_the_embedding(ms: MemoryStore) -> None:
+    fake = store_mod._embedder
+    fake.calls = 0  # type: ignore[union-attr]
+    for q in ["Arena  Battle", "arena battle", "ARENA, battle!"]:
+        assert ms.search(q, 1, mode="vector")[0].title in {"arena", "battle"}
+    assert fake.calls == 1  # type: ignore[union-attr]
+    assert (ms.query_cache_hits, ms.query_cache_misses) == (2, 1)
+
+
+def test_search_many_batches_encode_and_matches_search(ms: MemoryStore) -> None:
+    fake = store_mod._embedder
+    queries = ["arena", "gold", "summon", "arena"]
+    fake.calls = fake.texts = 0  # type: ignore[union-attr]
+    many = ms.search_many(queries, 2, mode="vector")
+    assert fake.calls == 1 and fake.texts == 3  # type: ignore[union-attr]
+    assert [r[0].title for r in many] == ["arena", "gold", "summon", "arena"]
+    assert [[f.id for f in r] for r in many] == [
+        [f.id for f in ms.search(q, 2, mode="vector")] for q in queries
+    ]
+    # hybrid mixes lexical shortcuts and fused results in one call
+    mixed = ms.search_many(["guide", "shop energy battle arena gold"], 1)
+    assert mixed[0][0].title == "guide" and len(mixed[1]) == 1
+
+
+def test_cached_lookups_never_reach_the_encoder(ms: MemoryStore) -> None:
+    # Latency of cached lookups is measured by ``python -m app.cli query-bench``
+    fake = store_mod._embedder
+    first = ms.search("energy hunt", 3, mode="vector")
+    fake.calls = 0  # type: ignore[union-attr]
+    hits = ms.query_cache_hits
+    for _ in range(50):
+        assert ms.search("energy hunt", 3, mode="vector") == first
+    assert fake.calls == 0  # type: ignore[union-attr]
+    assert ms.query_cache_hits == hits + 50
+
+
+def test_query_cache_is_bounded(ms: MemoryStore) -> None:
+    ms._query_cache_size = 3
+    ms.search_many([f"q{i}" for i in range(6)], 1, mode="vector")
+    assert list(ms._query_cache) == ["q3", "q4", "q5"]
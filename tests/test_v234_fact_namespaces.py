@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from pathlib import Path
+
+import pytest
+
+from app.memory import store as store_mod
+from app.memory.knowledge import fact_meta
+from app.memory.store import KNOWLEDGE_NAMESPACES, NS_OBS, NS_UI, Fact, MemoryStore
+from tests.test_v229_shared_memory_store import _FakeEmbedder
+
+
+@pytest.fixture()
+def embedder(monkeypatch: pytest.MonkeyPatch) -> _FakeEmbedder:
+    fake = _FakeEmbedder()
+    monkeypatch.setattr(store_mod, "_embedder", fake)
+    return fake
+
+
+def _store(tmp_path: Path) -> MemoryStore:
+    ms = MemoryStore(db_path=str(tmp_path / "app.sqlite3"))
+    ms.add_facts(
+        [
+            Fact(None, "Arena guide", "web", "arena battle tips"),
+            Fact(None, "ui:button:Arena", "ui", "arena battle button", namespace=NS_UI),
+            Fact(None, "obs:ocr", "ocr", "arena battle screen", namespace=NS_OBS),
+        ]
+    )
+    return ms
+
+
+@pytest.mark.parametrize("mode", ["lexical", "vector", "hybrid"])
+def test_namespace_filter_applies_to_every_mode(
+    embedder: _FakeEmbedder, tmp_path: Path, mode: str
+) -> None:
+    ms = _store(tmp_path)
+    assert {f.title for f in ms.search("arena battle", 5, mode=mode)} == {
+        "Arena guide",
+        "ui:button:Arena",
+        "obs:ocr",
+    }
+    found = ms.search("arena battle", 5, mode=mode, namespaces=KNOWLEDGE_NAMESPACES)
+    assert [f.title for f in found] == ["Arena guide"]
+    assert {f.namespace for f in found} == {"web"}
+    if mode != "lexical":
+        assert ms.index_stats()["obs_size"] == 1.0
+
+
+def test_web_facts_expire_and_are_purged(
+    embedder: _FakeEmbedder, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(store_mod.settings, "memory_web_ttl_days", 1.0)
+    ms = _store(tmp_path)
+    old = time.time() - 2 * 86400
+    ms.add_facts([Fact(None, "Old arena", "web", "arena battle meta", created_at=old)])
+    ui = ms.search("arena", 5, mode="lexical", namespaces=[NS_UI])[0]
+    assert ui.expires_at is None and ui.created_at is not None
+    titles = {
+        f.title for mode in ("lexical", "vector") for f in ms.search("arena battle", 5, mode=mode)
+    }
+    assert "Old arena" not in titles and "Arena guide" in titles
+    assert ms.purge_expired() == 1
+    assert ms.purge_expired(now=time.time() + 2 * 86400) == 1
+    assert {f.title for f in ms.search("arena battle", 5, mode="vector")} == {
+        "ui:button:Arena",
+        "obs:ocr",
+    }
+
+
+def test_meta_round_trips_and_feeds_orchestrator_labels(
+    embedder: _FakeEmbedder, tmp_path: Path
+) -> None:
+    ms = MemoryStore(db_path=str(tmp_path / "app.sqlite3"))
+    meta = fact_meta("Arena", "arena is locked until you unlock after chapter 3")
+    assert meta == {"labels": ["arena"], "locked": True}
+    ms.add_facts([Fact(None, "Arena", "web", "arena is locked", meta=meta)])
+    assert ms.search("arena", 1, mode="lexical")[0].meta == meta
+
+
+def test_legacy_table_is_migrated_into_namespaces(
+    embedder: _FakeEmbedder, tmp_path: Path
+) -> None:
+    db = str(tmp_path / "app.sqlite3")
+    with sqlite3.connect(db) as conn:
+        conn.execute(
+            "CREATE TABLE facts (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL,"
+            " source_url TEXT NOT NULL, summary TEXT NOT NULL)"
+        )
+        conn.executemany(
+            "INSERT INTO facts (title, source_url, summary) VALUES (?, ?, ?)",
+            [
+                ("obs:ocr", "ocr", "arena"),
+                ("ui:button:Shop", "ui", "shop"),
+                ("Guide", "u", "arena"),
+            ],
+        )
+    (tmp_path / "app.faiss").write_bytes(b"stale")
+    before = time.time()
+    ms = MemoryStore(db_path=db)
+    with sqlite3.connect(db) as conn:
+        rows = {
+            r[0]: r[1:]
+            for r in conn.execute("SELECT title, namespace, created_at, expires_at FROM facts")
+        }
+        indexes = {r[1] for r in conn.execute("PRAGMA index_list(facts)").fetchall()}
+    assert {t: r[0] for t, r in rows.items()} == {
+        "obs:ocr": "obs",
+        "ui:button:Shop": "ui",
+        "Guide": "web",
+    }
+    # legacy rows are timestamped on migration; web rows get the usual TTL from then on
+    assert all(r[1] >= before for r in rows.values())
+    assert rows["obs:ocr"][2] is None and rows["ui:button:Shop"][2] is None
+    ttl_s = store_mod.settings.memory_web_ttl_days * 86400.0
+    assert rows["Guide"][2] == pytest.approx(rows["Guide"][1] + ttl_s)
+    assert {"idx_facts_namespace_created", "idx_facts_expires"} <= indexes
+    assert not (tmp_path / "app.faiss").exists()
+    assert [f.title for f in ms.search("arena", 5, mode="vector", namespaces=["web"])] == ["Guide"]
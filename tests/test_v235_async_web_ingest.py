@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from app.services.search.web_ingest import TokenBucket, WebIngestor
+
+_ROBOTS = "User-agent: *\nDisallow: /private\n"
+
+
+class _Stub(BaseHTTPRequestHandler):
+    hits: dict[str, int] = {}
+    conditional: list[str] = []
+    inflight = 0
+    max_inflight = 0
+    lock = threading.Lock()
+
+    def do_GET(self) -> None:  # noqa: N802
+        cls = type(self)
+        with cls.lock:
+            cls.hits[self.path] = cls.hits.get(self.path, 0) + 1
+            cls.inflight += 1
+            cls.max_inflight = max(cls.max_inflight, cls.inflight)
+        try:
+            if self.path == "/robots.txt":
+                self._send(200, _ROBOTS, "text/plain")
+                return
+            if self.path.startswith("/slow"):
+                time.sleep(0.1)
+            etag = f'"{self.path}-v1"'
+            if self.headers.get("If-None-Match") == etag:
+                cls.conditional.append(self.path)
+                self._send(304, "", "text/html", etag)
+                return
+            html = f"<html><title>Page {self.path}</title><p>arena tips for {self.path}</p></html>"
+            self._send(200, html, "text/html", etag)
+        finally:
+            with cls.lock:
+                cls.inflight -= 1
+
+    def _send(self, code: int, body: str, ctype: str, etag: str | None = None) -> None:
+        data = body.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        if code != 304:
+            self.wfile.write(data)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture()
+def server() -> Iterator[str]:
+    _Stub.hits, _Stub.conditional = {}, []
+    _Stub.inflight = _Stub.max_inflight = 0
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Stub)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _ingestor(tmp_path: Path, **kw: object) -> WebIngestor:
+    opts: dict[str, object] = {
+        "max_concurrency": 4,
+        "host_rate": 1000.0,
+        "host_burst": 50.0,
+        "cache_dir": str(tmp_path / "web"),
+        "cache_ttl_s": 3600.0,
+        "respect_robots": True,
+    }
+    opts.update(kw)
+    return WebIngestor(**opts)  # type: ignore[arg-type]
+
+
+def _run(ingestor: WebIngestor, urls: list[str]) -> list:
+    async def go() -> list:
+        try:
+            return await ingestor.fetch_many(urls)
+        finally:
+            await ingestor.aclose()
+
+    return asyncio.run(go())
+
+
+def test_fetch_many_parses_pages_and_honours_robots(server: str, tmp_path: Path) -> None:
+    ing = _ingestor(tmp_path)
+    docs = _run(ing, [f"{server}/a", f"{server}/private/x", f"{server}/b"])
+    assert [d.title for d in docs] == ["Page /a", "Page /b"]
+    assert docs[0].text == "arena tips for /a"
+    assert "/private/x" not in _Stub.hits and _Stub.hits["/robots.txt"] == 1
+    assert ing.stats()["robots_blocked"] == 1.0
+
+
+def test_disk_cache_serves_fresh_pages_and_revalidates_stale_ones(
+    server: str, tmp_path: Path
+) -> None:
+    _run(_ingestor(tmp_path), [f"{server}/a"])
+    fresh = _ingestor(tmp_path)
+    assert _run(fresh, [f"{server}/a"])[0].title == "Page /a"
+    assert _Stub.hits["/a"] == 1 and fresh.stats()["cache_hits"] == 1.0
+    stale = _ingestor(tmp_path, cache_ttl_s=0.0)
+    assert _run(stale, [f"{server}/a"])[0].title == "Page /a"
+    assert _Stub.conditional == ["/a"] and stale.stats()["revalidated"] == 1.0
+
+
+def test_concurrency_is_bounded(server: str, tmp_path: Path) -> None:
+    ing = _ingestor(tmp_path, max_concurrency=2, respect_robots=False, cache_dir="")
+    start = time.perf_counter()
+    docs = _run(ing, [f"{server}/slow{i}" for i in range(6)])
+    assert len(docs) == 6 and _Stub.max_inflight <= 2
+    # Three waves of two 0.1 s requests, not six in a row
+    assert 0.28 <= time.perf_counter() - start < 0.6
+
+
+def test_token_bucket_spaces_requests_after_the_burst() -> None:
+    async def go() -> float:
+        bucket = TokenBucket(rate=50.0, burst=2.0)
+        start = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # Two from the burst, then three at 20 ms each
+    assert asyncio.run(go()) >= 0.055
+
+
+def test_errors_are_skipped(tmp_path: Path) -> None:
+    ing = _ingestor(tmp_path, respect_robots=False, timeout_s=0.5)
+    assert _run(ing, ["http://127.0.0.1:9/none"]) == []
+    assert ing.stats()["errors"] == 1.0
+
+
+def test_rebinding_to_a_new_loop_closes_the_old_client(server: str, tmp_path: Path) -> None:
+    ing = _ingestor(tmp_path, cache_dir="")
+    asyncio.run(ing.fetch_many([f"{server}/a"]))
+    first = ing._client
+    # the first loop is gone and nobody called aclose: the next loop closes its client
+    docs = _run(ing, [f"{server}/b"])
+    assert [d.title for d in docs] == ["Page /b"]
+    assert first is not None and first.is_closed and ing._client is None
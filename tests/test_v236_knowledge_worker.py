@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any
+
+import pytest
+
+from app.memory import knowledge as knowledge_mod
+from app.memory.knowledge import KnowledgeWorker
+from app.memory.store import Fact
+from app.services.search.web_ingest import WebDoc
+
+
+class _SlowWeb:
+    def __init__(self, delay_s: float = 0.2) -> None:
+        self.delay_s = delay_s
+        self.fetched: list[list[str]] = []
+
+    async def fetch_many(self, urls: list[str]) -> list[WebDoc]:
+        self.fetched.append(list(urls))
+        await asyncio.sleep(self.delay_s)
+        return [WebDoc(url=u, title=f"About {u}", text="The arena is locked.") for u in urls]
+
+
+class _Store:
+    def __init__(self) -> None:
+        self.added: list[Fact] = []
+        self.replaced: list[str] = []
+
+    def delete_sources(self, urls: list[str]) -> int:
+        self.replaced.extend(urls)
+        return 0
+
+    def add_facts(self, facts: list[Fact]) -> list[int]:
+        self.added.extend(facts)
+        return list(range(len(facts)))
+
+
+class _Bus:
+    def __init__(self) -> None:
+        self.steps: list[tuple[str, dict[str, Any]]] = []
+
+    async def publish_step(self, kind: str, payload: dict[str, Any]) -> None:
+        self.steps.append((kind, payload))
+
+
+@pytest.fixture()
+def steps(monkeypatch: pytest.MonkeyPatch) -> _Bus:
+    fake = _Bus()
+    monkeypatch.setattr(knowledge_mod, "bus", fake)
+    return fake
+
+
+def test_enqueue_never_waits_and_facts_arrive_in_background(steps: _Bus) -> None:
+    web, store = _SlowWeb(), _Store()
+    worker = KnowledgeWorker(workers=1, store=store, ingestor=web)  # type: ignore[arg-type]
+
+    async def go() -> float:
+        start = time.perf_counter()
+        assert worker.enqueue("arena rules", ["u1", "u2", "u3"], source="test")
+        took = time.perf_counter() - start
+        assert store.added == []
+        assert await worker.join(5.0)
+        await worker.aclose()
+        return took
+
+    assert asyncio.run(go()) < 0.05
+    # Capped at max_urls; facts carry orchestrator labels
+    assert web.fetched == [["u1", "u2"]]
+    meta = {"labels": ["arena"], "locked": True, "part": "summary"}
+    assert [f.meta for f in store.added] == [meta] * 2 and store.replaced == ["u1", "u2"]
+    learned = {
+        "topic": "arena rules",
+        "source": "test",
+        "facts": ["About u1", "About u2"],
+        "passages": 0,
+    }
+    assert steps.steps == [("knowledge:learned", learned)]
+
+
+def test_duplicate_topics_are_deduplicated_and_full_queue_drops_oldest(steps: _Bus) -> None:
+    web, store = _SlowWeb(0.05), _Store()
+    worker = KnowledgeWorker(  # type: ignore[arg-type]
+        max_queue=2, workers=1, repeat_s=60.0, store=store, ingestor=web
+    )
+
+    async def go() -> None:
+        assert worker.enqueue("shop 1", ["a"])
+        await asyncio.sleep(0.01)  # "shop 1" is now running
+        assert not worker.enqueue("shop 2", ["a"])  # same topic with digits masked
+        assert worker.enqueue("hunt", ["b"])
+        assert worker.enqueue("arena", ["c"])
+        assert worker.enqueue("summon", ["d"])  # queue full: "hunt" is dropped
+        assert await worker.join(5.0)
+        assert not worker.enqueue("arena", ["c"])  # learned within repeat_s
+        await worker.aclose()
+
+    asyncio.run(go())
+    assert web.fetched == [["a"], ["c"], ["d"]]
+    stats = worker.stats()
+    assert stats["deduped"] == 2.0 and stats["dropped"] == 1.0 and stats["jobs"] == 3.0
+
+
+def test_enqueue_from_another_thread_wakes_the_loop(steps: _Bus) -> None:
+    web, store = _SlowWeb(0.0), _Store()
+    worker = KnowledgeWorker(workers=1, store=store, ingestor=web)  # type: ignore[arg-type]
+
+    async def go() -> None:
+        await worker.start()
+        await asyncio.to_thread(worker.enqueue, "event", ["e"])
+        assert await worker.join(5.0)
+        await worker.aclose()
+
+    asyncio.run(go())
+    assert web.fetched == [["e"]] and len(store.added) == 1
+
+
+def test_jobs_that_learn_nothing_are_not_announced(steps: _Bus) -> None:
+    class _Blocked:
+        async def fetch_many(self, urls: list[str]) -> list[WebDoc]:
+            return []
+
+    store = _Store()
+    worker = KnowledgeWorker(workers=1, store=store, ingestor=_Blocked())  # type: ignore[arg-type]
+
+    async def go() -> None:
+        assert worker.enqueue("arena rules", ["u1"])
+        assert await worker.join(5.0)
+        await worker.aclose()
+
+    asyncio.run(go())
+    assert steps.steps == [] and store.added == [] and worker.stats()["jobs"] == 1.0
+
+
+def test_seed_urls_avoid_robots_blocked_search_pages(monkeypatch: pytest.MonkeyPatch) -> None:
+    from urllib.robotparser import RobotFileParser
+
+    from app.memory.knowledge import seed_urls
+
+    seeds = seed_urls("Rookie  Arena & more")
+    assert seeds and all("Rookie+Arena+%26+more" in u for u in seeds)
+    # Result pages of the usual search engines are off limits to crawlers
+    engines = RobotFileParser()
+    engines.parse(["User-agent: *", "Disallow: /search", "Disallow: /html", "Disallow: /lite"])
+    assert all(engines.can_fetch("auto-gaming", u) for u in seeds)
+    monkeypatch.setattr(knowledge_mod.settings, "knowledge_seed_urls", "https://a/{q}, ,https://b")
+    assert seed_urls("x y") == ["https://a/x+y", "https://b"]
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.memory import store as store_mod
+from app.memory.knowledge import document_facts
+from app.memory.store import MemoryStore
+from app.services.search.documents import chunk_text, extract_blocks, summarize_text
+from app.services.search.web_ingest import WebDoc, parse_html
+from tests.test_v229_shared_memory_store import _FakeEmbedder
+
+_PAGE = """<html><head><title>Arena guide</title><script>track()</script></head><body>
+<nav><a href="/">Home</a> <a href="/heroes">Heroes and artifacts</a></nav>
+<div class="cookie-banner"><p>We use cookies to improve your experience here.</p></div>
+<article>
+  <h1>Arena basics</h1>
+  <p>The arena opens after chapter two and pays weekly gold.</p>
+  <ul><li><a href="/a">Season one</a> <a href="/b">Season two rewards</a></li>
+      <li>Defensive teams win more arena battles over a season.</li></ul>
+  <p>The arena opens after chapter two and pays weekly gold.</p>
+</article>
+<footer><p>Copyright 2024 all rights reserved by the publisher.</p></footer>
+</body></html>"""
+
+
+def _long_text() -> str:
+    filler = [f"Arena battle {i} pays gold to every hero in the arena." for i in range(30)]
+    return " ".join(filler + ["Summon banners refresh on Thursday with covenant bookmarks."])
+
+
+def test_boilerplate_is_removed() -> None:
+    assert extract_blocks(_PAGE) == [
+        "Arena basics",
+        "The arena opens after chapter two and pays weekly gold.",
+        "Defensive teams win more arena battles over a season.",
+    ]
+    doc = parse_html("u", _PAGE)
+    assert doc.title == "Arena guide" and "cookies" not in doc.text and "\n\n" in doc.text
+
+
+def test_chrome_words_never_drop_the_main_content() -> None:
+    body = "<p>The arena opens after chapter two and pays weekly gold.</p>"
+    # a chrome word on an ancestor of the article, and a class that merely contains one
+    wrapped = f'<html><body><div class="layout has-sidebar"><article>{body}</article></div>'
+    shared = f'<html><body><div class="shared-content">{body}</div></body></html>'
+    expected = ["The arena opens after chapter two and pays weekly gold."]
+    assert extract_blocks(wrapped) == expected
+    assert extract_blocks(shared) == expected
+    # a page that is all chrome still yields its text rather than nothing
+    chrome = f'<html><body><div class="menu">{body}</div></body></html>'
+    assert extract_blocks(chrome) == expected
+    inline = (
+        '<article><p>Defensive teams win more arena battles. <span class="share">'
+        "Share this on every network</span></p></article>"
+    )
+    assert extract_blocks(inline) == ["Defensive teams win more arena battles."]
+
+
+def test_chunks_overlap_and_respect_the_budget() -> None:
+    chunks = chunk_text(_long_text(), max_words=40, overlap_words=10, max_chunks=50)
+    assert len(chunks) > 3 and all(len(c.split()) <= 40 for c in chunks)
+    for a, b in zip(chunks, chunks[1:]):
+        assert a.split(". ")[-1] in b  # the last sentence is repeated in the next passage
+    assert "Summon banners" in chunks[-1]
+    assert len(chunk_text(_long_text(), max_words=40, overlap_words=10, max_chunks=3)) == 3
+
+
+def test_summary_prefers_central_sentences() -> None:
+    text = (
+        "Buy our premium pack now. The arena rewards gold weekly. Arena battles give gold "
+        "and honor. Gold from the arena buys heroes. Follow us on social media."
+    )
+    summary = summarize_text(text, max_sentences=2, max_chars=500)
+    assert "premium" not in summary and "social" not in summary
+    assert summary.count("arena") + summary.count("Arena") >= 2
+    assert len(summarize_text(_long_text(), max_sentences=30, max_chars=120)) <= 123
+
+
+def test_passages_make_deep_content_retrievable(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setattr(store_mod, "_embedder", _FakeEmbedder())
+    monkeypatch.setattr(store_mod.settings, "doc_chunk_words", 40)
+    monkeypatch.setattr(store_mod.settings, "doc_max_chunks", 4)
+    doc = WebDoc(url="https://example.com/arena", title="Arena", text=_long_text())
+    facts = document_facts(doc)
+    assert facts[0].meta["part"] == "summary" and len(facts) == 5
+    assert "Summon" not in facts[0].summary
+    ms = MemoryStore(db_path=str(tmp_path / "app.sqlite3"))
+    ms.add_facts(facts)
+    top = ms.search("summon covenant bookmarks", 1, mode="lexical")[0]
+    assert top.meta["part"] == 4 and "Thursday" in top.summary
+    assert ms.delete_sources([doc.url]) == 5
+    assert ms.search("summon covenant bookmarks", 1, mode="lexical") == []